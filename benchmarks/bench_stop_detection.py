@@ -0,0 +1,115 @@
+"""Compare whole-file and streaming stop detection on synthetic multi-megabyte pages.
+
+The classifier scrape.py stops on shares the streaming scan, and is
+measured alongside it.
+
+Usage: python benchmarks/bench_stop_detection.py [--files 200] [--size-mb 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+# Add src directory to path so we can import page_scanner and page_classifier
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from page_classifier import classify_file
+from page_scanner import file_contains_marker, files_containing_marker
+
+MARKER = "ResidentialCard"
+
+
+def read_whole_file_contains(filename: str) -> bool:
+    """The original contains_residential_card, kept here as the baseline"""
+    with open(filename, "r", encoding="utf-8", errors="ignore") as file:
+        content = file.read()
+        return MARKER in content
+
+
+def write_corpus(directory: str, num_files: int, size_bytes: int) -> List[str]:
+    """Write pages with the marker early, late, or missing, like a resumed run sees"""
+    filler = b"<script>window.__noise = 'x';</script>\n" * (size_bytes // 40)
+    filenames = []
+    for i in range(num_files):
+        if i % 3 == 0:
+            content = MARKER.encode() + filler
+        elif i % 3 == 1:
+            content = filler + MARKER.encode()
+        else:
+            content = filler
+        content += b"</html>\n"
+        filename = os.path.join(directory, f"20250101_2000_{i}.html")
+        with open(filename, "wb") as file:
+            file.write(content)
+        filenames.append(filename)
+    return filenames
+
+
+def measure(name: str, run: Callable[[], object], num_files: int) -> Dict:
+    """Time a callable and record its Python peak allocation"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "files": num_files,
+        "seconds": elapsed,
+        "files_per_second": num_files / elapsed,
+        "peak_bytes": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = write_corpus(directory, args.files, int(args.size_mb * 1024**2))
+        results = [
+            measure(
+                "read_whole_file",
+                lambda: [read_whole_file_contains(f) for f in filenames],
+                args.files,
+            ),
+            measure(
+                "streaming",
+                lambda: [file_contains_marker(f) for f in filenames],
+                args.files,
+            ),
+            measure(
+                "streaming_batch",
+                lambda: files_containing_marker(filenames),
+                args.files,
+            ),
+            measure(
+                "classify",
+                lambda: [classify_file(f) for f in filenames],
+                args.files,
+            ),
+        ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'name':<18}{'files/s':>12}{'peak MiB':>12}")
+    for result in results:
+        print(
+            f"{result['name']:<18}{result['files_per_second']:>12.1f}"
+            f"{result['peak_bytes'] / 1024**2:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
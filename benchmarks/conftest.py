@@ -0,0 +1,23 @@
+"""Benchmark defaults: every run is saved as JSON under benchmarks/results.
+
+Usage: uv run pytest benchmarks
+Compare saved runs with: uv run pytest-benchmark --storage benchmarks/results compare
+"""
+
+import os
+
+import pytest
+from pytest_benchmark.utils import get_tag
+
+DEFAULT_STORAGE = "file://./.benchmarks"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Autosave results unless the caller picked their own storage or JSON file"""
+    option = config.option
+    if option.benchmark_storage == DEFAULT_STORAGE:
+        option.benchmark_storage = f"file://{RESULTS_DIR}"
+    if not option.benchmark_json and not option.benchmark_save:
+        option.benchmark_autosave = get_tag()
@@ -0,0 +1,69 @@
+"""Benchmarks of the analytics reports over years of weekly rollups.
+
+Rollup layers are generated directly, so no listing store is built.
+Usage: uv run pytest benchmarks
+"""
+
+import numpy as np
+import pytest
+
+from analytics import (
+    WEEKLY,
+    WEEKLY_BY_TYPE,
+    ListingTable,
+    RollupStore,
+    across_postcodes,
+    date_to_day,
+    median_price_by_postcode_week,
+    price_per_bedroom_by_type,
+    rollup,
+    week_start,
+)
+
+# Three years of 600 postcodes, each with 80 listings seen in a week,
+# on one to seven days of it, at rents rounded to $10
+WEEKS = 3 * 52
+POSTCODES = 600
+LISTINGS_PER_WEEK = 80
+PROPERTY_TYPES = ("Apartment", "House", "Studio", "Townhouse")
+
+
+@pytest.fixture(scope="module")
+def rollup_store(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    rows = WEEKS * POSTCODES * LISTINGS_PER_WEEK
+    first_week = week_start(np.int32(date_to_day("20230102")))
+    weeks = first_week + 7 * np.arange(WEEKS, dtype=np.int32)
+    table = ListingTable(
+        day=np.repeat(weeks, POSTCODES * LISTINGS_PER_WEEK),
+        postcode=np.tile(
+            np.repeat(
+                np.arange(2000, 2000 + POSTCODES, dtype=np.int32), LISTINGS_PER_WEEK
+            ),
+            WEEKS,
+        ),
+        price=rng.integers(30, 200, rows, dtype=np.int32) * 10,
+        property_type=rng.integers(0, len(PROPERTY_TYPES), rows, dtype=np.int32),
+        bedrooms=rng.integers(0, 5, rows, dtype=np.int32),
+        count=rng.integers(1, 8, rows, dtype=np.int32),
+        property_types=PROPERTY_TYPES,
+    )
+    weekly = rollup(table)
+    store = RollupStore(str(tmp_path_factory.mktemp("rollups")))
+    store.save(WEEKLY, weekly)
+    store.save(WEEKLY_BY_TYPE, across_postcodes(weekly))
+    return store
+
+
+def test_median_price_by_postcode_week(benchmark, rollup_store):
+    """Weekly median per postcode across the whole history, load included"""
+    result = benchmark(lambda: median_price_by_postcode_week(rollup_store.load(WEEKLY)))
+    assert len(result.medians) == WEEKS * POSTCODES
+
+
+def test_price_per_bedroom_by_type(benchmark, rollup_store):
+    """Median price per bedroom by property type across the whole history, load included"""
+    result = benchmark(
+        lambda: price_per_bedroom_by_type(rollup_store.load(WEEKLY_BY_TYPE))
+    )
+    assert len(result.medians) == len(PROPERTY_TYPES)
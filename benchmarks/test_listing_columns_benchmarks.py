@@ -0,0 +1,86 @@
+"""Benchmarks of filtered lookups over a year of Sydney listing history.
+
+Rows are generated as tuples and packed batch by batch, as the loaders do,
+so no listing store is built.
+Usage: uv run pytest benchmarks
+"""
+
+import numpy as np
+import pytest
+
+from analytics import date_to_day, day_to_date
+from listing_columns import ListingColumns, ListingColumnsBuilder
+
+# A year of daily scrapes of the 99 Sydney postcodes, 80 listings each,
+# about 2.9 million rows
+DAYS = 365
+POSTCODES = [str(postcode) for postcode in range(2000, 2099)]
+LISTINGS_PER_DAY = 80
+SUBURBS_PER_POSTCODE = 4
+PROPERTY_TYPES = ("Apartment", "House", "Studio", "Townhouse")
+# Kept well under the ~1 GB a list of Listing objects of this size would take
+MAX_BYTES = 300 * 1024 * 1024
+
+
+def generate_rows():
+    rng = np.random.default_rng(0)
+    first_day = date_to_day("20240101")
+    for offset in range(DAYS):
+        scrape_date = day_to_date(first_day + offset)
+        for postcode in POSTCODES:
+            prices = rng.integers(30, 200, LISTINGS_PER_DAY) * 10
+            listed = first_day + offset - rng.integers(0, 60, LISTINGS_PER_DAY)
+            for position in range(LISTINGS_PER_DAY):
+                listing_id = str(1000 * int(postcode) + position + offset // 14)
+                suburb = f"Suburb {postcode}{position % SUBURBS_PER_POSTCODE}"
+                price = int(prices[position])
+                yield (
+                    listing_id,
+                    f"{position} King St, {suburb} NSW {postcode}",
+                    f"${price} per week",
+                    price,
+                    position % 5,
+                    1 + position % 3,
+                    position % 2,
+                    PROPERTY_TYPES[position % len(PROPERTY_TYPES)],
+                    "",
+                    day_to_date(int(listed[position])),
+                    f"{scrape_date}_{postcode}_{1 + position // 25}.html",
+                    scrape_date,
+                    postcode,
+                    1 + position // 25,
+                    position % 25,
+                )
+
+
+@pytest.fixture(scope="module")
+def columns() -> ListingColumns:
+    builder = ListingColumnsBuilder()
+    batch = []
+    for row in generate_rows():
+        batch.append(row)
+        if len(batch) == 100_000:
+            builder.add_rows(batch)
+            batch = []
+    builder.add_rows(batch)
+    return builder.build()
+
+
+def test_columns_fit_memory_budget(columns):
+    """The whole history, indexes included, in a few hundred MB"""
+    assert len(columns) == DAYS * len(POSTCODES) * LISTINGS_PER_DAY
+    assert columns.nbytes < MAX_BYTES
+
+
+def test_select_postcode_price_range(benchmark, columns):
+    """One postcode's listings within a price band"""
+    rows = benchmark(lambda: columns.select(postcode="2042", prices=(400, 600)))
+    assert len(rows) > 0
+
+
+def test_select_list_week_in_suburb(benchmark, columns):
+    """A week of new listings, narrowed to one suburb"""
+    week = ("20240601", "20240607")
+    rows = benchmark(lambda: columns.select(list_dates=week, suburb="Suburb 20421"))
+    assert len(rows) > 0
+    assert columns[int(rows[0])].list_date >= week[0]
@@ -0,0 +1,91 @@
+"""Offline benchmarks of the scrape loop, stop detection and run resume.
+
+Pages come from synthetic_pages, so no browser is driven.
+Usage: uv run pytest benchmarks
+"""
+
+import os
+
+import pytest
+
+import scrape
+from constants import RUN_LOG_SUFFIX
+from run_ledger import RunLedger
+from synthetic_pages import SyntheticBrowserController, write_corpus
+
+RUN_DATE = "20250101"
+# Page count of a real postcode list, 20 postcodes of 15-75 listings
+LOOP_POSTCODES = {str(2000 + n): 15 + 3 * n for n in range(20)}
+# A few hundred real-sized pages for the stop check
+CHECK_STOP_PAGES = {str(2000 + n): 250 for n in range(20)}
+CHECK_STOP_PADDING = 512 * 1024
+# A full-list resume: 400 postcodes with 26 saved pages each, 10,400 files
+RESUME_POSTCODES = {str(2000 + n): 650 for n in range(400)}
+
+
+@pytest.fixture(scope="module")
+def check_stop_corpus(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("check_stop"))
+    return write_corpus(
+        directory,
+        RUN_DATE,
+        CHECK_STOP_PAGES,
+        padding_bytes=CHECK_STOP_PADDING,
+        include_empty_page=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def resume_corpus(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("resume"))
+    write_corpus(directory, RUN_DATE, RESUME_POSTCODES)
+    # An unfinished run log makes RUN_DATE the run to resume
+    open(os.path.join(directory, f"{RUN_DATE}{RUN_LOG_SUFFIX}"), "w").close()
+    return directory
+
+
+def test_scrape_all_pages_loop_overhead(benchmark, tmp_path):
+    """Per-page cost of the scrape loop itself, with a controller that never waits"""
+    controller = SyntheticBrowserController(LOOP_POSTCODES)
+    rounds = iter(range(1_000_000))
+
+    def setup():
+        run_dir = tmp_path / str(next(rounds))
+        run_dir.mkdir()
+        return (RunLedger(RUN_DATE, str(run_dir)),), {}
+
+    def scrape_run(ledger):
+        for postcode in LOOP_POSTCODES:
+            scrape.scrape_all_pages(postcode, controller, ledger)
+
+    benchmark.pedantic(scrape_run, setup=setup, rounds=10)
+    benchmark.extra_info["pages_per_round"] = sum(
+        -(-total // 25) for total in LOOP_POSTCODES.values()
+    )
+
+
+def test_check_stop_throughput(benchmark, check_stop_corpus):
+    """check_stop over half-megabyte pages, including each postcode's empty page"""
+
+    def check_all():
+        return sum(scrape.check_stop(filename) for filename in check_stop_corpus)
+
+    stops = benchmark(check_all)
+
+    assert stops == len(CHECK_STOP_PAGES)
+    benchmark.extra_info["pages"] = len(check_stop_corpus)
+    benchmark.extra_info["page_bytes"] = os.path.getsize(check_stop_corpus[0])
+
+
+def test_resume_from_existing_files(benchmark, resume_corpus):
+    """Rebuilding run state from 10k+ saved pages when a run is resumed"""
+    postcodes = list(RESUME_POSTCODES)
+
+    def resume():
+        ledger = RunLedger.resume_or_start(postcodes, resume_corpus, today=RUN_DATE)
+        return ledger.remaining_postcodes(postcodes), ledger.last_saved_page("2000")
+
+    remaining, last_saved_page = benchmark(resume)
+
+    assert (len(remaining), last_saved_page) == (400, 26)
+    benchmark.extra_info["files"] = len(os.listdir(resume_corpus))
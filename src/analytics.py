@@ -0,0 +1,497 @@
+import argparse
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from constants import ANALYTICS_ROLLUP_DIR, LISTING_STORE_FILE
+from listing_store import ListingStore
+
+EPOCH = date(1970, 1, 1)
+# Stands in for a missing price or bedroom count, which NumPy integers cannot hold
+UNKNOWN = -1
+# Postcode of rows rolled up across every postcode
+ANY_POSTCODE = 0
+
+# Rollup columns, in the order rows are sorted by
+COLUMNS = ("day", "postcode", "price", "property_type", "bedrooms")
+
+# Rollup layers: every listing per day, per week, and per week across postcodes
+DAILY = "daily"
+WEEKLY = "weekly"
+WEEKLY_BY_TYPE = "weekly_by_type"
+
+
+@dataclass(frozen=True, eq=False)
+class ListingTable:
+    """Listings as parallel NumPy columns, each row counting the listings sharing its values.
+
+    Raw listings have a count of one per row. Rollups merge rows whose
+    day, postcode, price, property type and bedrooms all match, so every
+    aggregate runs unchanged over either. Property types are codes into
+    property_types.
+    """
+
+    day: np.ndarray
+    postcode: np.ndarray
+    price: np.ndarray
+    property_type: np.ndarray
+    bedrooms: np.ndarray
+    count: np.ndarray
+    property_types: Tuple[str, ...]
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def listings(self) -> int:
+        return int(self.count.sum())
+
+    def take(self, rows) -> "ListingTable":
+        """Rows selected by a mask, indices or slice, keeping their order"""
+        return ListingTable(
+            *(getattr(self, column)[rows] for column in (*COLUMNS, "count")),
+            property_types=self.property_types,
+        )
+
+    def replace(self, **columns: np.ndarray) -> "ListingTable":
+        return ListingTable(
+            **{
+                column: columns.get(column, getattr(self, column))
+                for column in (*COLUMNS, "count")
+            },
+            property_types=self.property_types,
+        )
+
+
+@dataclass(frozen=True, eq=False)
+class GroupMedians:
+    """Weighted median of a value per group, with the listings behind each median"""
+
+    keys: Tuple[np.ndarray, ...]
+    medians: np.ndarray
+    listings: np.ndarray
+
+
+def date_to_day(scrape_date: str) -> int:
+    """Pure function giving a YYYYMMDD date as days since 1970-01-01"""
+    return (datetime.strptime(scrape_date, "%Y%m%d").date() - EPOCH).days
+
+
+def day_to_date(day: int) -> str:
+    """Pure function reversing date_to_day"""
+    return (EPOCH + timedelta(days=int(day))).strftime("%Y%m%d")
+
+
+def week_start(days: np.ndarray) -> np.ndarray:
+    """Pure function giving the Monday on or before each day; 1970-01-01 was a Thursday"""
+    return days - (days + 3) % 7
+
+
+def empty_table(property_types: Sequence[str] = ()) -> ListingTable:
+    empty = np.empty(0, dtype=np.int32)
+    return ListingTable(*(empty for _ in range(6)), tuple(property_types))
+
+
+def table_from_rows(
+    rows: Iterable[tuple], property_types: Sequence[str] = ()
+) -> ListingTable:
+    """Build a table from (scrape_date, postcode, property_type, bedrooms, price) rows.
+
+    Types missing from property_types are given the next codes, so tables
+    built against the same vocabulary can be stacked without recoding.
+    """
+    rows = list(rows)
+    if not rows:
+        return empty_table(property_types)
+    scrape_dates, postcodes, types, bedrooms, prices = zip(*rows)
+    unique_dates, date_codes = np.unique(np.array(scrape_dates), return_inverse=True)
+    days = np.array([date_to_day(d) for d in unique_dates], dtype=np.int32)
+
+    vocabulary = list(property_types)
+    lookup = {name: code for code, name in enumerate(vocabulary)}
+    for name in sorted(set(types) - lookup.keys()):
+        lookup[name] = len(vocabulary)
+        vocabulary.append(name)
+
+    return ListingTable(
+        day=days[date_codes],
+        postcode=np.array([int(p) for p in postcodes], dtype=np.int32),
+        price=_with_unknown(prices),
+        property_type=np.array([lookup[name] for name in types], dtype=np.int32),
+        bedrooms=_with_unknown(bedrooms),
+        count=np.ones(len(rows), dtype=np.int32),
+        property_types=tuple(vocabulary),
+    )
+
+
+# Incremental crawls only load the first pages of a postcode, so their
+# listings would skew every aggregate towards the newest listings
+FULL_SNAPSHOTS_ONLY = (
+    "NOT EXISTS (SELECT 1 FROM postcode_snapshots AS snapshot"
+    " WHERE snapshot.scrape_date = unique_listings.scrape_date"
+    " AND snapshot.postcode = unique_listings.postcode AND snapshot.is_full = 0)"
+)
+
+
+def _with_unknown(values: Sequence[Optional[int]]) -> np.ndarray:
+    return np.array(
+        [UNKNOWN if value is None else value for value in values], dtype=np.int32
+    )
+
+
+def load_listings(
+    store: ListingStore,
+    scrape_dates: Optional[Iterable[str]] = None,
+    property_types: Sequence[str] = (),
+) -> ListingTable:
+    """Load deduplicated listings of full crawls, or only of scrape_dates, as raw rows"""
+    query = (
+        "SELECT scrape_date, postcode, property_type, bedrooms, price"
+        f" FROM unique_listings WHERE {FULL_SNAPSHOTS_ONLY}"
+    )
+    params: List[str] = []
+    if scrape_dates is not None:
+        params = sorted(scrape_dates)
+        if not params:
+            return empty_table(property_types)
+        query += f" AND scrape_date IN ({', '.join('?' for _ in params)})"
+    return table_from_rows(store.connection.execute(query, params), property_types)
+
+
+def load_weekly_listings(
+    store: ListingStore, weeks: Iterable[int], property_types: Sequence[str] = ()
+) -> ListingTable:
+    """Each listing once per week of weeks, as last seen that week, dated to the Monday.
+
+    Listings are told apart by canonical id, so one that stays up all week
+    weighs no more than one let within a day.
+    """
+    week_of = {
+        day_to_date(week + offset): int(week) for week in weeks for offset in range(7)
+    }
+    if not week_of:
+        return empty_table(property_types)
+    dates = sorted(week_of)
+    rows = store.connection.execute(
+        "SELECT CASE WHEN canonical_id != '' THEN canonical_id ELSE listing_id END,"
+        " scrape_date, postcode, property_type, bedrooms, price FROM unique_listings"
+        f" WHERE {FULL_SNAPSHOTS_ONLY}"
+        f" AND scrape_date IN ({', '.join('?' for _ in dates)}) ORDER BY scrape_date",
+        dates,
+    )
+    # Later sightings replace earlier ones; a listing without any id is kept
+    latest = {}
+    for number, (listing_id, *row) in enumerate(rows):
+        latest[week_of[row[0]], listing_id or number] = row
+    table = table_from_rows(latest.values(), property_types)
+    return table.replace(day=week_start(table.day))
+
+
+def _group_starts(keys: Sequence[np.ndarray]) -> np.ndarray:
+    """Indices where any key changes, for keys already sorted together"""
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    changed[0] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+
+def _is_sorted(keys: Sequence[np.ndarray]) -> bool:
+    """Whether rows are already in lexicographic order of keys, in one pass per key"""
+    tied = np.ones(max(len(keys[0]) - 1, 0), dtype=bool)
+    for key in keys:
+        if np.any(tied & (key[1:] < key[:-1])):
+            return False
+        tied &= key[1:] == key[:-1]
+    return True
+
+
+def _sort_order(keys: Sequence[np.ndarray]) -> Optional[np.ndarray]:
+    """Row order sorting by keys, None when the rows are sorted already"""
+    if _is_sorted(keys):
+        return None
+    # lexsort sorts by its last key first
+    return np.lexsort(keys[::-1])
+
+
+def rollup(table: ListingTable) -> ListingTable:
+    """Merge rows sharing every column, summing their counts, in sorted column order"""
+    if not len(table):
+        return table
+    order = _sort_order([getattr(table, column) for column in COLUMNS])
+    if order is not None:
+        table = table.take(order)
+    starts = _group_starts([getattr(table, column) for column in COLUMNS])
+    merged = table.take(starts)
+    return merged.replace(count=np.add.reduceat(table.count, starts, dtype=np.int32))
+
+
+def across_postcodes(table: ListingTable) -> ListingTable:
+    """Rows merged across postcodes, which all become ANY_POSTCODE"""
+    return rollup(table.replace(postcode=np.full_like(table.postcode, ANY_POSTCODE)))
+
+
+def group_median(
+    keys: Sequence[np.ndarray], values: np.ndarray, weights: np.ndarray
+) -> GroupMedians:
+    """Weighted median of values within each group of keys, without a Python loop.
+
+    Rows are sorted by group then value, unless they already are, so each
+    group's median sits where its running weight crosses half its total.
+    Groups with an even total average the two middle values, as the median
+    of the expanded rows would.
+    """
+    if not len(values):
+        empty = np.empty(0, dtype=np.int64)
+        return GroupMedians(tuple(empty for _ in keys), np.empty(0), empty)
+    order = _sort_order([*keys, values])
+    if order is not None:
+        keys = [key[order] for key in keys]
+        values = values[order]
+        weights = weights[order]
+    cumulative = np.cumsum(weights, dtype=np.int64)
+    starts = _group_starts(keys)
+    totals = np.add.reduceat(weights, starts, dtype=np.int64)
+    before = cumulative[starts] - weights[starts]
+    # Ranks are 1-based: the lower and upper middle of each group
+    lower = np.searchsorted(cumulative, before + (totals + 1) // 2)
+    upper = np.searchsorted(cumulative, before + totals // 2 + 1)
+    return GroupMedians(
+        keys=tuple(key[starts] for key in keys),
+        medians=(values[lower] + values[upper]) / 2,
+        listings=totals,
+    )
+
+
+def _between(
+    table: ListingTable, since: Optional[str], until: Optional[str]
+) -> ListingTable:
+    if since is None and until is None:
+        return table
+    mask = np.ones(len(table), dtype=bool)
+    if since is not None:
+        mask &= table.day >= date_to_day(since)
+    if until is not None:
+        mask &= table.day <= date_to_day(until)
+    return table.take(mask)
+
+
+def median_price_by_postcode_week(
+    table: ListingTable, since: Optional[str] = None, until: Optional[str] = None
+) -> GroupMedians:
+    """Median asking price per (week starting Monday, postcode) over priced listings.
+
+    The weekly rollup layer is already in this order, so it needs no sort,
+    and counts each listing once per week.
+    """
+    table = _between(table, since, until)
+    priced = table.price != UNKNOWN
+    return group_median(
+        (week_start(table.day[priced]), table.postcode[priced]),
+        table.price[priced],
+        table.count[priced],
+    )
+
+
+def price_per_bedroom_by_type(
+    table: ListingTable, since: Optional[str] = None, until: Optional[str] = None
+) -> GroupMedians:
+    """Median price per bedroom for each property type, over listings with both known"""
+    table = _between(table, since, until)
+    known = (table.price != UNKNOWN) & (table.bedrooms > 0)
+    return group_median(
+        (table.property_type[known],),
+        table.price[known] / table.bedrooms[known],
+        table.count[known],
+    )
+
+
+def replace_days(
+    table: ListingTable, days: np.ndarray, rows: ListingTable
+) -> ListingTable:
+    """Swap the rows of days in a rollup layer for freshly rolled-up ones.
+
+    New days usually follow every kept day, so the layer stays sorted by
+    appending and is only re-sorted when an earlier day is replaced.
+    """
+    kept = table.take(~np.isin(table.day, days))
+    stacked = ListingTable(
+        *(
+            np.concatenate([getattr(kept, column), getattr(rows, column)])
+            for column in (*COLUMNS, "count")
+        ),
+        property_types=max(table.property_types, rows.property_types, key=len),
+    )
+    if len(kept) and len(rows) and kept.day[-1] >= rows.day[0]:
+        return rollup(stacked)
+    return stacked
+
+
+class RollupStore:
+    """Per-day and per-week rollups of the listing store's full crawls.
+
+    Each layer is one NumPy file holding a row per column, sorted by day
+    then postcode then price. Files are memory-mapped on load, so a query
+    reads only the columns it touches. Property type codes come from one append-only vocabulary
+    shared by every layer.
+    """
+
+    def __init__(self, directory: str = ANALYTICS_ROLLUP_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def property_types(self) -> Tuple[str, ...]:
+        try:
+            with open(self._path("property_types.json"), encoding="utf-8") as file:
+                return tuple(json.load(file))
+        except FileNotFoundError:
+            return ()
+
+    def load(self, layer: str) -> ListingTable:
+        property_types = self.property_types()
+        path = self._path(f"{layer}.npy")
+        if not os.path.exists(path):
+            return empty_table(property_types)
+        return ListingTable(*np.load(path, mmap_mode="r"), property_types)
+
+    def save(self, layer: str, table: ListingTable) -> None:
+        """Write a layer atomically so a crash never leaves half a file.
+
+        The vocabulary is written first; it only ever grows, so every
+        layer's codes stay valid whichever write a crash interrupts.
+        """
+        _write_atomically(
+            self._path("property_types.json"),
+            lambda file: file.write(json.dumps(table.property_types).encode()),
+        )
+        columns = np.stack(
+            [getattr(table, column) for column in (*COLUMNS, "count")]
+        ).astype(np.int32, copy=False)
+        _write_atomically(
+            self._path(f"{layer}.npy"), lambda file: np.save(file, columns)
+        )
+
+
+def _write_atomically(path: str, write) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        write(file)
+    os.replace(temp_path, path)
+
+
+def stale_dates(store: ListingStore, daily: ListingTable) -> Set[str]:
+    """Dates from the last rolled-up day on whose listing counts differ from the rollups.
+
+    Days before the last rolled-up one are taken as settled, so the check
+    reads only the newest dates from the store and the daily layer.
+    """
+    rolled = {}
+    since = "00000000"
+    if len(daily):
+        last_day = daily.day[-1]
+        since = day_to_date(last_day)
+        first_row = np.searchsorted(daily.day, last_day)
+        rolled[since] = int(daily.count[first_row:].sum())
+    rows = store.connection.execute(
+        "SELECT scrape_date, COUNT(*) FROM unique_listings"
+        f" WHERE scrape_date >= ? AND {FULL_SNAPSHOTS_ONLY} GROUP BY scrape_date",
+        (since,),
+    )
+    return {
+        scrape_date for scrape_date, count in rows if rolled.get(scrape_date) != count
+    }
+
+
+def refresh_rollups(
+    store: ListingStore,
+    rollup_store: RollupStore,
+    scrape_dates: Optional[Iterable[str]] = None,
+) -> Set[str]:
+    """Re-roll newly ingested days, plus scrape_dates, returning the days rolled up.
+
+    Only those days, and the rest of their weeks for the weekly layers,
+    are read from the listing store; every other row is kept as it was.
+    """
+    daily = rollup_store.load(DAILY)
+    dates = stale_dates(store, daily) | set(scrape_dates or ())
+    if not dates:
+        return dates
+    days = np.array([date_to_day(d) for d in dates], dtype=np.int32)
+    fresh = rollup(load_listings(store, dates, daily.property_types))
+    daily = replace_days(daily, days, fresh)
+    rollup_store.save(DAILY, daily)
+
+    weeks = np.unique(week_start(days))
+    weekly = rollup(load_weekly_listings(store, weeks, daily.property_types))
+    weekly = replace_days(rollup_store.load(WEEKLY), weeks, weekly)
+    rollup_store.save(WEEKLY, weekly)
+
+    by_type = across_postcodes(weekly.take(np.isin(weekly.day, weeks)))
+    rollup_store.save(
+        WEEKLY_BY_TYPE,
+        replace_days(rollup_store.load(WEEKLY_BY_TYPE), weeks, by_type),
+    )
+    logging.info(f"refresh_rollups: Rolled up {len(dates)} days, {len(weeks)} weeks")
+    return dates
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Aggregate listing prices from the precomputed rollups"
+    )
+    parser.add_argument("report", choices=["weekly-median", "price-per-bedroom"])
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    parser.add_argument("--rollups", default=ANALYTICS_ROLLUP_DIR)
+    parser.add_argument("--postcode", help="only report this postcode")
+    parser.add_argument("--since", help="first week, YYYYMMDD")
+    parser.add_argument("--until", help="last week, YYYYMMDD")
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="roll up days ingested since the last refresh first",
+    )
+    args = parser.parse_args()
+
+    rollup_store = RollupStore(args.rollups)
+    if args.refresh:
+        with ListingStore(args.store) as store:
+            refresh_rollups(store, rollup_store)
+
+    if args.report == "weekly-median":
+        table = rollup_store.load(WEEKLY)
+        if args.postcode is not None:
+            table = table.take(table.postcode == int(args.postcode))
+        result = median_price_by_postcode_week(table, args.since, args.until)
+        print(f"{'week':<10}{'postcode':<10}{'median':>12}{'listings':>10}")
+        for week, postcode, median, listings in zip(
+            *result.keys, result.medians, result.listings
+        ):
+            print(
+                f"{day_to_date(week):<10}{postcode:04d}{'':<6}"
+                f"{median:>12,.0f}{listings:>10}"
+            )
+    else:
+        table = rollup_store.load(WEEKLY_BY_TYPE if args.postcode is None else WEEKLY)
+        if args.postcode is not None:
+            table = table.take(table.postcode == int(args.postcode))
+        result = price_per_bedroom_by_type(table, args.since, args.until)
+        print(f"{'property type':<24}{'per bedroom':>14}{'listings':>10}")
+        for type_code, median, listings in zip(
+            *result.keys, result.medians, result.listings
+        ):
+            name = table.property_types[type_code] or "(unknown)"
+            print(f"{name:<24}{median:>14,.0f}{listings:>10}")
@@ -0,0 +1,116 @@
+import argparse
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from constants import (
+    ARCHIVE_DICTIONARY_SAMPLES,
+    ARCHIVE_DIR,
+    LISTING_STORE_FILE,
+    OUTPUT_DIR,
+)
+from listing_store import LedgerEntry, ListingStore
+from page_archive import PageArchive, page_key, train_dictionary
+from run_ledger import latest_run_date
+
+
+def list_archivable_pages(
+    output_dir: str, before_date: str, ingested: Dict[str, LedgerEntry]
+) -> List[str]:
+    """Saved pages in output_dir scraped before before_date, from one directory scan.
+
+    Ingestion only reads raw pages, so a page is left out until the listing
+    store has ingested it as it is now. Completed markers hold no listings
+    and are never ingested, so they are packed without that check.
+    """
+    pages = []
+    skipped = 0
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            key = page_key(entry.name)
+            if not entry.is_file() or key is None or key[0] >= before_date:
+                continue
+            if key[2] == "completed":
+                pages.append(entry.path)
+                continue
+            known = ingested.get(entry.name)
+            stat = entry.stat()
+            if (
+                known is None
+                or known.size != stat.st_size
+                or known.mtime_ns != stat.st_mtime_ns
+            ):
+                skipped += 1
+                continue
+            pages.append(entry.path)
+    if skipped:
+        logging.warning(
+            f"list_archivable_pages: Leaving {skipped} pages that are not ingested yet"
+        )
+    return sorted(pages)
+
+
+def archive_pages(
+    archive: PageArchive,
+    filenames: List[str],
+    remove_originals: bool = False,
+    retrain: bool = False,
+) -> None:
+    """Pack pages into the archive, training a dictionary first if there is none"""
+    if filenames and (retrain or archive.current_dictionary_id() is None):
+        samples = filenames[:: max(1, len(filenames) // ARCHIVE_DICTIONARY_SAMPLES)]
+        dictionary_id = archive.set_dictionary(train_dictionary(samples))
+        logging.info(
+            f"archive_pages: Trained dictionary {dictionary_id} from {len(samples)} pages"
+        )
+
+    for filename in filenames:
+        archive.store_page(filename)
+        if remove_originals:
+            os.remove(filename)
+
+    stats = archive.stats()
+    ratio = stats.raw_bytes / stats.stored_bytes if stats.stored_bytes else 0
+    logging.info(
+        f"archive_pages: Archived {len(filenames)} pages. Archive holds {stats.pages} pages in {stats.blobs} blobs, {stats.raw_bytes} raw bytes stored in {stats.stored_bytes} ({ratio:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Pack saved pages into the compressed, deduplicated archive"
+    )
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    parser.add_argument(
+        "--before",
+        default=None,
+        help="Archive pages scraped before this YYYYMMDD date (default: latest run)",
+    )
+    parser.add_argument("--remove-originals", action="store_true")
+    parser.add_argument("--retrain", action="store_true")
+    args = parser.parse_args()
+
+    # Never pack the run that may still be resumed
+    before_date = (
+        args.before
+        or latest_run_date(args.output_dir)
+        or datetime.now().strftime("%Y%m%d")
+    )
+    with ListingStore(args.store) as store:
+        ingested = store.load_ledger()
+    with PageArchive(args.archive_dir) as archive:
+        archive_pages(
+            archive,
+            list_archivable_pages(args.output_dir, before_date, ingested),
+            args.remove_originals,
+            args.retrain,
+        )
@@ -0,0 +1,417 @@
+import logging
+import os
+import random
+import subprocess
+from typing import Optional, Tuple
+
+import pyautogui
+
+import clock
+from browser_controller import (
+    BrowserController,
+    calculate_wait_time,
+    reset_user_data_dir,
+)
+from constants import (
+    BRAVE_BROWSER_COMMAND,
+    BROWSER_OPEN_WAIT,
+    DEFAULT_URL,
+    KEYBOARD_DELAY,
+    PAGE_LOAD_BASE_WAIT,
+    PAGE_LOAD_JITTER,
+    PROFILE_TEMPLATE_DIR,
+    USER_DATA_DIR,
+)
+from metrics import Phase, span
+from save_waiter import wait_for_saved_file
+
+
+class BraveBrowserController(BrowserController):
+    """Concrete implementation for Brave browser automation"""
+
+    def __init__(
+        self,
+        initial_url: str = DEFAULT_URL,
+        user_data_dir: str = USER_DATA_DIR,
+        template_dir: Optional[str] = PROFILE_TEMPLATE_DIR,
+    ):
+        """Initialize with configurable starting URL and profile directories"""
+        self.initial_url = initial_url
+        self.user_data_dir = user_data_dir
+        self.template_dir = template_dir
+        self.browser_bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def open_browser(self) -> None:
+        logging.info("open_browser: Starting browser initialization")
+        user_data_dir = reset_user_data_dir(self.user_data_dir, self.template_dir)
+
+        # Launch Brave with a profile
+        logging.info(
+            "open_browser: Launching Brave browser with URL %s", self.initial_url
+        )
+        subprocess.Popen(
+            [
+                BRAVE_BROWSER_COMMAND,
+                "--user-data-dir=" + user_data_dir,
+                self.initial_url,
+            ]
+        )
+
+        logging.debug(
+            "open_browser: Waiting %s seconds for browser to start", BROWSER_OPEN_WAIT
+        )
+        clock.sleep(BROWSER_OPEN_WAIT)
+
+        # Detect browser window after launch
+        self._detect_browser_window()
+        logging.info("open_browser: Browser initialization complete")
+
+    def perform_initial_setup(self) -> None:
+        """Perform initial human-like browsing setup after browser is opened"""
+        logging.info(
+            "perform_initial_setup: Beginning initial human-like browsing simulation"
+        )
+
+        # Brief initial browsing simulation
+        logging.debug("perform_initial_setup: Simulating initial reading pattern")
+        self._simulate_reading_pattern()
+
+        wait_time = random.uniform(0.5, 1.5)
+        logging.debug(
+            "perform_initial_setup: Pausing for %.2f seconds between activities",
+            wait_time,
+        )
+        clock.sleep(wait_time)
+
+        logging.debug("perform_initial_setup: Simulating initial natural scrolling")
+        self._simulate_natural_scrolling()
+
+        logging.info("perform_initial_setup: Initial setup complete")
+        clock.sleep(1)
+
+    def close_browser(self) -> None:
+        logging.info("close_browser")
+        pyautogui.hotkey("alt", "f4")
+
+    def navigate_to(self, url: str) -> None:
+        logging.info("navigate_to: Navigating to %s", url)
+
+        # Use keyboard shortcut to focus the address bar
+        logging.debug("navigate_to: Focusing address bar with Ctrl+L")
+        pyautogui.hotkey("ctrl", "l")
+        clock.sleep(KEYBOARD_DELAY)
+
+        # Clear any existing text and search for the URL
+        logging.debug("navigate_to: Clearing existing text and entering URL")
+        pyautogui.hotkey("ctrl", "a")
+        clock.sleep(KEYBOARD_DELAY)
+        pyautogui.write(url)
+        clock.sleep(KEYBOARD_DELAY)
+
+        logging.debug("navigate_to: Pressing Enter to navigate")
+        pyautogui.press("enter")
+
+        # Wait for page to load
+        logging.debug("navigate_to: Waiting for page to load")
+        self._random_wait(base=PAGE_LOAD_BASE_WAIT, jitter=PAGE_LOAD_JITTER)
+        logging.debug("navigate_to: Navigation complete")
+
+    def save_page(self, filepath: str) -> None:
+        logging.info("save_page: Saving page to %s", filepath)
+        absolute_filepath = os.path.abspath(filepath)
+        logging.debug("save_page: Using absolute path: %s", absolute_filepath)
+
+        # A leftover file from an interrupted attempt would satisfy the save
+        # waiter straight away, and make the dialog ask to replace it
+        if os.path.exists(absolute_filepath):
+            os.remove(absolute_filepath)
+
+        logging.debug("save_page: Opening save dialog with Ctrl+S")
+        content_left, content_top, content_right, content_bottom = (
+            self._get_browser_content_area()
+        )
+
+        # Start from top-left area of browser content where text typically begins
+        start_x = content_left + 50  # Small margin from left edge
+        start_y = content_top + 50  # Small margin from top
+        pyautogui.moveTo(start_x, start_y, duration=0.4)
+
+        logging.debug("save_page: Right clicked")
+        pyautogui.rightClick()  # Ensure browser is focused
+        pyautogui.rightClick()  # Ensure browser is focused
+        pyautogui.hotkey("ctrl", "s")
+
+        # Ensure the save dialog is in focus
+        middle_x = (content_left + content_right) // 2
+        middle_y = (content_top + content_bottom) // 2
+        pyautogui.moveTo(middle_x - 60, middle_y - 60, duration=0.5)
+        pyautogui.rightClick()
+        pyautogui.rightClick()
+
+        # Type the full file path and save
+        logging.debug("save_page: Entering file path")
+        pyautogui.hotkey("ctrl", "l")
+        pyautogui.hotkey("ctrl", "a")
+        clock.sleep(KEYBOARD_DELAY)
+        pyautogui.write(absolute_filepath)
+
+        # Select HTML only option
+        logging.debug("save_page: Navigating to HTML-only save format")
+        # Navigate to format dropdown
+        pyautogui.hotkey("shift", "tab")
+        pyautogui.hotkey("shift", "tab")
+        # Select HTML only option
+        pyautogui.press("enter")
+        pyautogui.press("down")
+        pyautogui.press("up")
+        pyautogui.press("enter")
+        # Navigate to Save button
+        pyautogui.press("tab")
+        pyautogui.press("tab")
+        pyautogui.press("tab")
+        pyautogui.press("tab")
+        pyautogui.press("enter")
+
+        # Press Save
+        logging.debug("save_page: Confirming save operation")
+        pyautogui.press("enter")
+
+        # Wait for save to finish before next page
+        logging.debug("save_page: Waiting for save to complete")
+        wait_for_saved_file(absolute_filepath)
+        logging.info("save_page: Save operation complete")
+
+    def _detect_browser_window(self) -> None:
+        """Detect and store browser window bounds using wmctrl"""
+        try:
+            # Use wmctrl to get window geometry
+            result = subprocess.run(
+                ["wmctrl", "-lG"], capture_output=True, text=True, check=True
+            )
+
+            # Parse wmctrl output to find browser window
+            # Format: window_id desktop x y width height client_machine window_title
+            for line in result.stdout.strip().split("\n"):
+                if line and ("Brave" in line or "Mozilla" in line or "Chrome" in line):
+                    parts = line.split(None, 7)  # Split into max 8 parts
+                    if len(parts) >= 6:
+                        try:
+                            x, y, width, height = map(int, parts[2:6])
+                            self.browser_bounds = (x, y, x + width, y + height)
+                            logging.info(
+                                "_detect_browser_window: Found browser window at %s",
+                                self.browser_bounds,
+                            )
+                            return
+                        except ValueError:
+                            continue
+
+            # No browser window found
+            logging.warning(
+                "_detect_browser_window: No browser window found, using full screen"
+            )
+            screen_width, screen_height = pyautogui.size()
+            self.browser_bounds = (0, 0, screen_width, screen_height)
+
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            logging.error("_detect_browser_window: wmctrl error: %s", e)
+            screen_width, screen_height = pyautogui.size()
+            self.browser_bounds = (0, 0, screen_width, screen_height)
+        except Exception as e:
+            logging.error("_detect_browser_window: Unexpected error: %s", e)
+            screen_width, screen_height = pyautogui.size()
+            self.browser_bounds = (0, 0, screen_width, screen_height)
+
+    def _get_browser_content_area(self) -> Tuple[int, int, int, int]:
+        """Get the content area of the browser (excluding title bar and toolbars)"""
+        if not self.browser_bounds:
+            self._detect_browser_window()
+
+        if self.browser_bounds:
+            left, top, right, bottom = self.browser_bounds
+            # Add margins to avoid title bar, address bar, and scrollbars
+            content_left = left + 20
+            content_top = top + 100  # Account for title bar and address bar
+            content_right = right - 20  # Account for scrollbar
+            content_bottom = bottom - 50  # Account for status bar
+
+            # Ensure we have a valid area
+            if content_right > content_left and content_bottom > content_top:
+                return content_left, content_top, content_right, content_bottom
+
+        # Fallback to screen center area
+        screen_width, screen_height = pyautogui.size()
+        return (
+            int(screen_width * 0.1),
+            int(screen_height * 0.1),
+            int(screen_width * 0.9),
+            int(screen_height * 0.9),
+        )
+
+    def generate_random_coordinates(self) -> Tuple[int, int]:
+        """Generate random coordinates within browser content area"""
+        content_left, content_top, content_right, content_bottom = (
+            self._get_browser_content_area()
+        )
+
+        x = random.randint(content_left, content_right - 1)
+        y = random.randint(content_top, content_bottom - 1)
+        return x, y
+
+    def perform_human_like_activity(self) -> None:
+        """Perform realistic human-like browsing behavior"""
+        logging.debug(
+            "perform_human_like_activity: Starting comprehensive human-like browsing simulation"
+        )
+
+        # Simulate reading the page content
+        logging.debug("perform_human_like_activity: Phase 1 - Simulating page reading")
+        self._simulate_reading_pattern()
+
+        # Natural scrolling behavior
+        logging.debug(
+            "perform_human_like_activity: Phase 2 - Simulating natural scrolling"
+        )
+        self._simulate_natural_scrolling()
+
+        logging.debug(
+            "perform_human_like_activity: All human-like browsing simulation phases complete"
+        )
+
+    def _simulate_reading_pattern(self) -> None:
+        """Simulate reading text in a natural left-to-right, top-to-bottom pattern"""
+        content_left, content_top, content_right, content_bottom = (
+            self._get_browser_content_area()
+        )
+
+        # Start from top-left area of browser content where text typically begins
+        start_x = content_left + 50  # Small margin from left edge
+        start_y = content_top + 50  # Small margin from top
+        logging.debug(
+            "_simulate_reading_pattern: Starting reading simulation at (%s, %s)",
+            start_x,
+            start_y,
+        )
+
+        # Simulate reading 3-4 lines of text
+        num_lines = random.randint(1, 2)
+        line_height = 25  # Approximate line height in pixels
+        logging.debug(
+            "_simulate_reading_pattern: Will simulate reading %s lines", num_lines
+        )
+
+        for line in range(num_lines):
+            y_pos = start_y + (line * line_height)
+            logging.debug(
+                "_simulate_reading_pattern: Reading line %s at y=%s", line + 1, y_pos
+            )
+
+            # Move to start of line with natural movement
+            duration = random.uniform(0.3, 0.8)
+            logging.debug(
+                "_simulate_reading_pattern: Moving to line start with duration %.2fs",
+                duration,
+            )
+            pyautogui.moveTo(start_x, y_pos, duration=duration)
+
+            pause_time = random.uniform(0.1, 0.3)
+            logging.debug(
+                "_simulate_reading_pattern: Pausing %.2fs at line start", pause_time
+            )
+            clock.sleep(pause_time)  # Brief pause at line start
+
+            # Read across the line (simulate eye movement) - stay within browser bounds
+            max_line_length = min(600, content_right - start_x - 50)
+            end_x = start_x + random.randint(300, max_line_length)
+            read_duration = random.uniform(0.5, 1.2)
+            logging.debug(
+                "_simulate_reading_pattern: Reading across line to x=%s with duration %.2fs",
+                end_x,
+                read_duration,
+            )
+            pyautogui.moveTo(end_x, y_pos, duration=read_duration)
+
+            # Pause at end of line (reading time)
+            read_time = random.uniform(0.8, 1.5)
+            logging.debug(
+                "_simulate_reading_pattern: Reading pause of %.2fs at line end",
+                read_time,
+            )
+            clock.sleep(read_time)
+
+        logging.debug("_simulate_reading_pattern: Reading pattern simulation complete")
+
+    def _simulate_natural_scrolling(self) -> None:
+        """Simulate natural scrolling behavior while reading"""
+        num_scrolls = random.randint(1, 2)
+        logging.debug(
+            "_simulate_natural_scrolling: Will perform %s scroll actions", num_scrolls
+        )
+
+        for i in range(num_scrolls):
+            logging.debug(
+                "_simulate_natural_scrolling: Scroll action %s/%s", i + 1, num_scrolls
+            )
+
+            # Move to a random position within browser before scrolling (more natural)
+            duration = random.uniform(0.3, 0.8)
+            logging.debug(
+                "_simulate_natural_scrolling: Moving to random position with duration %.2fs",
+                duration,
+            )
+            # Generate random coordinates within browser bounds
+            rand_x, rand_y = self.generate_random_coordinates()
+
+            pyautogui.moveTo(rand_x, rand_y, duration=duration)
+
+            move_pause = random.uniform(0.2, 0.5)
+            logging.debug(
+                "_simulate_natural_scrolling: Pausing %.2fs before scrolling",
+                move_pause,
+            )
+            clock.sleep(move_pause)
+
+            # Small scroll amounts like a human reading
+            scroll_amount = random.randint(3, 12)
+            logging.debug(
+                "_simulate_natural_scrolling: Scrolling down %s pixels", scroll_amount
+            )
+            pyautogui.scroll(-scroll_amount)  # Negative for scrolling down
+
+            # Pause to "read" the new content
+            reading_time = random.uniform(1.5, 3.0)
+            logging.debug(
+                "_simulate_natural_scrolling: Reading pause of %.2fs", reading_time
+            )
+            clock.sleep(reading_time)
+
+            # Occasionally scroll back up slightly (like re-reading)
+            if random.random() < 0.3:
+                back_scroll = random.randint(3, 12)
+                logging.debug(
+                    "_simulate_natural_scrolling: Re-reading - scrolling back up %s pixels",
+                    back_scroll,
+                )
+                pyautogui.scroll(back_scroll)
+
+                reread_time = random.uniform(0.5, 1.0)
+                logging.debug(
+                    "_simulate_natural_scrolling: Re-reading pause of %.2fs",
+                    reread_time,
+                )
+                clock.sleep(reread_time)
+            else:
+                logging.debug("_simulate_natural_scrolling: No re-reading this time")
+
+        logging.debug(
+            "_simulate_natural_scrolling: Natural scrolling simulation complete"
+        )
+
+    def _random_wait(
+        self, base: float = 5, jitter: float = 5, max_wait: float = 30
+    ) -> None:
+        """Private method for random wait times"""
+        wait_time = calculate_wait_time(base, jitter, max_wait)
+        logging.debug("Sleeping for %.2f seconds", wait_time)
+        with span(Phase.WAIT):
+            clock.sleep(wait_time)
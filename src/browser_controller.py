@@ -1,23 +1,46 @@
+import importlib
 import logging
 import os
 import random
 import shutil
-import subprocess
-import time
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple
-
-import pyautogui
+from typing import Optional
 
+import clock
 from constants import (
-    BRAVE_BROWSER_COMMAND,
-    BROWSER_OPEN_WAIT,
-    DEFAULT_URL,
-    KEYBOARD_DELAY,
-    PAGE_LOAD_BASE_WAIT,
-    PAGE_LOAD_JITTER,
-    SAVE_WAIT,
-    USER_DATA_DIR,
+    PROFILE_CLOSE_POLL,
+    PROFILE_CLOSE_TIMEOUT,
+    PROFILE_TEMPLATE_DIR,
+)
+from metrics import Phase, span
+from page_classifier import PageClass, classify_file
+from page_slimmer import slim_page
+
+# Left out of profile templates: lock files and sockets belong to the browser
+# that wrote the profile, and cookies, history, caches and site storage would
+# make every fresh profile look like a returning visitor
+PROFILE_TEMPLATE_EXCLUDES = (
+    "Singleton*",
+    "*.lock",
+    "lockfile",
+    "Cookies*",
+    "History*",
+    "Visited Links",
+    "Top Sites*",
+    "Web Data*",
+    "Network",
+    "Network Persistent State",
+    "TransportSecurity",
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "Service Worker",
+    "Local Storage",
+    "Session Storage",
+    "IndexedDB",
+    "Sessions",
+    "Current *",
+    "Last *",
 )
 
 
@@ -28,6 +51,67 @@ def calculate_wait_time(
     return min(base + random.expovariate(1 / jitter), max_wait)
 
 
+def reset_user_data_dir(
+    user_data_dir: str, template_dir: Optional[str] = PROFILE_TEMPLATE_DIR
+) -> str:
+    """Replace the browser profile with a copy of the template and return its path.
+
+    Without a template the profile starts empty, and the browser has to build
+    it from nothing on launch.
+    """
+    user_data_dir = os.path.abspath(user_data_dir)
+
+    # Delete the brave_manual_profile folder and all its contents if it exists
+    if os.path.exists(user_data_dir):
+        logging.info("reset_user_data_dir: Cleaning up existing user data directory")
+        shutil.rmtree(user_data_dir)
+
+    if template_dir and os.path.isdir(template_dir):
+        shutil.copytree(template_dir, user_data_dir, symlinks=True)
+        logging.info("reset_user_data_dir: Copied profile template %s", template_dir)
+    else:
+        os.makedirs(user_data_dir, exist_ok=True)
+        logging.info(
+            "reset_user_data_dir: Created user data directory at %s", user_data_dir
+        )
+    return user_data_dir
+
+
+def wait_for_profile_closed(
+    user_data_dir: str,
+    timeout: float = PROFILE_CLOSE_TIMEOUT,
+    poll_interval: float = PROFILE_CLOSE_POLL,
+) -> bool:
+    """Wait for the browser to release its profile, False if it still holds it.
+
+    The browser keeps a SingletonLock link in the profile until it exits,
+    and closing it with a keystroke returns before that.
+    """
+    lock_path = os.path.join(user_data_dir, "SingletonLock")
+    deadline = clock.now() + timeout
+    while os.path.lexists(lock_path):
+        if clock.now() >= deadline:
+            return False
+        clock.sleep(poll_interval)
+    return True
+
+
+def save_profile_template(user_data_dir: str, template_dir: str) -> None:
+    """Keep a closed browser profile, minus its browsing state, as the template"""
+    temp_dir = f"{template_dir}.tmp"
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+
+    shutil.copytree(
+        user_data_dir,
+        temp_dir,
+        symlinks=True,
+        ignore=shutil.ignore_patterns(*PROFILE_TEMPLATE_EXCLUDES),
+    )
+    os.replace(temp_dir, template_dir)
+    logging.info("save_profile_template: Saved profile template to %s", template_dir)
+
+
 class BrowserController(ABC):
     """Abstract interface for browser operations"""
 
@@ -56,376 +140,110 @@ class BrowserController(ABC):
         pass
 
 
-class BraveBrowserController(BrowserController):
-    """Concrete implementation for Brave browser automation"""
+class DelegatingBrowserController(BrowserController):
+    """Passes every call to a wrapped controller; wrappers override what they change"""
 
-    def __init__(self, initial_url: str = DEFAULT_URL):
-        """Initialize with configurable starting URL"""
-        self.initial_url = initial_url
-        self.browser_bounds: Optional[Tuple[int, int, int, int]] = None
+    def __init__(self, controller: BrowserController):
+        self.controller = controller
 
-    def open_browser(self) -> None:
-        logging.info("open_browser: Starting browser initialization")
-        user_data_dir = os.path.abspath(USER_DATA_DIR)
+    def __getattr__(self, name: str):
+        # Profile paths and other attributes stay visible to BrowserSession
+        return getattr(self.controller, name)
 
-        # Delete the brave_manual_profile folder and all its contents if it exists
-        if os.path.exists(user_data_dir):
-            logging.info("open_browser: Cleaning up existing user data directory")
-            shutil.rmtree(user_data_dir)
+    def open_browser(self) -> None:
+        self.controller.open_browser()
 
-        os.makedirs(user_data_dir, exist_ok=True)
-        logging.info(f"open_browser: Created user data directory at {user_data_dir}")
+    def perform_initial_setup(self) -> None:
+        self.controller.perform_initial_setup()
 
-        # Launch Brave with a profile
-        logging.info(
-            f"open_browser: Launching Brave browser with URL {self.initial_url}"
-        )
-        subprocess.Popen(
-            [
-                BRAVE_BROWSER_COMMAND,
-                "--user-data-dir=" + user_data_dir,
-                self.initial_url,
-            ]
-        )
+    def close_browser(self) -> None:
+        self.controller.close_browser()
 
-        logging.info(
-            f"open_browser: Waiting {BROWSER_OPEN_WAIT} seconds for browser to start"
-        )
-        time.sleep(BROWSER_OPEN_WAIT)
+    def navigate_to(self, url: str) -> None:
+        self.controller.navigate_to(url)
 
-        # Detect browser window after launch
-        self._detect_browser_window()
-        logging.info("open_browser: Browser initialization complete")
+    def save_page(self, filepath: str) -> None:
+        self.controller.save_page(filepath)
 
-    def perform_initial_setup(self) -> None:
-        """Perform initial human-like browsing setup after browser is opened"""
-        logging.info(
-            "perform_initial_setup: Beginning initial human-like browsing simulation"
-        )
+    def perform_human_like_activity(self) -> None:
+        self.controller.perform_human_like_activity()
 
-        # Brief initial browsing simulation
-        logging.info("perform_initial_setup: Simulating initial reading pattern")
-        self._simulate_reading_pattern()
 
-        wait_time = random.uniform(0.5, 1.5)
-        logging.info(
-            f"perform_initial_setup: Pausing for {wait_time:.2f} seconds between activities"
-        )
-        time.sleep(wait_time)
+class InstrumentedBrowserController(DelegatingBrowserController):
+    """Times every call of the wrapped controller as its own phase"""
 
-        logging.info("perform_initial_setup: Simulating initial natural scrolling")
-        self._simulate_natural_scrolling()
+    def open_browser(self) -> None:
+        with span(Phase.OPEN_BROWSER):
+            super().open_browser()
 
-        logging.info("perform_initial_setup: Initial setup complete")
-        time.sleep(1)
+    def perform_initial_setup(self) -> None:
+        with span(Phase.INITIAL_SETUP):
+            super().perform_initial_setup()
 
     def close_browser(self) -> None:
-        logging.info("close_browser")
-        pyautogui.hotkey("alt", "f4")
+        with span(Phase.CLOSE_BROWSER):
+            super().close_browser()
 
     def navigate_to(self, url: str) -> None:
-        logging.info(f"navigate_to: Navigating to {url}")
-
-        # Use keyboard shortcut to focus the address bar
-        logging.info("navigate_to: Focusing address bar with Ctrl+L")
-        pyautogui.hotkey("ctrl", "l")
-        time.sleep(KEYBOARD_DELAY)
-
-        # Clear any existing text and search for the URL
-        logging.info("navigate_to: Clearing existing text and entering URL")
-        pyautogui.hotkey("ctrl", "a")
-        time.sleep(KEYBOARD_DELAY)
-        pyautogui.write(url)
-        time.sleep(KEYBOARD_DELAY)
-
-        logging.info("navigate_to: Pressing Enter to navigate")
-        pyautogui.press("enter")
-
-        # Wait for page to load
-        logging.info("navigate_to: Waiting for page to load")
-        self._random_wait(base=PAGE_LOAD_BASE_WAIT, jitter=PAGE_LOAD_JITTER)
-        logging.info("navigate_to: Navigation complete")
+        with span(Phase.NAVIGATE):
+            super().navigate_to(url)
 
     def save_page(self, filepath: str) -> None:
-        logging.info(f"save_page: Saving page to {filepath}")
+        with span(Phase.SAVE):
+            super().save_page(filepath)
 
-        logging.info("save_page: Opening save dialog with Ctrl+S")
-        content_left, content_top, content_right, content_bottom = (
-            self._get_browser_content_area()
-        )
+    def perform_human_like_activity(self) -> None:
+        with span(Phase.HUMAN_ACTIVITY):
+            super().perform_human_like_activity()
 
-        # Start from top-left area of browser content where text typically begins
-        start_x = content_left + 50  # Small margin from left edge
-        start_y = content_top + 50  # Small margin from top
-        pyautogui.moveTo(start_x, start_y, duration=0.4)
-
-        logging.info("save_page: Right clicked")
-        pyautogui.rightClick()  # Ensure browser is focused
-        pyautogui.rightClick()  # Ensure browser is focused
-        pyautogui.hotkey("ctrl", "s")
-
-        # Ensure the save dialog is in focus
-        middle_x = (content_left + content_right) // 2
-        middle_y = (content_top + content_bottom) // 2
-        pyautogui.moveTo(middle_x - 60, middle_y - 60, duration=0.5)
-        pyautogui.rightClick()
-        pyautogui.rightClick()
-
-        absolute_filepath = os.path.abspath(filepath)
-        logging.info(f"save_page: Using absolute path: {absolute_filepath}")
-
-        # Type the full file path and save
-        logging.info("save_page: Entering file path")
-        pyautogui.hotkey("ctrl", "l")
-        pyautogui.hotkey("ctrl", "a")
-        time.sleep(KEYBOARD_DELAY)
-        pyautogui.write(absolute_filepath)
-
-        # Select HTML only option
-        logging.info("save_page: Navigating to HTML-only save format")
-        # Navigate to format dropdown
-        pyautogui.hotkey("shift", "tab")
-        pyautogui.hotkey("shift", "tab")
-        # Select HTML only option
-        pyautogui.press("enter")
-        pyautogui.press("down")
-        pyautogui.press("up")
-        pyautogui.press("enter")
-        # Navigate to Save button
-        pyautogui.press("tab")
-        pyautogui.press("tab")
-        pyautogui.press("tab")
-        pyautogui.press("tab")
-        pyautogui.press("enter")
-
-        # Press Save
-        logging.info("save_page: Confirming save operation")
-        pyautogui.press("enter")
-
-        # Wait for save to finish before next page
-        logging.info(f"save_page: Waiting {SAVE_WAIT} seconds for save to complete")
-        time.sleep(SAVE_WAIT)
-        logging.info("save_page: Save operation complete")
-
-    def _detect_browser_window(self) -> None:
-        """Detect and store browser window bounds using wmctrl"""
-        try:
-            # Use wmctrl to get window geometry
-            result = subprocess.run(
-                ["wmctrl", "-lG"], capture_output=True, text=True, check=True
-            )
-
-            # Parse wmctrl output to find browser window
-            # Format: window_id desktop x y width height client_machine window_title
-            for line in result.stdout.strip().split("\n"):
-                if line and ("Brave" in line or "Mozilla" in line or "Chrome" in line):
-                    parts = line.split(None, 7)  # Split into max 8 parts
-                    if len(parts) >= 6:
-                        try:
-                            x, y, width, height = map(int, parts[2:6])
-                            self.browser_bounds = (x, y, x + width, y + height)
-                            logging.info(
-                                f"_detect_browser_window: Found browser window at {self.browser_bounds}"
-                            )
-                            return
-                        except ValueError:
-                            continue
-
-            # No browser window found
-            logging.warning(
-                "_detect_browser_window: No browser window found, using full screen"
-            )
-            screen_width, screen_height = pyautogui.size()
-            self.browser_bounds = (0, 0, screen_width, screen_height)
-
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            logging.error(f"_detect_browser_window: wmctrl error: {e}")
-            screen_width, screen_height = pyautogui.size()
-            self.browser_bounds = (0, 0, screen_width, screen_height)
-        except Exception as e:
-            logging.error(f"_detect_browser_window: Unexpected error: {e}")
-            screen_width, screen_height = pyautogui.size()
-            self.browser_bounds = (0, 0, screen_width, screen_height)
-
-    def _get_browser_content_area(self) -> Tuple[int, int, int, int]:
-        """Get the content area of the browser (excluding title bar and toolbars)"""
-        if not self.browser_bounds:
-            self._detect_browser_window()
-
-        if self.browser_bounds:
-            left, top, right, bottom = self.browser_bounds
-            # Add margins to avoid title bar, address bar, and scrollbars
-            content_left = left + 20
-            content_top = top + 100  # Account for title bar and address bar
-            content_right = right - 20  # Account for scrollbar
-            content_bottom = bottom - 50  # Account for status bar
-
-            # Ensure we have a valid area
-            if content_right > content_left and content_bottom > content_top:
-                return content_left, content_top, content_right, content_bottom
-
-        # Fallback to screen center area
-        screen_width, screen_height = pyautogui.size()
-        return (
-            int(screen_width * 0.1),
-            int(screen_height * 0.1),
-            int(screen_width * 0.9),
-            int(screen_height * 0.9),
-        )
 
-    def generate_random_coordinates(self) -> Tuple[int, int]:
-        """Generate random coordinates within browser content area"""
-        content_left, content_top, content_right, content_bottom = (
-            self._get_browser_content_area()
-        )
+class RateLimitedBrowserController(DelegatingBrowserController):
+    """Takes a token from a shared bucket before each page load of the wrapped controller"""
 
-        x = random.randint(content_left, content_right - 1)
-        y = random.randint(content_top, content_bottom - 1)
-        return x, y
+    def __init__(self, controller: BrowserController, bucket):
+        super().__init__(controller)
+        self.bucket = bucket
 
-    def perform_human_like_activity(self) -> None:
-        """Perform realistic human-like browsing behavior"""
-        logging.info(
-            "perform_human_like_activity: Starting comprehensive human-like browsing simulation"
-        )
+    def navigate_to(self, url: str) -> None:
+        with span(Phase.WAIT):
+            self.bucket.acquire()
+        super().navigate_to(url)
 
-        # Simulate reading the page content
-        logging.info("perform_human_like_activity: Phase 1 - Simulating page reading")
-        self._simulate_reading_pattern()
 
-        # Natural scrolling behavior
-        logging.info(
-            "perform_human_like_activity: Phase 2 - Simulating natural scrolling"
-        )
-        self._simulate_natural_scrolling()
+class SlimmingBrowserController(DelegatingBrowserController):
+    """Slims each listings page the wrapped controller saves, timing it as its own phase.
 
-        logging.info(
-            "perform_human_like_activity: All human-like browsing simulation phases complete"
-        )
+    Error and no-results pages are small, and are left whole so they can
+    still be classified and inspected.
+    """
 
-    def _simulate_reading_pattern(self) -> None:
-        """Simulate reading text in a natural left-to-right, top-to-bottom pattern"""
-        content_left, content_top, content_right, content_bottom = (
-            self._get_browser_content_area()
-        )
+    def __init__(self, controller: BrowserController, mode: str):
+        super().__init__(controller)
+        self.mode = mode
 
-        # Start from top-left area of browser content where text typically begins
-        start_x = content_left + 50  # Small margin from left edge
-        start_y = content_top + 50  # Small margin from top
-        logging.info(
-            f"_simulate_reading_pattern: Starting reading simulation at ({start_x}, {start_y})"
-        )
+    def save_page(self, filepath: str) -> None:
+        super().save_page(filepath)
+        with span(Phase.SLIM):
+            if classify_file(filepath) == PageClass.LISTINGS:
+                slim_page(filepath, self.mode)
 
-        # Simulate reading 3-4 lines of text
-        num_lines = random.randint(1, 2)
-        line_height = 25  # Approximate line height in pixels
-        logging.info(
-            f"_simulate_reading_pattern: Will simulate reading {num_lines} lines"
-        )
 
-        for line in range(num_lines):
-            y_pos = start_y + (line * line_height)
-            logging.info(
-                f"_simulate_reading_pattern: Reading line {line + 1} at y={y_pos}"
-            )
-
-            # Move to start of line with natural movement
-            duration = random.uniform(0.3, 0.8)
-            logging.info(
-                f"_simulate_reading_pattern: Moving to line start with duration {duration:.2f}s"
-            )
-            pyautogui.moveTo(start_x, y_pos, duration=duration)
-
-            pause_time = random.uniform(0.1, 0.3)
-            logging.info(
-                f"_simulate_reading_pattern: Pausing {pause_time:.2f}s at line start"
-            )
-            time.sleep(pause_time)  # Brief pause at line start
-
-            # Read across the line (simulate eye movement) - stay within browser bounds
-            max_line_length = min(600, content_right - start_x - 50)
-            end_x = start_x + random.randint(300, max_line_length)
-            read_duration = random.uniform(0.5, 1.2)
-            logging.info(
-                f"_simulate_reading_pattern: Reading across line to x={end_x} with duration {read_duration:.2f}s"
-            )
-            pyautogui.moveTo(end_x, y_pos, duration=read_duration)
-
-            # Pause at end of line (reading time)
-            read_time = random.uniform(0.8, 1.5)
-            logging.info(
-                f"_simulate_reading_pattern: Reading pause of {read_time:.2f}s at line end"
-            )
-            time.sleep(read_time)
-
-        logging.info("_simulate_reading_pattern: Reading pattern simulation complete")
-
-    def _simulate_natural_scrolling(self) -> None:
-        """Simulate natural scrolling behavior while reading"""
-        num_scrolls = random.randint(1, 2)
-        logging.info(
-            f"_simulate_natural_scrolling: Will perform {num_scrolls} scroll actions"
-        )
+# Concrete controllers by name. Each is imported only when first asked for,
+# so tools that never drive a browser need neither pyautogui nor a display.
+CONTROLLER_CLASSES = {
+    "brave": ("brave_controller", "BraveBrowserController"),
+    "devtools": ("devtools_controller", "DevToolsBrowserController"),
+}
 
-        for i in range(num_scrolls):
-            logging.info(
-                f"_simulate_natural_scrolling: Scroll action {i + 1}/{num_scrolls}"
-            )
-
-            # Move to a random position within browser before scrolling (more natural)
-            duration = random.uniform(0.3, 0.8)
-            logging.info(
-                f"_simulate_natural_scrolling: Moving to random position with duration {duration:.2f}s"
-            )
-            # Generate random coordinates within browser bounds
-            rand_x, rand_y = self.generate_random_coordinates()
-
-            pyautogui.moveTo(rand_x, rand_y, duration=duration)
-
-            move_pause = random.uniform(0.2, 0.5)
-            logging.info(
-                f"_simulate_natural_scrolling: Pausing {move_pause:.2f}s before scrolling"
-            )
-            time.sleep(move_pause)
-
-            # Small scroll amounts like a human reading
-            scroll_amount = random.randint(3, 12)
-            logging.info(
-                f"_simulate_natural_scrolling: Scrolling down {scroll_amount} pixels"
-            )
-            pyautogui.scroll(-scroll_amount)  # Negative for scrolling down
-
-            # Pause to "read" the new content
-            reading_time = random.uniform(1.5, 3.0)
-            logging.info(
-                f"_simulate_natural_scrolling: Reading pause of {reading_time:.2f}s"
-            )
-            time.sleep(reading_time)
-
-            # Occasionally scroll back up slightly (like re-reading)
-            if random.random() < 0.3:
-                back_scroll = random.randint(3, 12)
-                logging.info(
-                    f"_simulate_natural_scrolling: Re-reading - scrolling back up {back_scroll} pixels"
-                )
-                pyautogui.scroll(back_scroll)
-
-                reread_time = random.uniform(0.5, 1.0)
-                logging.info(
-                    f"_simulate_natural_scrolling: Re-reading pause of {reread_time:.2f}s"
-                )
-                time.sleep(reread_time)
-            else:
-                logging.info("_simulate_natural_scrolling: No re-reading this time")
 
-        logging.info(
-            "_simulate_natural_scrolling: Natural scrolling simulation complete"
-        )
+def controller_class(name: str) -> type:
+    """The BrowserController subclass registered under name, imported on demand"""
+    module_name, class_name = CONTROLLER_CLASSES[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
 
-    def _random_wait(
-        self, base: float = 5, jitter: float = 5, max_wait: float = 30
-    ) -> None:
-        """Private method for random wait times"""
-        wait_time = calculate_wait_time(base, jitter, max_wait)
-        logging.info(f"Sleeping for {wait_time:.2f} seconds")
-        time.sleep(wait_time)
+def __getattr__(name: str):
+    # BraveBrowserController lived here; importing it still works, lazily
+    if name == "BraveBrowserController":
+        return controller_class("brave")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,113 @@
+import logging
+import os
+import shutil
+
+from browser_controller import (
+    BrowserController,
+    save_profile_template,
+    wait_for_profile_closed,
+)
+from constants import SESSION_MAX_PAGES
+
+
+class BrowserSession(BrowserController):
+    """Keeps one browser open across postcodes, restarting it only when needed.
+
+    The wrapped controller is launched lazily and relaunched after
+    max_pages navigations or after any browser call raises. Opening an
+    already open session is free, so callers can open it once per postcode.
+    """
+
+    def __init__(
+        self, controller: BrowserController, max_pages: int = SESSION_MAX_PAGES
+    ):
+        self.controller = controller
+        self.max_pages = max_pages
+        self.is_open = False
+        self.pages_since_start = 0
+        self.launches = 0
+
+    def open_browser(self) -> None:
+        if self.is_open:
+            return
+        self.controller.open_browser()
+        try:
+            self.controller.perform_initial_setup()
+        except Exception:
+            self.controller.close_browser()
+            raise
+        self.is_open = True
+        self.pages_since_start = 0
+        self.launches += 1
+        logging.info(f"open_browser: Session launch {self.launches}")
+
+    def perform_initial_setup(self) -> None:
+        """Setup already runs as part of each launch"""
+
+    def close_browser(self) -> None:
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.controller.close_browser()
+        self._save_template_once()
+
+    def restart(self) -> None:
+        logging.info(f"restart: Restarting after {self.pages_since_start} pages")
+        self.close_browser()
+        self.open_browser()
+
+    def discard(self) -> None:
+        """Close a browser in an unknown state so the next use relaunches it.
+
+        Its profile is not kept as a template, since it may be what broke.
+        """
+        if not self.is_open:
+            return
+        self.is_open = False
+        try:
+            self.controller.close_browser()
+        except Exception as e:
+            logging.warning(f"discard: Failed to close browser cleanly: {e}")
+
+    def navigate_to(self, url: str) -> None:
+        if self.is_open and self.pages_since_start >= self.max_pages:
+            self.restart()
+        self.open_browser()
+        self.pages_since_start += 1
+        self._call(self.controller.navigate_to, url)
+
+    def save_page(self, filepath: str) -> None:
+        self._call(self.controller.save_page, filepath)
+
+    def perform_human_like_activity(self) -> None:
+        self._call(self.controller.perform_human_like_activity)
+
+    def _call(self, method, *args) -> None:
+        try:
+            method(*args)
+        except Exception:
+            logging.error("_call: Browser call failed, relaunching on next use")
+            self.discard()
+            raise
+
+    def _save_template_once(self) -> None:
+        """Keep the first profile a launch built, so later launches copy it.
+
+        Only settings are kept, never cookies, history or caches, and only
+        once the browser has exited, since copying a profile it is still
+        writing gives a torn template.
+        """
+        user_data_dir = getattr(self.controller, "user_data_dir", None)
+        template_dir = getattr(self.controller, "template_dir", None)
+        if not user_data_dir or not template_dir or os.path.isdir(template_dir):
+            return
+        if not os.path.isdir(user_data_dir):
+            return
+        if not wait_for_profile_closed(user_data_dir):
+            logging.warning("_save_template_once: Browser still holds its profile")
+            return
+        # The template only saves startup time, so a failed copy is not fatal
+        try:
+            save_profile_template(user_data_dir, template_dir)
+        except (OSError, shutil.Error) as e:
+            logging.warning(f"_save_template_once: Could not save template: {e}")
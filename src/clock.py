@@ -0,0 +1,85 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class Clock(ABC):
+    """Source of wall time, elapsed time and sleeps for the scrape loop"""
+
+    @abstractmethod
+    def time(self) -> float:
+        pass
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        pass
+
+    @abstractmethod
+    def sleep(self, seconds: float) -> None:
+        pass
+
+
+class SystemClock(Clock):
+    """The real clock"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """Clock whose sleeps return at once but move simulated time forward.
+
+    Work that takes real time, such as writing pages, is not counted, so
+    elapsed only covers what was slept or explicitly advanced.
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = start if start is not None else time.time()
+        self.elapsed = 0.0
+        self.slept = 0.0
+
+    def time(self) -> float:
+        return self.start + self.elapsed
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+    def sleep(self, seconds: float) -> None:
+        seconds = max(seconds, 0.0)
+        self.elapsed += seconds
+        self.slept += seconds
+
+    def advance(self, seconds: float) -> None:
+        """Account for simulated work that is not a deliberate pause"""
+        self.elapsed += max(seconds, 0.0)
+
+
+_clock: Clock = SystemClock()
+
+
+def install_clock(clock: Clock) -> None:
+    """Use clock for every sleep and timestamp in the scrape loop"""
+    global _clock
+    _clock = clock
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def now() -> float:
+    return _clock.time()
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+def sleep(seconds: float) -> None:
+    _clock.sleep(seconds)
@@ -1,6 +1,7 @@
 # Configuration constants
 BRAVE_BROWSER_COMMAND = "brave-browser"
 USER_DATA_DIR = "./brave_manual_profile"
+PROFILE_TEMPLATE_DIR = "./brave_profile_template"
 DEFAULT_URL = "https://en.wikipedia.org/wiki/World_War_II"
 BASE_URL = "https://www.realestate.com.au/"
 SEARCH_URL_TEMPLATE = "https://www.realestate.com.au/buy/in-{postcode}/list-{page_num}?includeSurrounding=false&activeSort=list-date"
@@ -13,9 +14,106 @@ MIN_POSTCODE = "2008"
 BROWSER_OPEN_WAIT = 2.5
 PAGE_LOAD_BASE_WAIT = 2
 PAGE_LOAD_JITTER = 1
-SAVE_WAIT = 2
+SAVE_TIMEOUT = 30
+SAVE_SETTLE_TIME = 0.3
+SAVE_POLL_INITIAL = 0.05
+SAVE_POLL_MAX = 1.0
 ITERATION_WAIT = 1.6
 
 # Browser automation timing constants
 KEYBOARD_DELAY = 0.1
 SAVE_DIALOG_WAIT = 1.0
+
+# Page scanning constants
+STOP_MARKER = "ResidentialCard"
+SCAN_CHUNK_SIZE = 64 * 1024
+SCAN_MAX_WORKERS = 8
+
+# Page classification constants
+PAGE_MIN_BYTES = 4 * 1024
+PAGE_TAIL_BYTES = 1024
+PAGE_RETRY_LIMIT = 3
+
+# Page slimming constants
+SLIM_SUFFIX = ".slim.html"
+
+# Extraction constants
+EXTRACTED_LISTINGS_FILE = "extracted_listings.jsonl"
+EXTRACT_BATCH_SIZE = 16
+
+# Listing store constants
+LISTING_STORE_FILE = "listings.sqlite3"
+INGEST_COMMIT_FILES = 500
+DEDUP_LOOKUP_BATCH = 500
+
+# Analytics constants
+ANALYTICS_ROLLUP_DIR = "listing_rollups"
+
+# Listing columns constants
+COLUMNS_LOAD_BATCH = 100_000
+
+# Query service constants
+QUERY_SERVICE_PORT = 8765
+QUERY_LISTEN_BACKLOG = 512
+QUERY_STORE_CONNECTIONS = 8
+QUERY_CONNECTION_TIMEOUT = 5
+QUERY_CACHE_ENTRIES = 256
+QUERY_CACHE_MAX_BODY = 1024 * 1024
+QUERY_STREAM_CHUNK = 64 * 1024
+
+# Incremental scrape constants
+INCREMENTAL_OVERLAP_PAGES = 1
+FULL_CRAWL_INTERVAL_DAYS = 7
+
+# Scheduler constants
+SCHEDULE_SUFFIX = "_schedule.json"
+SCHEDULE_BUDGET_PAGES = 2500
+SCHEDULE_HISTORY_DAYS = 28
+SCHEDULE_MAX_INTERVAL_DAYS = 7
+SCHEDULE_SECONDS_PER_PAGE = 20
+
+# Run ledger constants
+RUN_LOG_SUFFIX = "_run.jsonl"
+# An unfinished run older than this is abandoned rather than resumed
+RUN_RESUME_MAX_DAYS = 2
+
+# Page archive constants
+ARCHIVE_DIR = "html_pages/archive"
+ARCHIVE_DICTIONARY_SIZE = 32 * 1024
+ARCHIVE_DICTIONARY_SAMPLES = 50
+ARCHIVE_COMPRESSION_LEVEL = 9
+
+# DevTools protocol constants
+DEVTOOLS_HOST = "127.0.0.1"
+DEVTOOLS_PORT = 9222
+DEVTOOLS_STARTUP_TIMEOUT = 15
+PAGE_LOAD_TIMEOUT = 30
+
+# Browser session constants
+SESSION_MAX_PAGES = 200
+PROFILE_CLOSE_TIMEOUT = 10
+PROFILE_CLOSE_POLL = 0.2
+
+# Worker pool constants
+WORKER_REQUESTS_PER_MINUTE = 6
+WORKER_DISPLAY_BASE = 90
+WORKER_POLL_INTERVAL = 5
+XVFB_COMMAND = "Xvfb"
+XVFB_SCREEN = "1920x1080x24"
+XVFB_STARTUP_TIMEOUT = 10
+
+# Work queue constants
+WORK_QUEUE_LEASE_SECONDS = 600
+WORK_QUEUE_BUSY_TIMEOUT = 60
+WORK_QUEUE_POLL_INTERVAL = 30
+# Leases of one postcode before the queue gives up on it for the run
+WORK_QUEUE_MAX_ATTEMPTS = PAGE_RETRY_LIMIT
+
+# Metrics constants
+METRICS_SUFFIX = "_metrics.jsonl"
+# Longest pause between spans still counted as wall time; a longer one is a resume
+METRICS_RESUME_GAP = 300
+
+# Logging constants
+LOG_RING_BUFFER_SIZE = 2000
+DEBUG_DUMP_SUFFIX = "_debug.log"
@@ -0,0 +1,261 @@
+import argparse
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from constants import LISTING_STORE_FILE
+from listing_diff import snapshot_postcodes
+from listing_store import ListingStore
+
+STREET_TYPES = {
+    "avenue": "ave",
+    "av": "ave",
+    "boulevard": "bvd",
+    "circuit": "cct",
+    "close": "cl",
+    "court": "ct",
+    "crescent": "cres",
+    "drive": "dr",
+    "highway": "hwy",
+    "lane": "ln",
+    "parade": "pde",
+    "place": "pl",
+    "road": "rd",
+    "street": "st",
+    "terrace": "tce",
+}
+# Words that name a unit rather than locate it; "Unit 3, 12 King St" is "3/12 King St"
+UNIT_WORDS = {"unit", "apartment", "apt", "flat", "villa", "townhouse", "suite"}
+STATES = {"nsw", "vic", "qld", "sa", "wa", "tas", "nt", "act"}
+ADDRESS_TOKEN_PATTERN = re.compile(r"[a-z]+|\d+[a-z]?")
+VOWELS_PATTERN = re.compile(r"[aeiouy]")
+
+
+@dataclass(frozen=True)
+class DedupRow:
+    """The parts of a stored listing that identify it"""
+
+    rowid: int
+    postcode: str
+    listing_id: str
+    address: str
+    bedrooms: Optional[int]
+    bathrooms: Optional[int]
+    parking: Optional[int]
+
+
+@dataclass
+class DedupSummary:
+    """Counts of what one dedup pass found"""
+
+    listings: int = 0
+    repeats: int = 0
+    relistings: int = 0
+
+
+def normalise_address(address: str) -> List[str]:
+    """Pure function reducing an address to tokens that survive formatting differences.
+
+    Case, punctuation, unit prefixes, street type spelling, the state and
+    the postcode are dropped or made uniform.
+    """
+    tokens = []
+    for token in ADDRESS_TOKEN_PATTERN.findall(address.lower()):
+        if token in UNIT_WORDS or token in STATES:
+            continue
+        if token.isdigit() and len(token) == 4 and tokens:
+            # A trailing postcode; street numbers this long are not seen here
+            continue
+        tokens.append(STREET_TYPES.get(token, token))
+    return tokens
+
+
+def fuzzy_token(token: str) -> str:
+    """Pure function giving a word's consonant skeleton, so misspellings share a key.
+
+    "Parramatta" and "Paramatta" both become "prmt". Numbers are kept
+    exactly, since a different street number is a different property.
+    """
+    if not token[0].isalpha():
+        return token
+    skeleton = token[0] + VOWELS_PATTERN.sub("", token[1:])
+    # Collapse doubled letters
+    return "".join(c for i, c in enumerate(skeleton) if i == 0 or c != skeleton[i - 1])
+
+
+def _hash_key(*parts) -> str:
+    return hashlib.sha1("\x1f".join(map(str, parts)).encode()).hexdigest()[:16]
+
+
+def dedup_keys(row: DedupRow) -> List[str]:
+    """Pure function giving the hashed keys under which a listing can be matched.
+
+    Listings match on their id, or on a fuzzy address in the same postcode
+    with the same bedrooms, bathrooms and parking, which catches a property
+    re-listed under a new id. Addresses without a street number are too vague to
+    match on.
+    """
+    keys = []
+    if row.listing_id:
+        keys.append(_hash_key("id", row.listing_id))
+    tokens = normalise_address(row.address)
+    if any(token[0].isdigit() for token in tokens):
+        keys.append(
+            _hash_key(
+                "address",
+                row.postcode,
+                " ".join(fuzzy_token(token) for token in tokens),
+                row.bedrooms,
+                row.bathrooms,
+                row.parking,
+            )
+        )
+    return keys
+
+
+class DedupIndex:
+    """Hash index from dedup keys to canonical listing ids.
+
+    Each listing is resolved with one lookup per key, so a day is
+    deduplicated in a single pass with no pairwise comparison. Keys are
+    fetched from the store a postcode at a time and cached for the day.
+    The first listing seen under a key owns it, and a listing's id key
+    wins over its address key when they disagree.
+    """
+
+    def __init__(self, store: ListingStore):
+        self.store = store
+        self.known: Dict[str, str] = {}
+        self.new_keys: Dict[str, str] = {}
+
+    def prefetch(self, keys: Iterable[str]) -> None:
+        missing = list({key for key in keys if key not in self.known})
+        self.known.update(self.store.lookup_dedup_keys(missing))
+
+    def resolve(self, listing_id: str, keys: List[str]) -> str:
+        """Canonical id of a listing, registering any of its keys not seen before"""
+        canonical = next((self.known[key] for key in keys if key in self.known), None)
+        canonical = canonical or listing_id
+        if not canonical:
+            return canonical
+        for key in keys:
+            if key not in self.known:
+                self.known[key] = canonical
+                self.new_keys[key] = canonical
+        return canonical
+
+    def take_new_keys(self) -> Dict[str, str]:
+        new_keys, self.new_keys = self.new_keys, {}
+        return new_keys
+
+
+def load_postcode_rows(
+    store: ListingStore, scrape_date: str, postcode: str
+) -> List[DedupRow]:
+    """One postcode's listings of a day in page order, so first sightings win"""
+    rows = store.connection.execute(
+        "SELECT rowid, postcode, listing_id, address, bedrooms, bathrooms, parking"
+        " FROM listings WHERE scrape_date = ? AND postcode = ?"
+        " ORDER BY page_num, position",
+        (scrape_date, postcode),
+    )
+    return [DedupRow(*row) for row in rows]
+
+
+def kept_by_earlier_postcodes(
+    store: ListingStore, scrape_date: str, postcode: str
+) -> Set[str]:
+    """Canonical ids the day's postcodes before postcode already keep"""
+    rows = store.connection.execute(
+        "SELECT canonical_id FROM unique_listings"
+        " WHERE scrape_date = ? AND postcode < ? AND canonical_id != ''",
+        (scrape_date, postcode),
+    )
+    return {row[0] for row in rows}
+
+
+def mark_later_repeats(
+    store: ListingStore, scrape_date: str, postcode: str, kept: Set[str]
+) -> None:
+    """Mark listings of the day's later postcodes that postcode now keeps"""
+    with store.connection:
+        store.connection.executemany(
+            "UPDATE listings SET is_duplicate = 1"
+            " WHERE scrape_date = ? AND postcode > ? AND canonical_id = ?",
+            ((scrape_date, postcode, canonical) for canonical in kept),
+        )
+
+
+def dedupe_day(
+    store: ListingStore, scrape_date: str, postcode: Optional[str] = None
+) -> DedupSummary:
+    """Mark repeats and re-listings among a day's listings in one streaming pass.
+
+    Postcodes are read and written back one at a time, so memory holds a
+    single postcode's rows however large the day. A listing that also
+    turned up in an overlapping search of another postcode that day is
+    kept under the lowest postcode, whichever order postcodes are deduped.
+    """
+    if postcode is None:
+        postcodes = sorted(snapshot_postcodes(store, scrape_date))
+        seen: Set[str] = set()
+    else:
+        postcodes = [postcode]
+        seen = kept_by_earlier_postcodes(store, scrape_date, postcode)
+    repeated_before = set(seen)
+    index = DedupIndex(store)
+    summary = DedupSummary()
+    for current in postcodes:
+        rows = load_postcode_rows(store, scrape_date, current)
+        row_keys = [dedup_keys(row) for row in rows]
+        index.prefetch(key for keys in row_keys for key in keys)
+
+        identities = []
+        for row, keys in zip(rows, row_keys):
+            canonical = index.resolve(row.listing_id, keys)
+            is_duplicate = canonical in seen
+            if canonical:
+                seen.add(canonical)
+            summary.listings += 1
+            summary.repeats += is_duplicate
+            summary.relistings += bool(row.listing_id) and canonical != row.listing_id
+            identities.append((canonical, int(is_duplicate), row.rowid))
+        store.record_dedup(index.take_new_keys(), identities)
+
+    if postcode is not None:
+        mark_later_repeats(store, scrape_date, postcode, seen - repeated_before)
+
+    logging.info(f"dedupe_day: {scrape_date} {summary}")
+    return summary
+
+
+def dedupe_dates(store: ListingStore, scrape_dates: Iterable[str]) -> None:
+    """Dedupe days oldest first, so a listing's canonical id is its earliest sighting"""
+    for scrape_date in sorted(scrape_dates):
+        dedupe_day(store, scrape_date)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Mark repeated and re-listed listings in the listing store"
+    )
+    parser.add_argument("dates", nargs="*", help="YYYYMMDD (default: every date)")
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    args = parser.parse_args()
+
+    with ListingStore(args.store) as store:
+        dates = args.dates or [
+            row[0]
+            for row in store.connection.execute(
+                "SELECT DISTINCT scrape_date FROM listings"
+            )
+        ]
+        dedupe_dates(store, dates)
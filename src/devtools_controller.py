@@ -0,0 +1,354 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import struct
+import subprocess
+import tempfile
+import time
+import urllib.request
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import urlparse
+
+import clock
+from browser_controller import BrowserController, reset_user_data_dir
+from constants import (
+    BRAVE_BROWSER_COMMAND,
+    DEFAULT_URL,
+    DEVTOOLS_HOST,
+    DEVTOOLS_PORT,
+    DEVTOOLS_STARTUP_TIMEOUT,
+    PAGE_LOAD_TIMEOUT,
+    PROFILE_TEMPLATE_DIR,
+    USER_DATA_DIR,
+)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+# Pages saved through the browser's own dialog get the usual file mode
+SAVED_PAGE_MODE = 0o644
+
+
+class DevToolsError(Exception):
+    """Raised when the browser rejects a DevTools command or stops responding"""
+
+
+def websocket_accept_key(key: str) -> str:
+    """Pure function computing the Sec-WebSocket-Accept value for a handshake key"""
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool = True) -> bytes:
+    """Pure function to encode a single final WebSocket frame"""
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack("!H", length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack("!Q", length)
+
+    if not mask:
+        return header + payload
+    masking_key = os.urandom(4)
+    masked = bytes(byte ^ masking_key[i % 4] for i, byte in enumerate(payload))
+    return header + masking_key + masked
+
+
+class WebSocketConnection:
+    """Minimal RFC 6455 client, enough for the DevTools protocol's text messages"""
+
+    def __init__(self, url: str, timeout: float):
+        parsed = urlparse(url)
+        self.sock = socket.create_connection(
+            (parsed.hostname, parsed.port or 80), timeout=timeout
+        )
+        self._buffer = bytearray()
+        self._handshake(parsed.netloc, parsed.path or "/")
+
+    def _handshake(self, host: str, path: str) -> None:
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.sock.sendall(request.encode())
+
+        while b"\r\n\r\n" not in self._buffer:
+            self._fill()
+        head, rest = bytes(self._buffer).split(b"\r\n\r\n", 1)
+        self._buffer = bytearray(rest)
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        if " 101 " not in f"{status_line} ":
+            raise DevToolsError(f"WebSocket upgrade refused: {status_line}")
+        headers = {
+            name.strip().lower(): value.strip()
+            for name, _, value in (line.partition(":") for line in header_lines)
+        }
+        if headers.get("sec-websocket-accept") != websocket_accept_key(key):
+            raise DevToolsError("WebSocket handshake returned a bad accept key")
+
+    def _fill(self) -> None:
+        data = self.sock.recv(65536)
+        if not data:
+            raise DevToolsError("DevTools connection closed")
+        self._buffer += data
+
+    def _read_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            self._fill()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _read_frame(self):
+        first, second = self._read_exact(2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", self._read_exact(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", self._read_exact(8))
+        masking_key = self._read_exact(4) if second & 0x80 else None
+        payload = self._read_exact(length)
+        if masking_key:
+            payload = bytes(b ^ masking_key[i % 4] for i, b in enumerate(payload))
+        return bool(first & 0x80), opcode, payload
+
+    def send_text(self, text: str) -> None:
+        self.sock.sendall(encode_frame(OPCODE_TEXT, text.encode()))
+
+    def receive_text(self, timeout: float) -> str:
+        """Read one complete text message, answering pings along the way"""
+        self.sock.settimeout(timeout)
+        fragments = []
+        while True:
+            final, opcode, payload = self._read_frame()
+            if opcode == OPCODE_PING:
+                self.sock.sendall(encode_frame(OPCODE_PONG, payload))
+                continue
+            if opcode == OPCODE_CLOSE:
+                raise DevToolsError("DevTools connection closed by browser")
+            if opcode in (OPCODE_TEXT, OPCODE_CONTINUATION):
+                fragments.append(payload)
+                if final:
+                    return b"".join(fragments).decode("utf-8")
+
+    def close(self) -> None:
+        try:
+            self.sock.sendall(encode_frame(OPCODE_CLOSE, b""))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class DevToolsSession:
+    """Command/response and event handling for one DevTools page target"""
+
+    def __init__(self, websocket_url: str, timeout: float = PAGE_LOAD_TIMEOUT):
+        self.timeout = timeout
+        self.websocket = WebSocketConnection(websocket_url, timeout)
+        self._next_id = 0
+        self._events: Deque[Dict[str, Any]] = deque()
+
+    def _receive(self, deadline: float) -> Dict[str, Any]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DevToolsError("Timed out waiting for DevTools")
+        try:
+            return json.loads(self.websocket.receive_text(remaining))
+        except socket.timeout as e:
+            raise DevToolsError("Timed out waiting for DevTools") from e
+
+    def send(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict:
+        """Send a command and return its result, queueing events that arrive first"""
+        self._next_id += 1
+        command_id = self._next_id
+        self.websocket.send_text(
+            json.dumps({"id": command_id, "method": method, "params": params or {}})
+        )
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            message = self._receive(deadline)
+            if message.get("id") != command_id:
+                if "method" in message:
+                    self._events.append(message)
+                continue
+            if "error" in message:
+                raise DevToolsError(f"{method} failed: {message['error']}")
+            return message.get("result", {})
+
+    def clear_events(self) -> None:
+        self._events.clear()
+
+    def wait_for_event(self, method: str, timeout: Optional[float] = None) -> Dict:
+        """Return the params of the next event named method"""
+        while self._events:
+            event = self._events.popleft()
+            if event["method"] == method:
+                return event.get("params", {})
+
+        deadline = time.monotonic() + (timeout or self.timeout)
+        while True:
+            message = self._receive(deadline)
+            if message.get("method") == method:
+                return message.get("params", {})
+
+    def close(self) -> None:
+        self.websocket.close()
+
+
+def find_page_websocket_url(host: str, port: int, timeout: float) -> str:
+    """Poll the DevTools HTTP endpoint until a page target is available"""
+    deadline = time.monotonic() + timeout
+    last_error: Optional[Exception] = None
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(
+                f"http://{host}:{port}/json/list", timeout=1
+            ) as response:
+                targets = json.load(response)
+            for target in targets:
+                if target.get("type") == "page" and "webSocketDebuggerUrl" in target:
+                    return target["webSocketDebuggerUrl"]
+        except OSError as e:
+            last_error = e
+        time.sleep(0.1)
+    raise DevToolsError(f"No DevTools page target on {host}:{port}: {last_error}")
+
+
+class DevToolsBrowserController(BrowserController):
+    """Brave driven over the Chrome DevTools Protocol.
+
+    Pages are saved by serialising the live DOM and writing it directly, so
+    there is no Save dialog, no fixed save wait and no dependency on window
+    focus.
+    """
+
+    def __init__(
+        self,
+        initial_url: str = DEFAULT_URL,
+        port: int = DEVTOOLS_PORT,
+        host: str = DEVTOOLS_HOST,
+        user_data_dir: str = USER_DATA_DIR,
+        template_dir: Optional[str] = PROFILE_TEMPLATE_DIR,
+    ):
+        self.initial_url = initial_url
+        self.port = port
+        self.host = host
+        self.user_data_dir = user_data_dir
+        self.template_dir = template_dir
+        self.process: Optional[subprocess.Popen] = None
+        self.session: Optional[DevToolsSession] = None
+
+    def open_browser(self) -> None:
+        logging.info(f"open_browser: Launching Brave with DevTools on port {self.port}")
+        user_data_dir = reset_user_data_dir(self.user_data_dir, self.template_dir)
+        self.process = subprocess.Popen(
+            [
+                BRAVE_BROWSER_COMMAND,
+                "--user-data-dir=" + user_data_dir,
+                f"--remote-debugging-port={self.port}",
+                self.initial_url,
+            ]
+        )
+        self.connect()
+        logging.info("open_browser: Browser initialization complete")
+
+    def connect(self) -> None:
+        """Attach to the first page target of an already running browser"""
+        websocket_url = find_page_websocket_url(
+            self.host, self.port, DEVTOOLS_STARTUP_TIMEOUT
+        )
+        self.session = DevToolsSession(websocket_url)
+        self.session.send("Page.enable")
+        logging.info(f"connect: Attached to {websocket_url}")
+
+    def _session(self) -> DevToolsSession:
+        if self.session is None:
+            raise DevToolsError("Browser is not connected")
+        return self.session
+
+    def perform_initial_setup(self) -> None:
+        logging.info("perform_initial_setup: Simulating initial scrolling")
+        self._scroll_like_reader(num_scrolls=1)
+
+    def close_browser(self) -> None:
+        logging.info("close_browser")
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+    def navigate_to(self, url: str) -> None:
+        logging.info(f"navigate_to: Navigating to {url}")
+        session = self._session()
+        session.clear_events()
+        result = session.send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise DevToolsError(f"Navigation to {url} failed: {result['errorText']}")
+        session.wait_for_event("Page.loadEventFired")
+        logging.info("navigate_to: Page load event fired")
+
+    def save_page(self, filepath: str) -> None:
+        logging.info(f"save_page: Saving DOM to {filepath}")
+        result = self._session().send(
+            "Runtime.evaluate",
+            {"expression": "document.documentElement.outerHTML", "returnByValue": True},
+        )
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise DevToolsError(
+                f"Reading the page DOM failed: {details.get('text', details)}"
+            )
+        html = result["result"]["value"]
+
+        # Write beside the target and rename, so a reader never sees half a page
+        absolute_filepath = os.path.abspath(filepath)
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(absolute_filepath))
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                file.write("<!DOCTYPE html>\n")
+                file.write(html)
+            # mkstemp creates the file readable by its owner only
+            os.chmod(temp_path, SAVED_PAGE_MODE)
+            os.replace(temp_path, absolute_filepath)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        logging.info(f"save_page: Wrote {len(html)} characters")
+
+    def perform_human_like_activity(self) -> None:
+        logging.info("perform_human_like_activity: Simulating reading and scrolling")
+        self._scroll_like_reader(num_scrolls=random.randint(1, 2))
+
+    def _scroll_like_reader(self, num_scrolls: int) -> None:
+        """Scroll in small steps with reading pauses, keeping the request pace human"""
+        for _ in range(num_scrolls):
+            distance = random.randint(200, 800)
+            self._session().send(
+                "Runtime.evaluate", {"expression": f"window.scrollBy(0, {distance})"}
+            )
+            clock.sleep(random.uniform(1.5, 3.0))
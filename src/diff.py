@@ -0,0 +1,50 @@
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+
+from constants import LISTING_STORE_FILE
+from listing_diff import diff_dates, materialise_postcode_changes, snapshot_postcodes
+from listing_store import ListingStore
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Diff the listings of two snapshot dates (YYYYMMDD)"
+    )
+    parser.add_argument("old_date")
+    parser.add_argument("new_date")
+    parser.add_argument("--postcode", default=None)
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    parser.add_argument(
+        "--materialise",
+        action="store_true",
+        help="Write changes to the store instead of printing them",
+    )
+    args = parser.parse_args()
+
+    with ListingStore(args.store) as store:
+        if not args.materialise:
+            for change in diff_dates(
+                store, args.old_date, args.new_date, args.postcode
+            ):
+                sys.stdout.write(json.dumps(asdict(change)) + "\n")
+        else:
+            postcodes = (
+                [args.postcode]
+                if args.postcode
+                else sorted(snapshot_postcodes(store, args.new_date))
+            )
+            total = sum(
+                materialise_postcode_changes(
+                    store, postcode, args.new_date, args.old_date
+                )
+                for postcode in postcodes
+            )
+            logging.info(f"Materialised {total} changes for {len(postcodes)} postcodes")
@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, Optional, Set, TypeVar
+
+from constants import (
+    ARCHIVE_DIR,
+    EXTRACT_BATCH_SIZE,
+    EXTRACTED_LISTINGS_FILE,
+    OUTPUT_DIR,
+)
+from listing_parser import Listing, extract_listings, parse_page_filename
+from page_archive import PageArchive
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class ExtractionResult:
+    """Listings parsed from one page, or the error that stopped it being parsed"""
+
+    filename: str
+    listings: List[Listing]
+    error: Optional[str] = None
+
+
+def list_page_files(
+    output_dir: str = OUTPUT_DIR, archive_dir: str = ARCHIVE_DIR
+) -> List[str]:
+    """List saved search pages in output_dir and the archive.
+
+    Archived pages are named as they were in output_dir, so extraction reads
+    them back through the archive once the originals have been removed.
+    """
+    with os.scandir(output_dir) as entries:
+        page_files = {
+            entry.path
+            for entry in entries
+            if entry.is_file() and parse_page_filename(entry.name) is not None
+        }
+    if os.path.isdir(archive_dir):
+        with PageArchive(archive_dir) as archive:
+            for scrape_date, postcode, page in archive.list_pages():
+                filename = f"{scrape_date}_{postcode}_{page}.html"
+                if parse_page_filename(filename) is not None:
+                    page_files.add(os.path.join(output_dir, filename))
+    return sorted(page_files)
+
+
+def extract_file(filename: str, archive_dir: str = ARCHIVE_DIR) -> ExtractionResult:
+    """Extract one page, capturing any failure so one bad file cannot stop a batch"""
+    try:
+        return ExtractionResult(
+            filename, extract_listings(filename, archive_dir=archive_dir)
+        )
+    except Exception as e:
+        return ExtractionResult(filename, [], f"{type(e).__name__}: {e}")
+
+
+def extract_batch(
+    filenames: List[str], archive_dir: str = ARCHIVE_DIR
+) -> List[ExtractionResult]:
+    """Worker entry point, batching files to amortise inter-process overhead"""
+    return [extract_file(filename, archive_dir) for filename in filenames]
+
+
+def _batches(items: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def map_batches_in_pool(
+    worker: Callable[[List[T]], List[R]],
+    items: Iterable[T],
+    max_workers: Optional[int] = None,
+    batch_size: int = EXTRACT_BATCH_SIZE,
+) -> Iterator[R]:
+    """Run worker over item batches in a process pool, yielding results as they finish.
+
+    Only a few batches per worker are in flight at once, so memory stays
+    bounded regardless of how many items are passed in.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_workers * 2
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight: Set[Future] = set()
+        for batch in _batches(items, batch_size):
+            in_flight.add(executor.submit(worker, batch))
+            if len(in_flight) < max_in_flight:
+                continue
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+        for future in in_flight:
+            yield from future.result()
+
+
+def iter_extractions(
+    filenames: Iterable[str],
+    max_workers: Optional[int] = None,
+    batch_size: int = EXTRACT_BATCH_SIZE,
+    archive_dir: str = ARCHIVE_DIR,
+) -> Iterator[ExtractionResult]:
+    """Extract pages across every core, streaming results in completion order"""
+    worker = partial(extract_batch, archive_dir=archive_dir)
+    return map_batches_in_pool(worker, filenames, max_workers, batch_size)
+
+
+def write_listings_jsonl(results: Iterable[ExtractionResult], output_file: str) -> int:
+    """Stream listings to a JSON lines file, logging failed pages, and return the count"""
+    num_listings = 0
+    num_failed = 0
+    with open(output_file, "w", encoding="utf-8") as file:
+        for result in results:
+            if result.error is not None:
+                num_failed += 1
+                logging.warning(f"Failed to extract {result.filename}: {result.error}")
+                continue
+            for listing in result.listings:
+                file.write(json.dumps(asdict(listing)) + "\n")
+                num_listings += 1
+
+    logging.info(f"Extracted {num_listings} listings, {num_failed} pages failed")
+    return num_listings
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Extract listing records from saved search pages"
+    )
+    parser.add_argument("--input-dir", default=OUTPUT_DIR)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--output", default=EXTRACTED_LISTINGS_FILE)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    page_files = list_page_files(args.input_dir, args.archive_dir)
+    logging.info(
+        f"Extracting {len(page_files)} pages from {args.input_dir} and {args.archive_dir}"
+    )
+    write_listings_jsonl(
+        iter_extractions(
+            page_files, max_workers=args.workers, archive_dir=args.archive_dir
+        ),
+        args.output,
+    )
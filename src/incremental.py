@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import FrozenSet, Optional
+
+from constants import FULL_CRAWL_INTERVAL_DAYS, INCREMENTAL_OVERLAP_PAGES
+from listing_parser import extract_listings
+from listing_store import ListingStore
+
+
+@dataclass(frozen=True)
+class IncrementalBaseline:
+    """Listings already known for a postcode, so paging can stop once it reaches them.
+
+    Results are sorted newest first, so after the first page holding only
+    known listings the rest of the postcode is known too. overlap_pages more
+    known pages are crawled anyway, to absorb listings that were re-dated.
+    """
+
+    full_date: str
+    known_ids: FrozenSet[str]
+    overlap_pages: int = INCREMENTAL_OVERLAP_PAGES
+
+    def is_exhausted(self, known_pages: int) -> bool:
+        """Whether known_pages consecutive known pages cover the overlap margin"""
+        return known_pages > self.overlap_pages
+
+
+def days_between(old_date: str, new_date: str) -> int:
+    """Pure function giving the days between two YYYYMMDD dates"""
+    delta = datetime.strptime(new_date, "%Y%m%d") - datetime.strptime(
+        old_date, "%Y%m%d"
+    )
+    return delta.days
+
+
+def load_baseline(
+    store: ListingStore,
+    postcode: str,
+    run_date: str,
+    full_crawl_days: int = FULL_CRAWL_INTERVAL_DAYS,
+    overlap_pages: int = INCREMENTAL_OVERLAP_PAGES,
+) -> Optional[IncrementalBaseline]:
+    """Baseline for an incremental crawl of postcode, None when a full crawl is due.
+
+    Known listings are those of the last full crawl plus every incremental
+    crawl since. A full crawl is due every full_crawl_days, so removals and
+    edits to older listings are still picked up.
+    """
+    full_date = store.last_full_snapshot(postcode, run_date)
+    if full_date is None or days_between(full_date, run_date) >= full_crawl_days:
+        return None
+    known_ids = store.listing_ids_between(postcode, full_date, run_date)
+    return IncrementalBaseline(full_date, frozenset(known_ids), overlap_pages)
+
+
+def count_known_pages(
+    filename: str, baseline: Optional[IncrementalBaseline], known_pages: int
+) -> int:
+    """Consecutive pages of only known listings, up to and including filename"""
+    if baseline is None:
+        return 0
+    listings = extract_listings(filename)
+    if listings and all(
+        listing.listing_id in baseline.known_ids for listing in listings
+    ):
+        return known_pages + 1
+    return 0
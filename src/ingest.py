@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from analytics import RollupStore, refresh_rollups
+from constants import (
+    ANALYTICS_ROLLUP_DIR,
+    INGEST_COMMIT_FILES,
+    LISTING_STORE_FILE,
+    OUTPUT_DIR,
+)
+from dedup import dedupe_dates, dedupe_day
+from extract import map_batches_in_pool
+from listing_diff import materialise_postcode_changes
+from listing_parser import Listing, parse_listings, parse_page_filename
+from listing_store import LedgerEntry, ListingStore
+from page_scanner import iter_file_chunks
+
+
+@dataclass(frozen=True)
+class IngestTask:
+    """A page file whose size or mtime differs from the ledger"""
+
+    path: str
+    size: int
+    mtime_ns: int
+    known_hash: Optional[str]
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+
+@dataclass
+class IngestResult:
+    """Outcome of ingesting one file; listings is None when its content was unchanged"""
+
+    task: IngestTask
+    content_hash: Optional[str]
+    listings: Optional[List[Listing]]
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestSummary:
+    """Counts of what one ingestion pass did"""
+
+    new_or_changed: int = 0
+    touched_only: int = 0
+    failed: int = 0
+    listings: int = 0
+    # Days whose listings changed, so their rollups can be refreshed
+    scrape_dates: Set[str] = field(default_factory=set)
+
+
+def find_changed_files(
+    input_dir: str, ledger: Dict[str, LedgerEntry], prefix: str = ""
+) -> List[IngestTask]:
+    """Single directory scan returning pages whose size or mtime differ from the ledger"""
+    tasks = []
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix):
+                continue
+            if not entry.is_file() or parse_page_filename(entry.name) is None:
+                continue
+            stat = entry.stat()
+            known = ledger.get(entry.name)
+            if (
+                known is not None
+                and known.size == stat.st_size
+                and known.mtime_ns == stat.st_mtime_ns
+            ):
+                continue
+            tasks.append(
+                IngestTask(
+                    path=entry.path,
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    known_hash=known.content_hash if known else None,
+                )
+            )
+    return sorted(tasks, key=lambda task: task.filename)
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter_file_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hashed_chunks(chunks: Iterable[bytes], digest) -> Iterator[bytes]:
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def ingest_file(task: IngestTask) -> IngestResult:
+    """Hash and parse one page, skipping the parse when only its mtime changed"""
+    try:
+        if task.known_hash is not None:
+            content_hash = hash_file(task.path)
+            if content_hash == task.known_hash:
+                return IngestResult(task, content_hash, None)
+
+        # Hash while parsing so a new file is only read once
+        digest = hashlib.sha256()
+        page = parse_page_filename(task.filename)
+        chunks = _hashed_chunks(iter_file_chunks(task.path), digest)
+        listings = list(parse_listings(chunks, task.path, page))
+        return IngestResult(task, digest.hexdigest(), listings)
+    except Exception as e:
+        return IngestResult(task, None, None, f"{type(e).__name__}: {e}")
+
+
+def ingest_batch(tasks: List[IngestTask]) -> List[IngestResult]:
+    return [ingest_file(task) for task in tasks]
+
+
+def _commit(store: ListingStore, results: List[IngestResult]) -> None:
+    store.record_files(
+        (
+            LedgerEntry(
+                filename=result.task.filename,
+                size=result.task.size,
+                mtime_ns=result.task.mtime_ns,
+                content_hash=result.content_hash,
+                num_listings=len(result.listings or []),
+            ),
+            result.listings,
+        )
+        for result in results
+    )
+
+
+def ingest_directory(
+    store: ListingStore,
+    input_dir: str = OUTPUT_DIR,
+    max_workers: Optional[int] = None,
+    commit_every: int = INGEST_COMMIT_FILES,
+) -> IngestSummary:
+    """Merge new and changed pages in input_dir into the store, leaving the rest alone"""
+    tasks = find_changed_files(input_dir, store.load_ledger())
+    logging.info(f"ingest_directory: {len(tasks)} new or modified files in {input_dir}")
+
+    summary = IngestSummary()
+    pending: List[IngestResult] = []
+    for result in map_batches_in_pool(ingest_batch, tasks, max_workers):
+        if result.error is not None:
+            # Left out of the ledger so the next run retries it
+            summary.failed += 1
+            logging.warning(f"Failed to ingest {result.task.path}: {result.error}")
+            continue
+
+        if result.listings is None:
+            summary.touched_only += 1
+        else:
+            summary.new_or_changed += 1
+            summary.listings += len(result.listings)
+            summary.scrape_dates.add(
+                parse_page_filename(result.task.filename).scrape_date
+            )
+
+        pending.append(result)
+        if len(pending) >= commit_every:
+            _commit(store, pending)
+            pending = []
+
+    if pending:
+        _commit(store, pending)
+
+    logging.info(f"ingest_directory: {summary}")
+    return summary
+
+
+def ingest_postcode(
+    store: ListingStore, scrape_date: str, postcode: str, input_dir: str = OUTPUT_DIR
+) -> int:
+    """Ingest one postcode's pages in-process, as soon as its scrape finishes"""
+    prefix = f"{scrape_date}_{postcode}_"
+    tasks = find_changed_files(input_dir, store.load_ledger(prefix), prefix)
+    results = ingest_batch(tasks)
+    for result in results:
+        if result.error is not None:
+            logging.warning(f"Failed to ingest {result.task.path}: {result.error}")
+    _commit(store, [result for result in results if result.error is None])
+    return sum(len(result.listings or []) for result in results)
+
+
+def publish_postcode(
+    store: ListingStore,
+    scrape_date: str,
+    postcode: str,
+    is_full: bool = True,
+    input_dir: str = OUTPUT_DIR,
+) -> int:
+    """Ingest, dedupe and diff a freshly scraped postcode, returning its change count"""
+    store.record_snapshot(scrape_date, postcode, is_full)
+    ingest_postcode(store, scrape_date, postcode, input_dir)
+    dedupe_day(store, scrape_date, postcode)
+    return materialise_postcode_changes(store, postcode, scrape_date)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Incrementally ingest saved search pages into the listing store"
+    )
+    parser.add_argument("--input-dir", default=OUTPUT_DIR)
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rollups", default=ANALYTICS_ROLLUP_DIR)
+    args = parser.parse_args()
+
+    with ListingStore(args.store) as store:
+        summary = ingest_directory(store, args.input_dir, args.workers)
+        dedupe_dates(store, summary.scrape_dates)
+        refresh_rollups(store, RollupStore(args.rollups), summary.scrape_dates)
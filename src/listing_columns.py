@@ -0,0 +1,404 @@
+import bisect
+import json
+import re
+from dataclasses import dataclass
+from itertools import islice
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from analytics import UNKNOWN, date_to_day, day_to_date
+from constants import COLUMNS_LOAD_BATCH
+from dedup import STATES
+from listing_parser import Listing
+from listing_store import LISTING_COLUMNS, ListingStore
+
+# Listing fields held as interned strings, and as small integers with UNKNOWN for None;
+# the suburb read from the address is interned alongside them
+STRING_FIELDS = (
+    "listing_id",
+    "address",
+    "price_text",
+    "property_type",
+    "status",
+    "source_file",
+    "postcode",
+)
+INTEGER_FIELDS = {
+    "price": np.int32,
+    "bedrooms": np.int16,
+    "bathrooms": np.int16,
+    "parking": np.int16,
+    "page_num": np.int16,
+    "position": np.int16,
+}
+# Fields with a sorted index, for select()
+INDEXED_FIELDS = ("postcode", "suburb", "list_date", "price")
+# YYYYMMDD fields, held as days since 1970-01-01
+DATE_FIELDS = ("scrape_date", "list_date")
+# The state and postcode that end an address, "Newtown NSW 2042" keeps "Newtown"
+LOCALITY_SUFFIX_PATTERN = re.compile(
+    rf"(?:^|\s+)(?:{'|'.join(sorted(STATES))})?(?:\s*\d{{4}})?\s*$", re.IGNORECASE
+)
+
+
+def suburb_from_address(address: str) -> str:
+    """Pure function giving the suburb in "12 King St, Newtown NSW 2042", "" if none.
+
+    The suburb is the last comma-separated part once the state and postcode
+    are dropped, whether they follow it directly or after another comma.
+    """
+    parts = address.split(",")[1:]
+    for part in reversed(parts):
+        suburb = LOCALITY_SUFFIX_PATTERN.sub("", part.strip(), count=1)
+        if suburb:
+            return suburb
+    return ""
+
+
+class StringColumn:
+    """Strings stored back to back as UTF-8 in one buffer, found through an offsets array"""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data: bytes, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Sequence[str]) -> "StringColumn":
+        encoded = [string.encode() for string in strings]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        dtype = np.uint32 if offsets[-1] < 2**32 else np.int64
+        return cls(b"".join(encoded), offsets.astype(dtype))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.data[self.offsets[index] : self.offsets[index + 1]].decode()
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.nbytes
+
+
+class InternedColumn:
+    """Each distinct string stored once, in sorted order, with a code per row.
+
+    Codes follow the sort order of the strings, so comparing codes
+    compares the strings they stand for.
+    """
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self, codes: np.ndarray, values: StringColumn):
+        self.codes = codes
+        self.values = values
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    def code_of(self, value: str) -> Optional[int]:
+        """Code of value, None if no row holds it"""
+        index = bisect.bisect_left(self.values, value)
+        if index < len(self.values) and self.values[index] == value:
+            return index
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.values.nbytes
+
+
+class SortedIndex:
+    """Row numbers ordered by a key column, so a key range is two binary searches"""
+
+    __slots__ = ("keys", "rows")
+
+    def __init__(self, values: np.ndarray):
+        self.rows = np.argsort(values, kind="stable").astype(np.int32)
+        self.keys = values[self.rows]
+
+    def bounds(self, low, high) -> Tuple[int, int]:
+        """Slice of rows whose key is within low and high inclusive"""
+        # Searching with a different dtype would convert the whole key array
+        limits = np.iinfo(self.keys.dtype)
+        if low > limits.max or high < limits.min:
+            return 0, 0
+        dtype = self.keys.dtype.type
+        start = np.searchsorted(self.keys, dtype(max(low, limits.min)), side="left")
+        end = np.searchsorted(self.keys, dtype(min(high, limits.max)), side="right")
+        return int(start), int(end)
+
+    def count(self, low, high) -> int:
+        start, end = self.bounds(low, high)
+        return end - start
+
+    def between(self, low, high) -> np.ndarray:
+        """Rows whose key is within low and high inclusive, in row order"""
+        start, end = self.bounds(low, high)
+        rows = self.rows[start:end]
+        # The sort is stable, so rows sharing one key are already in order
+        return rows if low == high else np.sort(rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.rows.nbytes
+
+
+_NO_ROWS = np.empty(0, dtype=np.int32)
+
+
+class ListingRow:
+    """View of one row of a ListingColumns, reading each field on access"""
+
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns: "ListingColumns", row: int):
+        self._columns = columns
+        self._row = row
+
+    def __getattr__(self, name: str):
+        return self._columns.value(name, self._row)
+
+    def to_listing(self) -> Listing:
+        return Listing(
+            *(self._columns.value(name, self._row) for name in LISTING_COLUMNS)
+        )
+
+
+@dataclass(frozen=True, eq=False)
+class ListingColumns:
+    """Listings held column by column, with sorted indexes for filtered lookups.
+
+    Numbers are NumPy arrays with UNKNOWN for missing values, dates are
+    days since 1970-01-01, and strings are interned, so a row costs a few
+    dozen bytes rather than a dataclass and its strings. The suburb, read
+    from the address, is held alongside the Listing fields.
+    """
+
+    integers: Dict[str, np.ndarray]
+    days: Dict[str, np.ndarray]
+    strings: Dict[str, InternedColumn]
+    # Sorted indexes by postcode, suburb, list_date and price
+    indexes: Dict[str, SortedIndex]
+
+    def __len__(self) -> int:
+        return len(self.integers["price"])
+
+    def __getitem__(self, row: int) -> ListingRow:
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return ListingRow(self, row)
+
+    def rows(self, row_numbers: Iterable[int]) -> Iterator[ListingRow]:
+        return (ListingRow(self, int(row)) for row in row_numbers)
+
+    def value(self, name: str, row: int):
+        """One field of one row as the Python value a Listing would hold"""
+        if name in self.integers:
+            value = int(self.integers[name][row])
+            return None if value == UNKNOWN else value
+        if name in self.days:
+            day = int(self.days[name][row])
+            return None if day == UNKNOWN else day_to_date(day)
+        if name in self.strings:
+            return self.strings[name][row]
+        raise AttributeError(name)
+
+    def keys(self, name: str) -> np.ndarray:
+        """The array a field is compared by: its numbers, days or string codes"""
+        if name in self.strings:
+            return self.strings[name].codes
+        return self.integers[name] if name in self.integers else self.days[name]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [*self.integers.values(), *self.days.values()]
+        return (
+            sum(array.nbytes for array in arrays)
+            + sum(column.nbytes for column in self.strings.values())
+            + sum(index.nbytes for index in self.indexes.values())
+        )
+
+    def select(
+        self,
+        postcode: Optional[str] = None,
+        list_dates: Optional[Tuple[str, str]] = None,
+        prices: Optional[Tuple[int, int]] = None,
+        suburb: Optional[str] = None,
+        property_type: Optional[str] = None,
+    ) -> np.ndarray:
+        """Row numbers, in order, of listings matching every filter given.
+
+        Date and price ranges include both ends, and exclude listings
+        without a date or price. The indexed filter matching the fewest rows
+        picks the candidates, found by binary search, and the other filters
+        are checked against those rows only.
+        """
+        ranges: Dict[str, Tuple[int, int]] = {}
+        for name, value in (
+            ("postcode", postcode),
+            ("suburb", suburb),
+            ("property_type", property_type),
+        ):
+            if value is not None:
+                code = self.strings[name].code_of(value)
+                if code is None:
+                    return _NO_ROWS
+                ranges[name] = (code, code)
+        if list_dates is not None:
+            low, high = (date_to_day(d) for d in list_dates)
+            ranges["list_date"] = (max(low, 0), high)
+        if prices is not None:
+            low, high = prices
+            ranges["price"] = (max(low, 0), high)
+
+        indexed = [name for name in ranges if name in self.indexes]
+        if indexed:
+            narrowest = min(
+                indexed, key=lambda name: self.indexes[name].count(*ranges[name])
+            )
+            rows = self.indexes[narrowest].between(*ranges.pop(narrowest))
+        else:
+            rows = np.arange(len(self), dtype=np.int32)
+        for name, (low, high) in ranges.items():
+            keys = self.keys(name)[rows]
+            rows = rows[(keys >= low) & (keys <= high)]
+        return rows
+
+
+def _code_dtype(size: int):
+    if size <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if size <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.int32
+
+
+class ListingColumnsBuilder:
+    """Collects listings a batch at a time, so only one batch is ever held as objects.
+
+    Strings are interned as they arrive and each batch is packed into
+    arrays straight away. build() sorts each vocabulary, recodes the rows
+    to match and builds the indexes.
+    """
+
+    def __init__(self):
+        self._integers: Dict[str, List[np.ndarray]] = {n: [] for n in INTEGER_FIELDS}
+        self._days: Dict[str, List[np.ndarray]] = {name: [] for name in DATE_FIELDS}
+        self._codes: Dict[str, List[np.ndarray]] = {
+            name: [] for name in (*STRING_FIELDS, "suburb")
+        }
+        self._lookups: Dict[str, Dict[str, int]] = {name: {} for name in self._codes}
+        self._day_cache: Dict[Optional[str], int] = {None: UNKNOWN, "": UNKNOWN}
+
+    def add_rows(self, rows: Sequence[tuple]) -> None:
+        """Add rows holding the Listing fields in their declared order"""
+        if not rows:
+            return
+        count = len(rows)
+        fields = dict(zip(LISTING_COLUMNS, zip(*rows)))
+        for name, dtype in INTEGER_FIELDS.items():
+            self._integers[name].append(
+                np.fromiter(
+                    (UNKNOWN if v is None else v for v in fields[name]), dtype, count
+                )
+            )
+        for name in DATE_FIELDS:
+            self._days[name].append(
+                np.fromiter(map(self._day, fields[name]), np.int32, count)
+            )
+        fields["suburb"] = [suburb_from_address(a) for a in fields["address"]]
+        for name, lookup in self._lookups.items():
+            self._codes[name].append(
+                np.fromiter(
+                    (lookup.setdefault(v, len(lookup)) for v in fields[name]),
+                    np.int32,
+                    count,
+                )
+            )
+
+    def _day(self, value: Optional[str]) -> int:
+        day = self._day_cache.get(value)
+        if day is None:
+            day = self._day_cache[value] = date_to_day(value)
+        return day
+
+    def build(self) -> ListingColumns:
+        integers = {
+            name: _concatenate(arrays, INTEGER_FIELDS[name])
+            for name, arrays in self._integers.items()
+        }
+        days = {
+            name: _concatenate(arrays, np.int32) for name, arrays in self._days.items()
+        }
+        interned = {
+            name: _intern(self._lookups[name], _concatenate(arrays, np.int32))
+            for name, arrays in self._codes.items()
+        }
+        columns = ListingColumns(
+            integers=integers, days=days, strings=interned, indexes={}
+        )
+        for name in INDEXED_FIELDS:
+            columns.indexes[name] = SortedIndex(columns.keys(name))
+        return columns
+
+
+def _concatenate(arrays: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+
+def _intern(lookup: Dict[str, int], codes: np.ndarray) -> InternedColumn:
+    """Recode first-seen codes to the sort order of the strings"""
+    values = sorted(lookup)
+    recode = np.empty(len(values), dtype=_code_dtype(len(values)))
+    recode[[lookup[value] for value in values]] = np.arange(len(values))
+    return InternedColumn(recode[codes], StringColumn.from_strings(values))
+
+
+def columns_from_rows(
+    rows: Iterable[tuple], batch_size: int = COLUMNS_LOAD_BATCH
+) -> ListingColumns:
+    """Pack rows of Listing fields into columns, batch_size rows at a time"""
+    builder = ListingColumnsBuilder()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        builder.add_rows(batch)
+    return builder.build()
+
+
+def columns_from_listings(
+    listings: Iterable[Listing], batch_size: int = COLUMNS_LOAD_BATCH
+) -> ListingColumns:
+    return columns_from_rows(map(attrgetter(*LISTING_COLUMNS), listings), batch_size)
+
+
+def load_store_columns(
+    store: ListingStore, deduplicated: bool = True, batch_size: int = COLUMNS_LOAD_BATCH
+) -> ListingColumns:
+    """Load the whole listing store, without repeats unless deduplicated is False"""
+    table = "unique_listings" if deduplicated else "listings"
+    cursor = store.connection.execute(
+        f"SELECT {', '.join(LISTING_COLUMNS)} FROM {table}"
+    )
+    builder = ListingColumnsBuilder()
+    while batch := cursor.fetchmany(batch_size):
+        builder.add_rows(batch)
+    return builder.build()
+
+
+def load_jsonl_columns(
+    path: str, batch_size: int = COLUMNS_LOAD_BATCH
+) -> ListingColumns:
+    """Load listings written by extract.py as JSON lines"""
+    with open(path, "r", encoding="utf-8") as file:
+        rows = (
+            tuple(record[name] for name in LISTING_COLUMNS)
+            for record in map(json.loads, file)
+        )
+        return columns_from_rows(rows, batch_size)
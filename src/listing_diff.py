@@ -0,0 +1,248 @@
+from dataclasses import astuple, dataclass
+from enum import Enum
+from typing import Iterable, Iterator, List, Optional, Set
+
+from listing_store import ListingStore
+
+
+class ChangeKind(str, Enum):
+    ADDED = "added"
+    REMOVED = "removed"
+    PRICE_CHANGED = "price_changed"
+    STATUS_CHANGED = "status_changed"
+
+
+@dataclass(frozen=True)
+class SnapshotRow:
+    """The parts of a stored listing the diff engine compares.
+
+    listing_id is the canonical id from dedup, so a re-listed property is
+    compared with its earlier listing rather than added and removed.
+    """
+
+    postcode: str
+    listing_id: str
+    content_hash: str
+    price_text: str
+    status: str
+
+    @property
+    def key(self):
+        return self.postcode, self.listing_id
+
+
+@dataclass(frozen=True)
+class ListingChange:
+    """One entry in the change stream between two snapshot dates"""
+
+    new_date: str
+    old_date: str
+    postcode: str
+    listing_id: str
+    kind: ChangeKind
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+
+
+def iter_snapshot(
+    store: ListingStore, scrape_date: str, postcode: Optional[str] = None
+) -> Iterator[SnapshotRow]:
+    """Stream one day's listings in (postcode, canonical_id) order straight off the index"""
+    query = (
+        "SELECT postcode, canonical_id, content_hash, price_text, status FROM listings"
+        " WHERE scrape_date = ? AND canonical_id != ''"
+    )
+    params = [scrape_date]
+    if postcode is not None:
+        query += " AND postcode = ?"
+        params.append(postcode)
+    query += " ORDER BY postcode, canonical_id"
+    for row in store.connection.execute(query, params):
+        yield SnapshotRow(*row)
+
+
+def snapshot_postcodes(store: ListingStore, scrape_date: str) -> Set[str]:
+    rows = store.connection.execute(
+        "SELECT DISTINCT postcode FROM listings WHERE scrape_date = ?", (scrape_date,)
+    )
+    return {row[0] for row in rows}
+
+
+def previous_scrape_date(
+    store: ListingStore, postcode: str, before_date: str
+) -> Optional[str]:
+    """Most recent snapshot date of postcode earlier than before_date"""
+    row = store.connection.execute(
+        "SELECT MAX(scrape_date) FROM listings WHERE postcode = ? AND scrape_date < ?",
+        (postcode, before_date),
+    ).fetchone()
+    return row[0]
+
+
+def _unique_keys(rows: Iterable[SnapshotRow]) -> Iterator[SnapshotRow]:
+    """Drop repeats of a listing seen on more than one page of the same day"""
+    previous_key = None
+    for row in rows:
+        if row.key != previous_key:
+            yield row
+            previous_key = row.key
+
+
+def diff_snapshots(
+    old_rows: Iterable[SnapshotRow],
+    new_rows: Iterable[SnapshotRow],
+    old_date: str,
+    new_date: str,
+) -> Iterator[ListingChange]:
+    """Sort-merge two snapshots ordered by (postcode, listing_id) into a change stream.
+
+    Only the current row of each side is held, so memory stays flat however
+    many listings the snapshots hold. Matching listings with equal content
+    hashes are skipped without comparing fields.
+    """
+    old_iter = _unique_keys(old_rows)
+    new_iter = _unique_keys(new_rows)
+    old = next(old_iter, None)
+    new = next(new_iter, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old.key < new.key):
+            yield ListingChange(
+                new_date, old_date, old.postcode, old.listing_id, ChangeKind.REMOVED
+            )
+            old = next(old_iter, None)
+            continue
+
+        if old is None or new.key < old.key:
+            yield ListingChange(
+                new_date,
+                old_date,
+                new.postcode,
+                new.listing_id,
+                ChangeKind.ADDED,
+                new_value=new.price_text,
+            )
+            new = next(new_iter, None)
+            continue
+
+        if old.content_hash != new.content_hash:
+            if old.price_text != new.price_text:
+                yield ListingChange(
+                    new_date,
+                    old_date,
+                    new.postcode,
+                    new.listing_id,
+                    ChangeKind.PRICE_CHANGED,
+                    old.price_text,
+                    new.price_text,
+                )
+            if old.status != new.status:
+                yield ListingChange(
+                    new_date,
+                    old_date,
+                    new.postcode,
+                    new.listing_id,
+                    ChangeKind.STATUS_CHANGED,
+                    old.status,
+                    new.status,
+                )
+        old = next(old_iter, None)
+        new = next(new_iter, None)
+
+
+def _partial_snapshot_changes(
+    changes: Iterable[ListingChange], new_is_full: bool, known_ids: Set[str]
+) -> Iterator[ListingChange]:
+    """Keep the changes an incremental crawl can vouch for.
+
+    Listings missing from a partial snapshot were not crawled, rather than
+    removed, and listings beyond a partial old snapshot were already known.
+    """
+    for change in changes:
+        if change.kind == ChangeKind.REMOVED and not new_is_full:
+            continue
+        if change.kind == ChangeKind.ADDED and change.listing_id in known_ids:
+            continue
+        yield change
+
+
+def diff_dates(
+    store: ListingStore, old_date: str, new_date: str, postcode: Optional[str] = None
+) -> Iterator[ListingChange]:
+    """Diff two snapshot dates, limited to postcodes scraped on both.
+
+    A postcode missing from one day was not crawled that day, so its
+    listings are not reported as added or removed. The same holds for the
+    pages an incremental crawl of a postcode skipped.
+    """
+    if postcode is not None:
+        postcodes = [postcode]
+    else:
+        postcodes = sorted(
+            snapshot_postcodes(store, old_date) & snapshot_postcodes(store, new_date)
+        )
+
+    # Each postcode is merged with its own pair of index scans, so a
+    # snapshot is never read into memory as a whole
+    for current in postcodes:
+        changes = diff_snapshots(
+            iter_snapshot(store, old_date, current),
+            iter_snapshot(store, new_date, current),
+            old_date,
+            new_date,
+        )
+        new_is_full = store.is_full_snapshot(new_date, current)
+        if new_is_full and store.is_full_snapshot(old_date, current):
+            yield from changes
+            continue
+        full_date = store.last_full_snapshot(current, new_date) or ""
+        known_ids = store.listing_ids_between(current, full_date, new_date)
+        yield from _partial_snapshot_changes(changes, new_is_full, known_ids)
+
+
+def materialise_postcode_changes(
+    store: ListingStore,
+    postcode: str,
+    new_date: str,
+    old_date: Optional[str] = None,
+) -> int:
+    """Write the changes of one freshly scraped postcode, replacing any earlier ones.
+
+    Defaults to diffing against the postcode's previous snapshot, so it can
+    run as soon as each postcode finishes rather than after the whole run.
+    """
+    old_date = old_date or previous_scrape_date(store, postcode, new_date)
+    if old_date is None:
+        return 0
+
+    changes = diff_dates(store, old_date, new_date, postcode)
+    with store.connection:
+        store.connection.execute(
+            "DELETE FROM listing_changes WHERE new_date = ? AND postcode = ?",
+            (new_date, postcode),
+        )
+        cursor = store.connection.executemany(
+            "INSERT INTO listing_changes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (_change_row(change) for change in changes),
+        )
+    return cursor.rowcount
+
+
+def load_changes(
+    store: ListingStore, new_date: str, postcode: Optional[str] = None
+) -> List[ListingChange]:
+    query = (
+        "SELECT new_date, old_date, postcode, listing_id, kind, old_value, new_value"
+        " FROM listing_changes WHERE new_date = ?"
+    )
+    params = [new_date]
+    if postcode is not None:
+        query += " AND postcode = ?"
+        params.append(postcode)
+    rows = store.connection.execute(query + " ORDER BY postcode, listing_id", params)
+    return [ListingChange(*row[:4], ChangeKind(row[4]), *row[5:]) for row in rows]
+
+
+def _change_row(change: ListingChange) -> tuple:
+    row = astuple(change)
+    return (*row[:4], change.kind.value, *row[5:])
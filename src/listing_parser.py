@@ -0,0 +1,287 @@
+import codecs
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from constants import ARCHIVE_DIR, SCAN_CHUNK_SIZE, STOP_MARKER
+from page_archive import iter_page_chunks
+
+PAGE_FILENAME_PATTERN = re.compile(r"^(\d{8})_(\d+)_(\d+)\.html$")
+LISTING_ID_PATTERN = re.compile(r"-(\d+)/?(?:[?#].*)?$")
+FEATURE_PATTERN = re.compile(
+    r"(\d+)\s+(bedroom|bed|bathroom|bath|car space|parking|garage)", re.IGNORECASE
+)
+PRICE_AMOUNT_PATTERN = re.compile(r"\$\s*(\d+(?:[.,]\d+)*)\s*([km]|mil\w*)?", re.I)
+ADDED_PATTERN = re.compile(r"Added\s+(.+)", re.IGNORECASE)
+
+FEATURE_FIELDS = {
+    "bedroom": "bedrooms",
+    "bed": "bedrooms",
+    "bathroom": "bathrooms",
+    "bath": "bathrooms",
+    "car space": "parking",
+    "parking": "parking",
+    "garage": "parking",
+}
+
+# Elements whose text is a listing field, keyed by a class name fragment
+TEXT_FIELD_CLASSES = {
+    "address-heading": "address",
+    "property-price": "price_text",
+    "property-type": "property_type",
+    "status-label": "status",
+}
+
+
+@dataclass(frozen=True)
+class PageFile:
+    """Scrape date, postcode and page number encoded in a saved page filename"""
+
+    scrape_date: str
+    postcode: str
+    page_num: int
+
+
+@dataclass(frozen=True)
+class Listing:
+    """A single listing card extracted from a saved search page"""
+
+    listing_id: str
+    address: str
+    price_text: str
+    price: Optional[int]
+    bedrooms: Optional[int]
+    bathrooms: Optional[int]
+    parking: Optional[int]
+    property_type: str
+    status: str
+    list_date: Optional[str]
+    source_file: str
+    scrape_date: str
+    postcode: str
+    page_num: int
+    position: int
+
+
+def parse_page_filename(filename: str) -> Optional[PageFile]:
+    """Pure function to parse YYYYMMDD_<postcode>_<page>.html, None for other files"""
+    match = PAGE_FILENAME_PATTERN.match(os.path.basename(filename))
+    if not match:
+        return None
+    scrape_date, postcode, page_num = match.groups()
+    return PageFile(scrape_date, postcode, int(page_num))
+
+
+def parse_price(price_text: str) -> Optional[int]:
+    """Pure function to parse the first dollar amount in a price string"""
+    match = PRICE_AMOUNT_PATTERN.search(price_text)
+    if not match:
+        return None
+
+    amount_text, suffix = match.groups()
+    if suffix:
+        amount = float(amount_text.replace(",", ""))
+        multiplier = 1_000 if suffix.lower() == "k" else 1_000_000
+        return int(round(amount * multiplier))
+
+    digits = amount_text.replace(",", "")
+    # A bare "$1.25" style decimal without a suffix is not a usable price
+    if "." in digits:
+        return None
+    return int(digits)
+
+
+def parse_list_date(text: str, scrape_date: str) -> Optional[str]:
+    """Pure function to turn 'Added ...' text into an ISO date relative to scrape_date"""
+    match = ADDED_PATTERN.search(text)
+    if not match:
+        return None
+
+    added = match.group(1).strip().lower()
+    scraped = datetime.strptime(scrape_date, "%Y%m%d")
+    if added.startswith("today"):
+        return scraped.date().isoformat()
+    if added.startswith("yesterday"):
+        return (scraped - timedelta(days=1)).date().isoformat()
+
+    days_ago = re.match(r"(\d+)\s+days?\s+ago", added)
+    if days_ago:
+        return (scraped - timedelta(days=int(days_ago.group(1)))).date().isoformat()
+
+    try:
+        return datetime.strptime(added.split()[0], "%d/%m/%Y").date().isoformat()
+    except (ValueError, IndexError):
+        return None
+
+
+def _class_field(attrs: Dict[str, str]) -> Optional[str]:
+    """Return the text field captured by an element, based on its class"""
+    class_names = attrs.get("class", "")
+    for fragment, field in TEXT_FIELD_CLASSES.items():
+        if fragment in class_names:
+            return field
+    return None
+
+
+def _is_card_root(attrs: Dict[str, str]) -> bool:
+    return any(STOP_MARKER in value for value in attrs.values())
+
+
+class SearchPageParser(HTMLParser):
+    """Incremental parser that collects listing cards as the page is fed to it"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.completed_cards: List[Dict[str, str]] = []
+        self._card: Optional[Dict[str, str]] = None
+        self._card_tag = ""
+        self._card_depth = 0
+        self._field: Optional[str] = None
+        self._field_tag = ""
+        self._field_depth = 0
+        self._field_text: List[str] = []
+        # Text between two tags can arrive over several feeds, so it is only
+        # inspected once the next tag boundary is reached
+        self._pending_text: List[str] = []
+
+    def _flush_pending_text(self) -> None:
+        if not self._pending_text:
+            return
+        text = " ".join("".join(self._pending_text).split())
+        self._pending_text = []
+        if self._card is not None and "list_date_text" not in self._card:
+            if ADDED_PATTERN.search(text):
+                self._card["list_date_text"] = text
+
+    def handle_starttag(self, tag: str, attr_list) -> None:
+        self._flush_pending_text()
+        attrs = {name: value or "" for name, value in attr_list}
+
+        if self._card is None:
+            if _is_card_root(attrs):
+                self._card = {}
+                self._card_tag = tag
+                self._card_depth = 0
+            return
+
+        if tag == self._card_tag:
+            self._card_depth += 1
+
+        if "listing_id" not in self._card:
+            match = LISTING_ID_PATTERN.search(attrs.get("href", ""))
+            if match:
+                self._card["listing_id"] = match.group(1)
+
+        feature = FEATURE_PATTERN.search(attrs.get("aria-label", ""))
+        if feature:
+            field = FEATURE_FIELDS[feature.group(2).lower()]
+            self._card.setdefault(field, feature.group(1))
+
+        if self._field is not None:
+            if tag == self._field_tag:
+                self._field_depth += 1
+            return
+
+        field = _class_field(attrs)
+        if field and field not in self._card:
+            self._field = field
+            self._field_tag = tag
+            self._field_depth = 0
+            self._field_text = []
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_pending_text()
+        if self._card is None:
+            return
+
+        if self._field is not None and tag == self._field_tag:
+            if self._field_depth == 0:
+                text = " ".join("".join(self._field_text).split())
+                self._card[self._field] = text
+                self._field = None
+            else:
+                self._field_depth -= 1
+
+        if tag == self._card_tag:
+            if self._card_depth == 0:
+                self.completed_cards.append(self._card)
+                self._card = None
+                self._field = None
+            else:
+                self._card_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._card is None:
+            return
+        if self._field is not None:
+            self._field_text.append(data)
+        self._pending_text.append(data)
+
+    def pop_completed_cards(self) -> List[Dict[str, str]]:
+        cards, self.completed_cards = self.completed_cards, []
+        return cards
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def card_to_listing(
+    card: Dict[str, str], filename: str, page: PageFile, position: int
+) -> Listing:
+    """Pure function to convert raw card fields into a typed Listing"""
+    price_text = card.get("price_text", "")
+    return Listing(
+        listing_id=card.get("listing_id", ""),
+        address=card.get("address", ""),
+        price_text=price_text,
+        price=parse_price(price_text),
+        bedrooms=_optional_int(card.get("bedrooms")),
+        bathrooms=_optional_int(card.get("bathrooms")),
+        parking=_optional_int(card.get("parking")),
+        property_type=card.get("property_type", ""),
+        status=card.get("status", ""),
+        list_date=parse_list_date(card.get("list_date_text", ""), page.scrape_date),
+        source_file=filename,
+        scrape_date=page.scrape_date,
+        postcode=page.postcode,
+        page_num=page.page_num,
+        position=position,
+    )
+
+
+def parse_listings(
+    chunks: Iterable[bytes], filename: str, page: PageFile
+) -> Iterator[Listing]:
+    """Stream listings out of page bytes, yielding each card as soon as it closes"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = SearchPageParser()
+    position = 0
+
+    def drain() -> Iterator[Listing]:
+        nonlocal position
+        for card in parser.pop_completed_cards():
+            position += 1
+            yield card_to_listing(card, filename, page, position)
+
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield from drain()
+
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from drain()
+
+
+def extract_listings(
+    filename: str, chunk_size: int = SCAN_CHUNK_SIZE, archive_dir: str = ARCHIVE_DIR
+) -> List[Listing]:
+    """Parse every listing card from a saved search page, on disk or archived"""
+    page = parse_page_filename(filename)
+    if page is None:
+        raise ValueError(f"Not a saved search page filename: {filename}")
+    chunks = iter_page_chunks(filename, chunk_size, archive_dir)
+    return list(parse_listings(chunks, filename, page))
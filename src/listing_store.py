@@ -0,0 +1,293 @@
+import hashlib
+import sqlite3
+from dataclasses import dataclass, fields
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from constants import DEDUP_LOOKUP_BATCH, LISTING_STORE_FILE
+from listing_parser import Listing
+
+LISTING_COLUMNS = [field.name for field in fields(Listing)]
+
+# Fields whose change means the listing itself changed, rather than where it was seen
+CONTENT_FIELDS = [
+    "address",
+    "price_text",
+    "price",
+    "bedrooms",
+    "bathrooms",
+    "parking",
+    "property_type",
+    "status",
+    "list_date",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    num_listings INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT NOT NULL,
+    address TEXT NOT NULL,
+    price_text TEXT NOT NULL,
+    price INTEGER,
+    bedrooms INTEGER,
+    bathrooms INTEGER,
+    parking INTEGER,
+    property_type TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT '',
+    list_date TEXT,
+    source_file TEXT NOT NULL,
+    scrape_date TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    page_num INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    content_hash TEXT NOT NULL DEFAULT '',
+    canonical_id TEXT NOT NULL DEFAULT '',
+    is_duplicate INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_file, position)
+);
+
+CREATE TABLE IF NOT EXISTS listing_changes (
+    new_date TEXT NOT NULL,
+    old_date TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    listing_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    PRIMARY KEY (new_date, postcode, listing_id, kind)
+);
+
+CREATE TABLE IF NOT EXISTS dedup_keys (
+    key TEXT PRIMARY KEY,
+    canonical_id TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS postcode_snapshots (
+    scrape_date TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    is_full INTEGER NOT NULL,
+    PRIMARY KEY (scrape_date, postcode)
+);
+
+CREATE INDEX IF NOT EXISTS idx_listings_postcode ON listings (postcode, scrape_date);
+CREATE INDEX IF NOT EXISTS idx_listings_listing_id ON listings (listing_id);
+-- Also serves scrape_date lookups, and streams a day's listings in
+-- (postcode, canonical_id) order for the diff engine
+CREATE INDEX IF NOT EXISTS idx_listings_canonical
+    ON listings (scrape_date, postcode, canonical_id, content_hash);
+
+CREATE VIEW IF NOT EXISTS unique_listings AS
+    SELECT * FROM listings WHERE is_duplicate = 0;
+"""
+
+
+@dataclass(frozen=True)
+class LedgerEntry:
+    """Fingerprint of a page file as it was when its listings were ingested"""
+
+    filename: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    num_listings: int
+
+
+class ListingStore:
+    """SQLite store of extracted listings plus the ledger of ingested page files.
+
+    Files are keyed by their name within the page directory, so the store
+    stays valid if html_pages/ is moved. Ingestion reads raw pages only,
+    so archive.py packs a page only once it has been ingested.
+    """
+
+    def __init__(self, path: str = LISTING_STORE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ListingStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def load_ledger(self, prefix: str = "") -> Dict[str, LedgerEntry]:
+        """Load the ingestion ledger keyed by filename, or only the files under prefix.
+
+        A prefix is looked up as a range of the filename key, so one
+        postcode's entries are read without scanning the whole ledger.
+        """
+        query = (
+            "SELECT filename, size, mtime_ns, content_hash, num_listings"
+            " FROM ingested_files"
+        )
+        params: Tuple[str, ...] = ()
+        if prefix:
+            # Every name starting with prefix sorts below prefix + the last code point
+            query += " WHERE filename >= ? AND filename < ?"
+            params = (prefix, prefix + "\U0010ffff")
+        return {
+            row[0]: LedgerEntry(*row) for row in self.connection.execute(query, params)
+        }
+
+    def record_files(
+        self, files: Iterable[Tuple[LedgerEntry, Optional[List[Listing]]]]
+    ) -> None:
+        """Replace each file's listings and refresh its ledger entry in one transaction.
+
+        A file paired with None listings had its mtime touched but its content
+        hash unchanged, so only its ledger fingerprint is refreshed.
+        """
+        placeholders = ", ".join("?" for _ in LISTING_COLUMNS)
+        insert_listing = (
+            f"INSERT INTO listings ({', '.join(LISTING_COLUMNS)}, content_hash,"
+            f" canonical_id) VALUES ({placeholders}, ?, ?)"
+        )
+        with self.connection:
+            for entry, listings in files:
+                if listings is None:
+                    self.connection.execute(
+                        "UPDATE ingested_files SET size = ?, mtime_ns = ?"
+                        " WHERE filename = ?",
+                        (entry.size, entry.mtime_ns, entry.filename),
+                    )
+                    continue
+
+                self.connection.execute(
+                    "DELETE FROM listings WHERE source_file = ?", (entry.filename,)
+                )
+                self.connection.executemany(
+                    insert_listing,
+                    (_listing_row(listing, entry.filename) for listing in listings),
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?)",
+                    (
+                        entry.filename,
+                        entry.size,
+                        entry.mtime_ns,
+                        entry.content_hash,
+                        entry.num_listings,
+                    ),
+                )
+
+    def listings_for(
+        self, postcode: Optional[str] = None, scrape_date: Optional[str] = None
+    ) -> List[Listing]:
+        """Load listings filtered by postcode and/or scrape date, in page order"""
+        conditions = []
+        params = []
+        if postcode is not None:
+            conditions.append("postcode = ?")
+            params.append(postcode)
+        if scrape_date is not None:
+            conditions.append("scrape_date = ?")
+            params.append(scrape_date)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self.connection.execute(
+            f"SELECT {', '.join(LISTING_COLUMNS)} FROM listings{where}"
+            " ORDER BY scrape_date, postcode, page_num, position",
+            params,
+        )
+        return [Listing(*row) for row in rows]
+
+    def record_snapshot(self, scrape_date: str, postcode: str, is_full: bool) -> None:
+        """Record whether a postcode's crawl on scrape_date walked every page"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO postcode_snapshots VALUES (?, ?, ?)",
+                (scrape_date, postcode, int(is_full)),
+            )
+
+    def is_full_snapshot(self, scrape_date: str, postcode: str) -> bool:
+        """Snapshots recorded before incremental crawls existed count as full"""
+        row = self.connection.execute(
+            "SELECT is_full FROM postcode_snapshots"
+            " WHERE scrape_date = ? AND postcode = ?",
+            (scrape_date, postcode),
+        ).fetchone()
+        return row is None or bool(row[0])
+
+    def last_full_snapshot(self, postcode: str, before_date: str) -> Optional[str]:
+        """Most recent date before before_date on which every page of postcode was crawled"""
+        row = self.connection.execute(
+            "SELECT MAX(scrape_date) FROM listings"
+            " WHERE postcode = ? AND scrape_date < ? AND scrape_date NOT IN"
+            " (SELECT scrape_date FROM postcode_snapshots"
+            "  WHERE postcode = ? AND is_full = 0)",
+            (postcode, before_date, postcode),
+        ).fetchone()
+        return row[0]
+
+    def listing_ids_between(
+        self, postcode: str, since_date: str, before_date: str
+    ) -> Set[str]:
+        """Listing ids of postcode seen from since_date up to, not including, before_date.
+
+        The canonical ids they were deduped to are included, so changes
+        reported under a canonical id can be checked against the set.
+        """
+        rows = self.connection.execute(
+            "SELECT listing_id, canonical_id FROM listings WHERE postcode = ?"
+            " AND scrape_date >= ? AND scrape_date < ?",
+            (postcode, since_date, before_date),
+        )
+        return {listing_id for row in rows for listing_id in row if listing_id}
+
+    def lookup_dedup_keys(self, keys: List[str]) -> Dict[str, str]:
+        """Canonical ids of the given dedup keys, for those already known"""
+        found = {}
+        # Batched to stay under SQLite's bound parameter limit
+        for start in range(0, len(keys), DEDUP_LOOKUP_BATCH):
+            batch = keys[start : start + DEDUP_LOOKUP_BATCH]
+            rows = self.connection.execute(
+                "SELECT key, canonical_id FROM dedup_keys"
+                f" WHERE key IN ({', '.join('?' for _ in batch)})",
+                batch,
+            )
+            found.update(rows)
+        return found
+
+    def record_dedup(
+        self, new_keys: Dict[str, str], identities: Iterable[Tuple[str, int, int]]
+    ) -> None:
+        """Store new dedup keys and each row's (canonical_id, is_duplicate, rowid) together"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO dedup_keys VALUES (?, ?)", new_keys.items()
+            )
+            self.connection.executemany(
+                "UPDATE listings SET canonical_id = ?, is_duplicate = ? WHERE rowid = ?",
+                identities,
+            )
+
+    def count_listings(self, deduplicated: bool = False) -> int:
+        table = "unique_listings" if deduplicated else "listings"
+        return self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def listing_content_hash(listing: Listing) -> str:
+    """Pure function to fingerprint the fields of a listing that can change over time"""
+    content = "\x1f".join(str(getattr(listing, field)) for field in CONTENT_FIELDS)
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+
+def _listing_row(listing: Listing, filename: str) -> tuple:
+    values = [
+        filename if column == "source_file" else getattr(listing, column)
+        for column in LISTING_COLUMNS
+    ]
+    # Rows start as their own canonical listing until dedup says otherwise
+    return (*values, listing_content_hash(listing), listing.listing_id)
@@ -0,0 +1,169 @@
+import atexit
+import logging
+import queue
+import sys
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import Deque, Optional
+
+from constants import LOG_RING_BUFFER_SIZE
+
+LOG_MODES = ("sync", "async")
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEBUG_DUMP_FORMAT = (
+    "%(asctime)s.%(msecs)03d %(levelname)s %(module)s.%(funcName)s: %(message)s"
+)
+
+
+class LogfmtFormatter(logging.Formatter):
+    """One key=value line per record, so INFO output stays compact and greppable"""
+
+    def __init__(self, worker_id: Optional[int] = None):
+        super().__init__(datefmt="%Y-%m-%dT%H:%M:%S")
+        self.worker_id = worker_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        fields = [
+            f"ts={self.formatTime(record, self.datefmt)}",
+            f"level={record.levelname.lower()}",
+            f"src={record.module}.{record.funcName}",
+        ]
+        if self.worker_id is not None:
+            fields.append(f"worker={self.worker_id}")
+        fields.append(f"msg={_quote(message)}")
+        return " ".join(fields)
+
+
+def _quote(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread.
+
+    The stock handler merges the message and its arguments before
+    enqueueing, which is the cost this mode exists to take off the calling
+    thread. Records stay in this process, so they need no preparing.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the most recent records unformatted, to be written out only on failure"""
+
+    def __init__(self, capacity: int = LOG_RING_BUFFER_SIZE):
+        super().__init__(logging.DEBUG)
+        self.records: Deque[logging.LogRecord] = deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(DEBUG_DUMP_FORMAT, LOG_DATE_FORMAT))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+    def dump(self, path: str) -> int:
+        """Write the buffered records to path and forget them, return how many"""
+        self.acquire()
+        try:
+            records = list(self.records)
+            self.records.clear()
+        finally:
+            self.release()
+        with open(path, "w", encoding="utf-8") as file:
+            for record in records:
+                file.write(self.format(record) + "\n")
+        return len(records)
+
+
+class AsyncLogging:
+    """Root logger wiring for the async mode; close() flushes and detaches it.
+
+    DEBUG records only reach the ring buffer, which appends them without
+    formatting. INFO and above go through a queue to a listener thread that
+    formats and writes them, so the caller never waits on the stream.
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[int] = None,
+        capacity: int = LOG_RING_BUFFER_SIZE,
+        stream=None,
+    ):
+        self.ring_buffer = RingBufferHandler(capacity)
+        stream_handler = logging.StreamHandler(stream or sys.stderr)
+        stream_handler.setFormatter(LogfmtFormatter(worker_id))
+        self.queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+        self.queue_handler.setLevel(logging.INFO)
+        self.listener = QueueListener(self.queue_handler.queue, stream_handler)
+        self.is_installed = False
+        self._replaced_handlers = []
+
+    def install(self) -> None:
+        root = logging.getLogger()
+        self._replaced_handlers = root.handlers[:]
+        for handler in self._replaced_handlers:
+            root.removeHandler(handler)
+        root.setLevel(logging.DEBUG)
+        root.addHandler(self.ring_buffer)
+        root.addHandler(self.queue_handler)
+        self.listener.start()
+        install_ring_buffer(self.ring_buffer)
+        self.is_installed = True
+
+    def close(self) -> None:
+        if not self.is_installed:
+            return
+        self.is_installed = False
+        root = logging.getLogger()
+        root.removeHandler(self.queue_handler)
+        root.removeHandler(self.ring_buffer)
+        install_ring_buffer(None)
+        self.listener.stop()
+        for handler in self._replaced_handlers:
+            root.addHandler(handler)
+
+
+def setup_logging(
+    mode: str = "sync", worker_id: Optional[int] = None, level: int = logging.DEBUG
+) -> Optional[AsyncLogging]:
+    """Configure the root logger for a scrape process.
+
+    "sync" writes records at level and above straight to stderr, as the
+    scripts always have. "async" is the low-overhead mode for long runs, see
+    AsyncLogging; it is flushed when the process exits.
+    """
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode: {mode}")
+    if mode == "sync":
+        worker = f" [worker {worker_id}]" if worker_id is not None else ""
+        logging.basicConfig(
+            level=level,
+            format=f"%(asctime)s %(levelname)s{worker}: %(message)s",
+            datefmt=LOG_DATE_FORMAT,
+        )
+        return None
+    async_logging = AsyncLogging(worker_id)
+    async_logging.install()
+    atexit.register(async_logging.close)
+    return async_logging
+
+
+_ring_buffer: Optional[RingBufferHandler] = None
+
+
+def install_ring_buffer(ring_buffer: Optional[RingBufferHandler]) -> None:
+    """Keep recent DEBUG records in ring_buffer, or in nothing if None"""
+    global _ring_buffer
+    _ring_buffer = ring_buffer
+
+
+def dump_recent_events(path: str) -> None:
+    """Write the installed ring buffer to path, a no-op when none is installed"""
+    if _ring_buffer is None:
+        return
+    count = _ring_buffer.dump(path)
+    logging.info("dump_recent_events: Wrote %d recent log records to %s", count, path)
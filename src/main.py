@@ -1,48 +1,309 @@
+import argparse
+import functools
 import logging
-from typing import List
+import os
 
 import tqdm
 
-from browser_controller import BraveBrowserController
-from constants import BASE_URL, MIN_POSTCODE, POSTCODES_FILE
-from scrape import scrape_realestate_postcode, is_postcode_completed
-
-logging.basicConfig(
-    # filename=LOG_FILE,
-    level=logging.DEBUG,
-    format="%(asctime)s %(levelname)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
+from browser_controller import (
+    CONTROLLER_CLASSES,
+    InstrumentedBrowserController,
+    SlimmingBrowserController,
+    controller_class,
+)
+from browser_session import BrowserSession
+from constants import (
+    BASE_URL,
+    FULL_CRAWL_INTERVAL_DAYS,
+    INCREMENTAL_OVERLAP_PAGES,
+    METRICS_SUFFIX,
+    MIN_POSTCODE,
+    OUTPUT_DIR,
+    POSTCODES_FILE,
+    SCHEDULE_BUDGET_PAGES,
+    SESSION_MAX_PAGES,
+    WORKER_REQUESTS_PER_MINUTE,
 )
+from incremental import load_baseline
+from ingest import publish_postcode
+from listing_store import ListingStore
+from logging_setup import LOG_MODES, setup_logging
+from metrics import MetricsRecorder, install_recorder
+from page_slimmer import SLIM_MODES
+from postcodes import load_postcodes
+from run_ledger import RunLedger
+from scheduler import budget_from_hours, load_or_build_plan
+from scrape import retry_queued_pages, scrape_realestate_postcode
+from work_queue import WorkQueue, hold_lease
+from worker_pool import run_pool, worker_controller
 
 if __name__ == "__main__":
-    with open(POSTCODES_FILE, "r") as file:
-        postcodes: List[str] = [line.strip() for line in file.readlines()]
-        postcodes = [p.split(" ")[0] for p in postcodes]
+    parser = argparse.ArgumentParser(description="Scrape every remaining postcode")
+    parser.add_argument(
+        "--controller",
+        choices=sorted(CONTROLLER_CLASSES),
+        default="brave",
+        help="drive Brave through its GUI or over the DevTools protocol",
+    )
+    parser.add_argument(
+        "--restart-every",
+        type=int,
+        default=SESSION_MAX_PAGES,
+        help="relaunch the browser after this many pages",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="stop paging a postcode once its pages only hold known listings",
+    )
+    parser.add_argument(
+        "--overlap-pages",
+        type=int,
+        default=INCREMENTAL_OVERLAP_PAGES,
+        help="known pages to crawl past the first one before stopping",
+    )
+    parser.add_argument(
+        "--full-crawl-days",
+        type=int,
+        default=FULL_CRAWL_INTERVAL_DAYS,
+        help="crawl every page of a postcode again after this many days",
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="crawl only the postcodes planned by scheduler.py within a budget",
+    )
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--budget-pages", type=int, default=SCHEDULE_BUDGET_PAGES)
+    budget.add_argument("--budget-hours", type=float)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="scrape with this many browsers, each on its own Xvfb display",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=WORKER_REQUESTS_PER_MINUTE,
+        help="page loads per minute shared by all workers",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="PATH",
+        help="share the run's postcodes with other hosts through this work queue",
+    )
+    parser.add_argument(
+        "--retry-only",
+        action="store_true",
+        help="only fetch again the pages of the latest run queued for retry",
+    )
+    parser.add_argument(
+        "--slim-pages",
+        choices=SLIM_MODES,
+        help="strip each saved page down to its listing cards and embedded state,"
+        " in place of the original or beside it",
+    )
+    parser.add_argument(
+        "--log-mode",
+        choices=LOG_MODES,
+        default="sync",
+        help="async writes INFO lines from a background thread and keeps DEBUG"
+        " lines in memory, dumped only for postcodes that fail",
+    )
+    parser.add_argument(
+        "--prometheus-file",
+        help="also write phase timings in Prometheus text format to this file",
+    )
+    args = parser.parse_args()
+    setup_logging(args.log_mode)
+    if args.queue and (args.schedule or args.workers > 1 or args.retry_only):
+        parser.error(
+            "--queue cannot be combined with --schedule, --workers or --retry-only"
+        )
+
+    postcodes = load_postcodes(POSTCODES_FILE)
 
     if not postcodes:
         raise ValueError(
             f"No valid postcodes found in {POSTCODES_FILE} with minimum {MIN_POSTCODE}"
         )
 
-    # Filter out already completed postcodes before starting
-    remaining_postcodes = [p for p in postcodes if not is_postcode_completed(p)]
-    
-    if not remaining_postcodes:
-        logging.info("All postcodes already completed")
-        exit(0)
-    
-    logging.info(f"Found {len(remaining_postcodes)} postcodes to scrape out of {len(postcodes)} total")
+    work_queue = None
+    if args.queue:
+        # Every host sharing the queue works on the run it has open
+        work_queue = WorkQueue(args.queue)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        ledger = RunLedger(work_queue.open_run(postcodes))
+    else:
+        # Resume an interrupted run, even across midnight, or start today's
+        ledger = RunLedger.resume_or_start(postcodes)
+    listing_store = ListingStore()
+
+    # A scheduled run follows the plan written when it started, so a resumed
+    # run crawls the same postcodes however the history has changed since
+    plan = None
+    if args.schedule:
+        budget_pages = args.budget_pages
+        if args.budget_hours is not None:
+            budget_pages = budget_from_hours(args.budget_hours)
+        plan = load_or_build_plan(
+            postcodes, listing_store, ledger.run_date, budget_pages
+        )
+        logging.info(
+            f"Scheduled {len(plan.postcodes)} postcodes, about {plan.expected_pages}"
+            f" pages, deferring {len(plan.deferred)}"
+        )
+        postcodes = plan.postcodes
 
-    # Initialize browser once for all postcodes
-    browser_controller = BraveBrowserController(BASE_URL)
-    # Given the list of populated postcodes, scrape each one
-    pbar = tqdm.tqdm(remaining_postcodes, desc="Scraping Realestate Postcodes", unit="postcode")
+    if work_queue is not None:
+        # Postcodes are leased one at a time until the whole run is done
+        remaining_postcodes = work_queue.iter_claims(ledger.run_date)
+        logging.info(f"Run {ledger.run_date}: taking postcodes from {args.queue}")
+    else:
+        remaining_postcodes = ledger.remaining_postcodes(postcodes)
+        if args.retry_only:
+            remaining_postcodes = ledger.retry_postcodes()
 
-    for postcode in pbar:
+        if not remaining_postcodes:
+            logging.info(f"All postcodes already completed for run {ledger.run_date}")
+            # A finished schedule leaves the rest of the list untouched, so the
+            # run would otherwise be resumed again instead of starting a new one
+            if not ledger.finished:
+                ledger.mark_finished()
+            exit(0)
+
+        logging.info(
+            f"Run {ledger.run_date}: found {len(remaining_postcodes)} postcodes"
+            f" to scrape out of {len(postcodes)} total"
+        )
+
+    def baseline_for(postcode):
+        entry = plan.entry(postcode) if plan is not None else None
+        if not args.incremental or (entry and entry.full_crawl):
+            return None
+        return load_baseline(
+            listing_store,
+            postcode,
+            ledger.run_date,
+            args.full_crawl_days,
+            args.overlap_pages,
+        )
+
+    def publish(postcode, incremental=False):
+        # Publish this postcode's changes now rather than after the whole run.
+        # This is bookkeeping, so a failure here must not stop the scrape
         try:
-            browser_controller.open_browser()
-            browser_controller.perform_initial_setup()
-            scrape_realestate_postcode(postcode, browser_controller)
+            num_changes = publish_postcode(
+                listing_store, ledger.run_date, postcode, not incremental
+            )
+            logging.info(f"Recorded {num_changes} listing changes for {postcode}")
+        except Exception as e:
+            logging.error(f"Failed to record listing changes for {postcode}: {e}")
+
+    if args.workers > 1:
+        pbar = tqdm.tqdm(
+            total=len(remaining_postcodes),
+            desc="Scraping Realestate Postcodes",
+            unit="postcode",
+        )
+
+        def on_finished(postcode, error, completed, incremental):
+            # A postcode stopped at a bad page is published once its retry completes it
+            if error is None and completed:
+                publish(postcode, incremental)
+            pbar.update()
+
+        def scrape_in_pool(pool_postcodes):
+            run_pool(
+                pool_postcodes,
+                ledger.run_date,
+                functools.partial(worker_controller, args.controller),
+                args.workers,
+                on_finished,
+                baseline_for,
+                args.requests_per_minute,
+                max_pages=args.restart_every,
+                slim_mode=args.slim_pages,
+                log_mode=args.log_mode,
+            )
+            # Workers recorded their progress in the shared run log
+            return RunLedger(ledger.run_date)
+
+        ledger = scrape_in_pool(remaining_postcodes)
+        # Pages that were not genuine result pages get one more pass
+        retry_postcodes = ledger.retry_postcodes()
+        if retry_postcodes:
+            pbar.total += len(retry_postcodes)
+            ledger = scrape_in_pool(retry_postcodes)
+    else:
+        # Initialize browser once for all postcodes, relaunching it only every
+        # --restart-every pages or after a failure
+        controller = InstrumentedBrowserController(
+            controller_class(args.controller)(BASE_URL)
+        )
+        if args.slim_pages:
+            controller = SlimmingBrowserController(controller, args.slim_pages)
+        browser_controller = BrowserSession(controller, max_pages=args.restart_every)
+        # Phase timings for report.py, appended to across resumes of the run
+        metrics_recorder = MetricsRecorder(
+            os.path.join(OUTPUT_DIR, f"{ledger.run_date}{METRICS_SUFFIX}"),
+            args.prometheus_file,
+        )
+        install_recorder(metrics_recorder)
+        # Given the list of populated postcodes, scrape each one
+        pbar = tqdm.tqdm(
+            remaining_postcodes, desc="Scraping Realestate Postcodes", unit="postcode"
+        )
+
+        try:
+            for postcode in pbar:
+                with hold_lease(
+                    work_queue,
+                    ledger.run_date,
+                    postcode,
+                    done=lambda postcode=postcode: (
+                        ledger.is_postcode_completed(postcode)
+                        or ledger.is_postcode_given_up(postcode)
+                    ),
+                ):
+                    # A lease this host lost in a crash may come back to it
+                    if not ledger.is_postcode_completed(postcode):
+                        try:
+                            browser_controller.open_browser()
+                            scrape_realestate_postcode(
+                                postcode,
+                                browser_controller,
+                                ledger,
+                                baseline_for(postcode),
+                            )
+                        except Exception as e:
+                            # The session discarded the browser and relaunches it
+                            # for the next postcode; this one stays incomplete
+                            logging.error(
+                                f"Scraping {postcode} failed, continuing: {e}"
+                            )
+                # A postcode stopped at a bad page is published once its retry
+                # completes it
+                if ledger.is_postcode_completed(postcode):
+                    publish(postcode, ledger.is_incremental(postcode))
+                metrics_recorder.write_prometheus()
+
+            # Pages that were not genuine result pages get one more pass
+            for postcode in retry_queued_pages(
+                browser_controller, ledger, baseline_for
+            ):
+                publish(postcode, ledger.is_incremental(postcode))
+            metrics_recorder.write_prometheus()
 
         finally:
             browser_controller.close_browser()
+            metrics_recorder.close()
+
+    listing_store.close()
+
+    # The queue records when a shared run is finished
+    if work_queue is not None:
+        work_queue.close()
+    elif not ledger.remaining_postcodes(postcodes):
+        ledger.mark_finished()
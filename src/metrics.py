@@ -0,0 +1,253 @@
+import json
+import math
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import clock
+from constants import METRICS_RESUME_GAP
+
+
+class Phase(str, Enum):
+    OPEN_BROWSER = "open_browser"
+    INITIAL_SETUP = "initial_setup"
+    CLOSE_BROWSER = "close_browser"
+    NAVIGATE = "navigate"
+    SAVE = "save"
+    SLIM = "slim"
+    HUMAN_ACTIVITY = "human_activity"
+    WAIT = "wait"
+    CHECK_STOP = "check_stop"
+    PAGE = "page"
+    POSTCODE = "postcode"
+
+
+# Deliberate pauses that keep the crawl human-paced
+WAIT_PHASES = {Phase.INITIAL_SETUP, Phase.HUMAN_ACTIVITY, Phase.WAIT}
+# Browser and disk operations that do the actual scraping
+WORK_PHASES = {
+    Phase.OPEN_BROWSER,
+    Phase.CLOSE_BROWSER,
+    Phase.NAVIGATE,
+    Phase.SAVE,
+    Phase.SLIM,
+    Phase.CHECK_STOP,
+}
+
+
+@dataclass(frozen=True)
+class Span:
+    """One timed phase, written as a line of the metrics file"""
+
+    phase: str
+    postcode: Optional[str]
+    page_num: Optional[int]
+    started_at: float
+    duration: float
+    outcome: str
+    parent: Optional[str] = None
+    error: Optional[str] = None
+
+
+class MetricsRecorder:
+    """Writes a JSONL record per span and keeps totals for a Prometheus file.
+
+    Spans nest, and a span without its own postcode or page inherits them
+    from the enclosing one, so controller calls are attributed to the page
+    the scrape loop is working on.
+    """
+
+    def __init__(self, path: str, prometheus_path: Optional[str] = None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self._file: TextIO = open(path, "a", encoding="utf-8", buffering=1)
+        self._stack: List[Tuple[Phase, Optional[str], Optional[int]]] = []
+        self._totals: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+
+    @contextmanager
+    def span(
+        self,
+        phase: Phase,
+        postcode: Optional[str] = None,
+        page_num: Optional[int] = None,
+    ) -> Iterator[None]:
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None:
+            postcode = postcode if postcode is not None else parent[1]
+            page_num = page_num if page_num is not None else parent[2]
+        self._stack.append((phase, postcode, page_num))
+
+        started_at = clock.now()
+        start = clock.monotonic()
+        outcome, error = "ok", None
+        try:
+            yield
+        except BaseException as e:
+            outcome, error = "error", type(e).__name__
+            raise
+        finally:
+            self._stack.pop()
+            self.record(
+                Span(
+                    phase=phase.value,
+                    postcode=postcode,
+                    page_num=page_num,
+                    started_at=started_at,
+                    duration=clock.monotonic() - start,
+                    outcome=outcome,
+                    parent=parent[0].value if parent is not None else None,
+                    error=error,
+                )
+            )
+
+    def record(self, span: Span) -> None:
+        self._file.write(json.dumps(asdict(span)) + "\n")
+        totals = self._totals[(span.phase, span.outcome)]
+        totals[0] += 1
+        totals[1] += span.duration
+
+    def write_prometheus(self) -> None:
+        """Write span counts and durations in Prometheus text format, atomically"""
+        if self.prometheus_path is None:
+            return
+        lines = [
+            "# HELP scrape_phase_seconds Time spent in each scrape phase",
+            "# TYPE scrape_phase_seconds summary",
+        ]
+        for (phase, outcome), (count, total) in sorted(self._totals.items()):
+            labels = f'phase="{phase}",outcome="{outcome}"'
+            lines.append(f"scrape_phase_seconds_count{{{labels}}} {count}")
+            lines.append(f"scrape_phase_seconds_sum{{{labels}}} {total:.6f}")
+
+        temp_path = f"{self.prometheus_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.prometheus_path)
+
+    def close(self) -> None:
+        self.write_prometheus()
+        self._file.close()
+
+
+_recorder: Optional[MetricsRecorder] = None
+
+
+def install_recorder(recorder: Optional[MetricsRecorder]) -> None:
+    """Send spans from every instrumented call to recorder, or nowhere if None"""
+    global _recorder
+    _recorder = recorder
+
+
+@contextmanager
+def span(
+    phase: Phase, postcode: Optional[str] = None, page_num: Optional[int] = None
+) -> Iterator[None]:
+    """Time a phase with the installed recorder, a no-op when none is installed"""
+    if _recorder is None:
+        yield
+        return
+    with _recorder.span(phase, postcode, page_num):
+        yield
+
+
+@dataclass(frozen=True)
+class PhaseSummary:
+    count: int
+    errors: int
+    p50: float
+    p95: float
+    total: float
+
+
+@dataclass(frozen=True)
+class RunReport:
+    """Per-phase latency and where the run's time went"""
+
+    phases: Dict[str, PhaseSummary]
+    pages: int
+    wall_seconds: float
+    wait_seconds: float
+    work_seconds: float
+
+    @property
+    def pages_per_hour(self) -> float:
+        return self.pages / self.wall_seconds * 3600 if self.wall_seconds else 0.0
+
+
+def load_spans(path: str) -> List[Span]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [Span(**json.loads(line)) for line in file if line.strip()]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Pure function returning the nearest-rank percentile of sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def active_seconds(spans: List[Span], resume_gap: float = METRICS_RESUME_GAP) -> float:
+    """Pure function to sum the time covered by spans, leaving out resume gaps.
+
+    Spans closer than resume_gap are merged into one active segment, so a run
+    resumed hours later is not charged for the hours it was not running.
+    """
+    total = 0.0
+    segment_start = segment_end = None
+    for started, finished in sorted(
+        (item.started_at, item.started_at + item.duration) for item in spans
+    ):
+        if segment_end is not None and started <= segment_end + resume_gap:
+            segment_end = max(segment_end, finished)
+            continue
+        if segment_end is not None:
+            total += segment_end - segment_start
+        segment_start, segment_end = started, finished
+    if segment_end is not None:
+        total += segment_end - segment_start
+    return total
+
+
+def summarise_spans(spans: List[Span]) -> RunReport:
+    """Pure function to reduce spans to per-phase percentiles and a wait/work split.
+
+    Waits nested inside a work phase, such as the page-load pause inside a
+    navigation, count as waiting and are taken out of that phase's work time.
+    Wall time only covers the active segments of the run, see active_seconds.
+    """
+    durations: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    wait_phases = {phase.value for phase in WAIT_PHASES}
+    work_phases = {phase.value for phase in WORK_PHASES}
+    wait_seconds = work_seconds = 0.0
+
+    for item in spans:
+        durations[item.phase].append(item.duration)
+        if item.outcome != "ok":
+            errors[item.phase] += 1
+        if item.phase in work_phases:
+            work_seconds += item.duration
+        elif item.phase in wait_phases and item.parent not in wait_phases:
+            wait_seconds += item.duration
+            if item.parent in work_phases:
+                work_seconds -= item.duration
+
+    phases = {}
+    for phase, values in sorted(durations.items()):
+        values.sort()
+        phases[phase] = PhaseSummary(
+            len(values),
+            errors[phase],
+            percentile(values, 0.5),
+            percentile(values, 0.95),
+            sum(values),
+        )
+
+    pages = sum(
+        1 for item in spans if item.phase == Phase.PAGE.value and item.outcome == "ok"
+    )
+    return RunReport(phases, pages, active_seconds(spans), wait_seconds, work_seconds)
@@ -0,0 +1,271 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from constants import (
+    ARCHIVE_COMPRESSION_LEVEL,
+    ARCHIVE_DICTIONARY_SIZE,
+    ARCHIVE_DIR,
+    SCAN_CHUNK_SIZE,
+)
+from page_scanner import iter_file_chunks
+from run_ledger import SAVED_PAGE_PATTERN
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    content_hash TEXT PRIMARY KEY,
+    dictionary_id TEXT,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pages (
+    scrape_date TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    page TEXT NOT NULL,
+    content_hash TEXT NOT NULL REFERENCES blobs (content_hash),
+    PRIMARY KEY (scrape_date, postcode, page)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+PageKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class ArchiveStats:
+    """Page and blob counts with raw and compressed byte totals"""
+
+    pages: int
+    blobs: int
+    raw_bytes: int
+    stored_bytes: int
+
+
+def page_key(filename: str) -> Optional[PageKey]:
+    """Pure function to map a saved page filename to its (date, postcode, page) key"""
+    match = SAVED_PAGE_PATTERN.match(os.path.basename(filename))
+    return match.groups() if match else None
+
+
+def train_dictionary(
+    sample_files: List[str], max_size: int = ARCHIVE_DICTIONARY_SIZE
+) -> bytes:
+    """Build a zlib preset dictionary from lines shared by most sample pages.
+
+    zlib matches best against the end of the dictionary, so the most widely
+    shared lines are placed last.
+    """
+    document_frequency: Counter = Counter()
+    for filename in sample_files:
+        with open(filename, "rb") as file:
+            document_frequency.update(set(file.read().splitlines(keepends=True)))
+
+    threshold = max(2, len(sample_files) // 2)
+    shared = [
+        line
+        for line, count in document_frequency.most_common()
+        if count >= threshold and len(line) > 8
+    ]
+
+    selected: List[bytes] = []
+    size = 0
+    for line in shared:
+        if size + len(line) > max_size:
+            continue
+        selected.append(line)
+        size += len(line)
+    return b"".join(reversed(selected))
+
+
+class PageArchive:
+    """Content-addressed store of compressed page bodies.
+
+    Each distinct page body is stored once as its own zlib blob, compressed
+    against a shared preset dictionary, and an index maps each
+    (date, postcode, page) to its blob so one page can be read on its own.
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.dictionary_dir = os.path.join(root, "dictionaries")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.dictionary_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(root, "index.sqlite3"))
+        self.connection.executescript(SCHEMA)
+        self._dictionaries: Dict[str, bytes] = {}
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "PageArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_dir, content_hash[:2], f"{content_hash}.z")
+
+    def _dictionary(self, dictionary_id: Optional[str]) -> bytes:
+        if dictionary_id is None:
+            return b""
+        if dictionary_id not in self._dictionaries:
+            path = os.path.join(self.dictionary_dir, f"{dictionary_id}.zdict")
+            with open(path, "rb") as file:
+                self._dictionaries[dictionary_id] = file.read()
+        return self._dictionaries[dictionary_id]
+
+    def current_dictionary_id(self) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'dictionary_id'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_dictionary(self, dictionary: bytes) -> str:
+        """Store a dictionary and use it for every blob written from now on"""
+        dictionary_id = hashlib.sha256(dictionary).hexdigest()[:16]
+        path = os.path.join(self.dictionary_dir, f"{dictionary_id}.zdict")
+        with open(path, "wb") as file:
+            file.write(dictionary)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('dictionary_id', ?)",
+                (dictionary_id,),
+            )
+        return dictionary_id
+
+    def store_page(self, filename: str) -> str:
+        """Archive a saved page, deduplicating identical bodies, and return its hash"""
+        key = page_key(filename)
+        if key is None:
+            raise ValueError(f"Not a saved page filename: {filename}")
+
+        dictionary_id = self.current_dictionary_id()
+        compressor = zlib.compressobj(
+            ARCHIVE_COMPRESSION_LEVEL, zdict=self._dictionary(dictionary_id)
+        )
+        digest = hashlib.sha256()
+        raw_size = 0
+
+        # Compress into a temporary file because the blob name is only known
+        # once the whole page has been hashed
+        handle, temp_path = tempfile.mkstemp(dir=self.blob_dir)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                for chunk in iter_file_chunks(filename):
+                    digest.update(chunk)
+                    raw_size += len(chunk)
+                    temp_file.write(compressor.compress(chunk))
+                temp_file.write(compressor.flush())
+
+            content_hash = digest.hexdigest()
+            blob_path = self._blob_path(content_hash)
+            if os.path.exists(blob_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                (content_hash, dictionary_id, raw_size, os.path.getsize(blob_path)),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                (*key, content_hash),
+            )
+        return content_hash
+
+    def list_pages(self) -> List[PageKey]:
+        """Keys of every archived page, in (date, postcode, page) order"""
+        return [
+            tuple(row)
+            for row in self.connection.execute(
+                "SELECT scrape_date, postcode, page FROM pages"
+                " ORDER BY scrape_date, postcode, page"
+            )
+        ]
+
+    def has_page(self, key: PageKey) -> bool:
+        return self._lookup(key) is not None
+
+    def _lookup(self, key: PageKey) -> Optional[Tuple[str, Optional[str]]]:
+        return self.connection.execute(
+            "SELECT blobs.content_hash, blobs.dictionary_id FROM pages"
+            " JOIN blobs USING (content_hash)"
+            " WHERE scrape_date = ? AND postcode = ? AND page = ?",
+            key,
+        ).fetchone()
+
+    def iter_chunks(
+        self, key: PageKey, chunk_size: int = SCAN_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """Stream the decompressed body of one archived page"""
+        row = self._lookup(key)
+        if row is None:
+            raise FileNotFoundError(f"Page not in archive: {key}")
+        content_hash, dictionary_id = row
+
+        decompressor = zlib.decompressobj(zdict=self._dictionary(dictionary_id))
+        for compressed in iter_file_chunks(self._blob_path(content_hash), chunk_size):
+            chunk = decompressor.decompress(compressed)
+            if chunk:
+                yield chunk
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def read_page(self, key: PageKey) -> bytes:
+        return b"".join(self.iter_chunks(key))
+
+    def stats(self) -> ArchiveStats:
+        pages = self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        blobs, raw_bytes, stored_bytes = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0)"
+            " FROM blobs"
+        ).fetchone()
+        return ArchiveStats(pages, blobs, raw_bytes, stored_bytes)
+
+
+def page_exists(filename: str, archive_dir: str = ARCHIVE_DIR) -> bool:
+    """Check whether a saved page is on disk or in the archive"""
+    if os.path.exists(filename):
+        return True
+    key = page_key(filename)
+    if key is None or not os.path.isdir(archive_dir):
+        return False
+    with PageArchive(archive_dir) as archive:
+        return archive.has_page(key)
+
+
+def iter_page_chunks(
+    filename: str,
+    chunk_size: int = SCAN_CHUNK_SIZE,
+    archive_dir: str = ARCHIVE_DIR,
+) -> Iterator[bytes]:
+    """Stream a saved page from disk, falling back to the archive once it is packed"""
+    if os.path.exists(filename):
+        yield from iter_file_chunks(filename, chunk_size)
+        return
+
+    key = page_key(filename)
+    if key is None or not os.path.isdir(archive_dir):
+        raise FileNotFoundError(filename)
+    with PageArchive(archive_dir) as archive:
+        yield from archive.iter_chunks(key, chunk_size)
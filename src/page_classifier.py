@@ -0,0 +1,94 @@
+import os
+from enum import Enum
+from typing import Iterable
+
+from constants import (
+    ARCHIVE_DIR,
+    PAGE_MIN_BYTES,
+    PAGE_TAIL_BYTES,
+    SCAN_CHUNK_SIZE,
+    STOP_MARKER,
+)
+from page_archive import iter_page_chunks, page_exists
+from page_scanner import iter_file_chunks, markers_in_chunks
+
+# Shown instead of cards when a search genuinely has nothing (more) to list
+NO_RESULTS_SIGNATURES = (
+    b"No exact matches found",
+    b"No results found",
+    b'"totalResultsCount":0',
+)
+# Block pages, bot challenges and browser or gateway error pages
+ERROR_SIGNATURES = (
+    b"Access Denied",
+    b"Pardon Our Interruption",
+    b"Please verify you are a human",
+    b"Too Many Requests",
+    b"502 Bad Gateway",
+    b"503 Service Unavailable",
+    b"504 Gateway Time-out",
+    b"This site can\xe2\x80\x99t be reached",
+    b"Something went wrong",
+)
+DOCUMENT_END = b"</html>"
+
+
+class PageClass(str, Enum):
+    LISTINGS = "listings"
+    NO_RESULTS = "no_results"
+    ERROR = "error"
+    UNKNOWN = "unknown"
+
+
+def classify_chunks(chunks: Iterable[bytes], size: int, tail: bytes) -> PageClass:
+    """Pure function to classify a saved page from its bytes, size and last bytes.
+
+    A page cut off before its closing html tag was only partly saved, and
+    counts as an error whatever it holds. Otherwise a listing card makes it a
+    listings page, which ends the scan at the first card. Pages without cards
+    are told apart by their no-results or error signatures, and a page too
+    small to be a search page is an error too.
+    """
+    if size == 0 or DOCUMENT_END not in tail.lower():
+        return PageClass.ERROR
+
+    marker = STOP_MARKER.encode()
+    found = markers_in_chunks(
+        chunks, (marker,) + NO_RESULTS_SIGNATURES + ERROR_SIGNATURES, stop_at=marker
+    )
+    if marker in found:
+        return PageClass.LISTINGS
+    no_results = any(s in found for s in NO_RESULTS_SIGNATURES)
+    error = any(s in found for s in ERROR_SIGNATURES)
+
+    if no_results:
+        return PageClass.NO_RESULTS
+    if error or size < PAGE_MIN_BYTES:
+        return PageClass.ERROR
+    return PageClass.UNKNOWN
+
+
+def read_tail(filename: str, size: int, tail_bytes: int = PAGE_TAIL_BYTES) -> bytes:
+    with open(filename, "rb") as file:
+        file.seek(max(0, size - tail_bytes))
+        return file.read()
+
+
+def classify_file(
+    filename: str, chunk_size: int = SCAN_CHUNK_SIZE, archive_dir: str = ARCHIVE_DIR
+) -> PageClass:
+    """Classify a saved page on disk or in the archive; a missing page is an error.
+
+    An archived page has to be decompressed before its last bytes can be
+    checked, so it is read whole, which is fine for the few old pages a
+    resumed run looks at again.
+    """
+    if os.path.exists(filename):
+        size = os.path.getsize(filename)
+        return classify_chunks(
+            iter_file_chunks(filename, chunk_size), size, read_tail(filename, size)
+        )
+    if not page_exists(filename, archive_dir):
+        return PageClass.ERROR
+    content = b"".join(iter_page_chunks(filename, chunk_size, archive_dir))
+    return classify_chunks([content], len(content), content[-PAGE_TAIL_BYTES:])
@@ -0,0 +1,65 @@
+import codecs
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from page_archive import iter_page_chunks
+
+# "1-25 of 312 results", as shown above the first page of listings
+RESULT_RANGE_PATTERN = re.compile(
+    r"(\d+)\s*[-–]\s*(\d+)\s+of\s+([\d,]+)\s+(?:results|properties)",
+    re.IGNORECASE,
+)
+# The same counts in the page's embedded search state
+TOTAL_COUNT_PATTERN = re.compile(r'"totalResultsCount"\s*:\s*(\d+)')
+PAGE_SIZE_PATTERN = re.compile(r'"pageSize"\s*:\s*(\d+)')
+
+# Enough trailing text to hold a match split across two chunks
+SUMMARY_OVERLAP = 256
+
+
+@dataclass(frozen=True)
+class ResultSummary:
+    """Total results for a search and how many are shown per page"""
+
+    total_results: int
+    page_size: int
+
+    @property
+    def planned_pages(self) -> int:
+        return max(1, math.ceil(self.total_results / self.page_size))
+
+
+def parse_result_summary(chunks: Iterable[bytes]) -> Optional[ResultSummary]:
+    """Find the result count and page size of a search page, None if not shown.
+
+    The visible "1-25 of 312 results" range is preferred. The embedded
+    search state is the fallback, since it is also present when the range
+    text has been reworded.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    tail = ""
+    total: Optional[int] = None
+    page_size: Optional[int] = None
+
+    for chunk in chunks:
+        text = tail + decoder.decode(chunk)
+        match = RESULT_RANGE_PATTERN.search(text)
+        if match:
+            first, last, total_text = match.groups()
+            if int(first) == 1 and int(last) >= 1:
+                return ResultSummary(int(total_text.replace(",", "")), int(last))
+        if total is None and (total_match := TOTAL_COUNT_PATTERN.search(text)):
+            total = int(total_match.group(1))
+        if page_size is None and (size_match := PAGE_SIZE_PATTERN.search(text)):
+            page_size = int(size_match.group(1))
+        tail = text[-SUMMARY_OVERLAP:]
+
+    if total is None or not page_size:
+        return None
+    return ResultSummary(total, page_size)
+
+
+def read_result_summary(filename: str) -> Optional[ResultSummary]:
+    return parse_result_summary(iter_page_chunks(filename))
@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from constants import SCAN_CHUNK_SIZE, SCAN_MAX_WORKERS, STOP_MARKER
+
+
+def iter_file_chunks(
+    filename: str, chunk_size: int = SCAN_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Yield the raw bytes of a file in fixed-size chunks"""
+    with open(filename, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def markers_in_chunks(
+    chunks: Iterable[bytes], markers: Sequence[bytes], stop_at: Optional[bytes] = None
+) -> Set[bytes]:
+    """Pure function to find which markers a chunk stream holds.
+
+    Reading stops as soon as stop_at is found, so a page is only read up to
+    its first listing card.
+    """
+    if not all(markers):
+        raise ValueError("Marker must not be empty")
+
+    # Bytes carried over from the previous chunk so a marker split across
+    # the boundary is still found without re-scanning whole chunks
+    overlap = max(map(len, markers)) - 1
+    tail = b""
+    found = set()
+    for chunk in chunks:
+        boundary = tail + chunk[:overlap] if overlap else b""
+        for marker in markers:
+            if marker not in found and (marker in chunk or marker in boundary):
+                found.add(marker)
+        if stop_at is not None and stop_at in found:
+            break
+        if overlap:
+            tail = (tail + chunk[-overlap:])[-overlap:]
+    return found
+
+
+def chunks_contain_marker(chunks: Iterable[bytes], marker: bytes) -> bool:
+    """Pure function to search a chunk stream for marker, stopping at the first match"""
+    return bool(markers_in_chunks(chunks, (marker,), stop_at=marker))
+
+
+def file_contains_marker(
+    filename: str,
+    marker: bytes = STOP_MARKER.encode(),
+    chunk_size: int = SCAN_CHUNK_SIZE,
+) -> bool:
+    """Check whether a file contains marker while holding at most one chunk in memory"""
+    return chunks_contain_marker(iter_file_chunks(filename, chunk_size), marker)
+
+
+def files_containing_marker(
+    filenames: List[str],
+    marker: bytes = STOP_MARKER.encode(),
+    chunk_size: int = SCAN_CHUNK_SIZE,
+    max_workers: int = SCAN_MAX_WORKERS,
+) -> Dict[str, bool]:
+    """Check a batch of files concurrently; missing files map to False like check_stop"""
+
+    def scan(filename: str) -> bool:
+        if not os.path.exists(filename):
+            return False
+        return file_contains_marker(filename, marker, chunk_size)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(filenames, executor.map(scan, filenames)))
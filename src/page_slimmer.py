@@ -0,0 +1,263 @@
+import argparse
+import codecs
+import html
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+
+from constants import SCAN_CHUNK_SIZE, SLIM_SUFFIX, STOP_MARKER
+from page_classifier import ERROR_SIGNATURES, NO_RESULTS_SIGNATURES
+from page_plan import RESULT_RANGE_PATTERN
+from page_scanner import iter_file_chunks
+
+SLIM_MODES = ("replace", "beside")
+SLIM_HEADER = '<!DOCTYPE html>\n<html><head><meta charset="utf-8"></head><body>\n'
+SLIM_FOOTER = "</body></html>\n"
+
+# Attributes the listing parser reads inside a card; the card root also
+# keeps whichever attribute carries the stop marker
+CARD_ATTRIBUTES = {"class", "href", "aria-label"}
+# Subtrees inside a card that hold no listing fields
+DROPPED_CARD_TAGS = {"svg", "script", "style", "noscript", "iframe", "picture"}
+DROPPED_VOID_TAGS = {"img", "source", "link", "meta"}
+# A script holds page state when it is JSON, or assigns a JSON literal to window
+STATE_SCRIPT_PATTERN = re.compile(r"^\s*(?:(?:window|self)\.[\w$.]+\s*=\s*)?[\[{]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Text outside cards that the page classifier tells pages apart by
+SIGNATURE_TEXTS = [
+    signature.decode() for signature in NO_RESULTS_SIGNATURES + ERROR_SIGNATURES
+]
+
+
+def slim_filename(filename: str) -> str:
+    """Pure function naming the slim copy written beside a saved page"""
+    root, _ = os.path.splitext(filename)
+    return root + SLIM_SUFFIX
+
+
+def _is_card_root(attrs: Dict[str, str]) -> bool:
+    return any(STOP_MARKER in value for value in attrs.values())
+
+
+def _is_state_script(attrs: Dict[str, str], body: str) -> bool:
+    if "json" in attrs.get("type", ""):
+        return True
+    return attrs.get("src") is None and bool(STATE_SCRIPT_PATTERN.match(body))
+
+
+def _render_starttag(tag: str, attrs: Dict[str, str], keep, closed: bool) -> str:
+    rendered = "".join(
+        f' {name}="{html.escape(value)}"' for name, value in attrs.items() if keep(name)
+    )
+    return f"<{tag}{rendered}{' /' if closed else ''}>"
+
+
+class PageSlimmer(HTMLParser):
+    """Incremental HTML filter that passes on only the parts of a page that carry data.
+
+    Listing cards are kept with the attributes and text the listing parser
+    reads, scripts holding embedded JSON state are kept verbatim, and the
+    "1-25 of N results" summary and any no-results or error message are
+    kept as paragraphs. Everything else, including bundles, styles, icons
+    and tracking markup, is dropped. Output is handed to write as soon as it
+    is decided, so nothing accumulates.
+    """
+
+    def __init__(self, write: Callable[[str], None]):
+        super().__init__(convert_charrefs=True)
+        self.write = write
+        self.cards = 0
+        self.state_scripts = 0
+        self._card_tag = ""
+        self._card_depth = -1
+        self._dropped_tag = ""
+        self._dropped_depth = 0
+        self._script_attrs: Optional[Dict[str, str]] = None
+        # Text between two tags can arrive over several feeds, so text outside
+        # cards is only inspected once the next tag boundary is reached
+        self._pending_text: List[str] = []
+
+    @property
+    def in_card(self) -> bool:
+        return self._card_depth >= 0
+
+    def _flush_pending_text(self) -> None:
+        if not self._pending_text:
+            return
+        text = " ".join("".join(self._pending_text).split())
+        self._pending_text = []
+        if RESULT_RANGE_PATTERN.search(text) or any(
+            signature in text for signature in SIGNATURE_TEXTS
+        ):
+            self.write(f"<p>{html.escape(text, quote=False)}</p>\n")
+
+    def handle_starttag(self, tag: str, attr_list) -> None:
+        self._start(tag, attr_list, closed=False)
+
+    def handle_startendtag(self, tag: str, attr_list) -> None:
+        self._start(tag, attr_list, closed=True)
+
+    def _start(self, tag: str, attr_list, closed: bool) -> None:
+        self._flush_pending_text()
+        attrs = {name: value or "" for name, value in attr_list}
+
+        if self._dropped_tag:
+            if tag == self._dropped_tag and not closed:
+                self._dropped_depth += 1
+            return
+
+        if tag == "script" and not closed:
+            # The parser hands over the whole body in one piece before the end tag
+            self._script_attrs = attrs
+            return
+
+        if not self.in_card:
+            if not _is_card_root(attrs):
+                return
+            self._card_tag = tag
+            self._card_depth = 0
+            self.cards += 1
+            self.write(
+                _render_starttag(
+                    tag,
+                    attrs,
+                    lambda name: name in CARD_ATTRIBUTES or STOP_MARKER in attrs[name],
+                    closed,
+                )
+            )
+            return
+
+        if tag in DROPPED_VOID_TAGS:
+            return
+        if tag in DROPPED_CARD_TAGS:
+            if not closed:
+                self._dropped_tag = tag
+                self._dropped_depth = 0
+            return
+        if tag == self._card_tag and not closed:
+            self._card_depth += 1
+        self.write(
+            _render_starttag(tag, attrs, lambda name: name in CARD_ATTRIBUTES, closed)
+        )
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_pending_text()
+
+        if self._dropped_tag:
+            if tag == self._dropped_tag:
+                if self._dropped_depth == 0:
+                    self._dropped_tag = ""
+                else:
+                    self._dropped_depth -= 1
+            return
+
+        if tag == "script":
+            self._script_attrs = None
+            return
+
+        if not self.in_card:
+            return
+        if tag in DROPPED_VOID_TAGS:
+            return
+        self.write(f"</{tag}>")
+        if tag == self._card_tag:
+            self._card_depth -= 1
+            if not self.in_card:
+                self.write("\n")
+
+    def handle_data(self, data: str) -> None:
+        if self._script_attrs is not None:
+            self._handle_script(data)
+            return
+        if self._dropped_tag:
+            return
+        if self.in_card:
+            # The listing parser collapses whitespace itself, so one space will do
+            self.write(html.escape(WHITESPACE_PATTERN.sub(" ", data), quote=False))
+            return
+        self._pending_text.append(data)
+
+    def _handle_script(self, body: str) -> None:
+        attrs = self._script_attrs
+        if self.in_card or self._dropped_tag or not _is_state_script(attrs, body):
+            return
+        self.state_scripts += 1
+        self.write(
+            _render_starttag(
+                "script", attrs, lambda name: name in ("id", "type"), False
+            )
+        )
+        self.write(body)
+        self.write("</script>\n")
+
+    def close(self) -> None:
+        super().close()
+        self._flush_pending_text()
+
+
+def slim_page(
+    filename: str, mode: str = "replace", chunk_size: int = SCAN_CHUNK_SIZE
+) -> str:
+    """Rewrite a saved page with only its listing cards and embedded state, return the path.
+
+    The page is read and written a chunk at a time through a temporary
+    file, so neither document is ever held whole. With mode "replace" the
+    slim page takes the original's place, with "beside" it is written next
+    to it. A page that mentions the stop marker outside any card keeps a
+    mention of it, so the slim page is classified the same as the original.
+    """
+    if mode not in SLIM_MODES:
+        raise ValueError(f"Unknown slim mode: {mode}")
+    target = filename if mode == "replace" else slim_filename(filename)
+    temp_path = target + ".tmp"
+
+    marker = STOP_MARKER.encode()
+    overlap = len(marker) - 1
+    tail = b""
+    marker_seen = False
+    raw_bytes = 0
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(temp_path, "w", encoding="utf-8") as output:
+        output.write(SLIM_HEADER)
+        slimmer = PageSlimmer(output.write)
+        for chunk in iter_file_chunks(filename, chunk_size):
+            raw_bytes += len(chunk)
+            if not marker_seen:
+                window = tail + chunk
+                marker_seen = marker in window
+                tail = window[-overlap:]
+            slimmer.feed(decoder.decode(chunk))
+        slimmer.feed(decoder.decode(b"", final=True))
+        slimmer.close()
+        if marker_seen and not slimmer.cards:
+            output.write(f"<!-- {STOP_MARKER} -->\n")
+        output.write(SLIM_FOOTER)
+    os.replace(temp_path, target)
+
+    slim_bytes = os.path.getsize(target)
+    logging.info(
+        f"slim_page: {filename} {raw_bytes} -> {slim_bytes} bytes,"
+        f" {slimmer.cards} cards, {slimmer.state_scripts} state scripts"
+    )
+    return target
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Strip saved search pages down to their listing cards and state"
+    )
+    parser.add_argument("files", nargs="+", help="saved search pages")
+    parser.add_argument("--mode", choices=SLIM_MODES, default="beside")
+    args = parser.parse_args()
+
+    for filename in args.files:
+        slim_page(filename, args.mode)
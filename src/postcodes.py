@@ -0,0 +1,7 @@
+from typing import List
+
+
+def load_postcodes(postcodes_file: str) -> List[str]:
+    """Read postcodes from a line-separated file, ignoring anything after the first space"""
+    with open(postcodes_file, "r") as file:
+        return [line.strip().split(" ")[0] for line in file if line.strip()]
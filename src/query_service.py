@@ -0,0 +1,419 @@
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import queue
+import re
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from constants import (
+    LISTING_STORE_FILE,
+    QUERY_CACHE_ENTRIES,
+    QUERY_CACHE_MAX_BODY,
+    QUERY_CONNECTION_TIMEOUT,
+    QUERY_LISTEN_BACKLOG,
+    QUERY_SERVICE_PORT,
+    QUERY_STORE_CONNECTIONS,
+    QUERY_STREAM_CHUNK,
+)
+from listing_diff import ChangeKind, ListingChange
+from listing_store import LISTING_COLUMNS, ListingStore
+
+CHANGE_COLUMNS = [field.name for field in fields(ListingChange)]
+CONTENT_TYPE = "application/x-ndjson"
+# Query parameters each route accepts, with the pattern their values must match
+PARAMETER_PATTERNS = {
+    "postcode": re.compile(r"\d{4}"),
+    "date": re.compile(r"\d{8}"),
+    "kind": re.compile("|".join(kind.value for kind in ChangeKind)),
+}
+
+
+@dataclass(frozen=True)
+class Response:
+    """A reply ready to send; a streamed reply has chunks instead of a body"""
+
+    status: HTTPStatus
+    etag: Optional[str] = None
+    body: bytes = b""
+    chunks: Optional[Iterator[bytes]] = None
+
+
+class ResponseCache:
+    """LRU cache of response bodies, emptied whenever the store changes.
+
+    Every change starts a new generation. A body computed during an earlier
+    generation is not stored, so a reply racing an ingest is never cached.
+    """
+
+    def __init__(self, capacity: int = QUERY_CACHE_ENTRIES):
+        self.capacity = capacity
+        self.generation = 0
+        self._bodies: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key: str, body: bytes, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._bodies[key] = body
+            self._bodies.move_to_end(key)
+            if len(self._bodies) > self.capacity:
+                self._bodies.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._bodies.clear()
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+
+class QueryService:
+    """Read-only queries over the listing store, answered as JSON lines.
+
+    Routes are /listings, /summaries and /changes; each takes an optional
+    date (the latest by default) and postcode. Replies carry an ETag, so a
+    client repeating a request with If-None-Match gets 304 Not Modified.
+    Replies up to QUERY_CACHE_MAX_BODY are cached. Larger ones are spooled
+    to a temporary file rather than built in memory, and streamed from it
+    once every row is read, so a slow client never holds a store connection.
+    When every connection stays busy for connection_timeout seconds the
+    request gets 503 Service Unavailable.
+    """
+
+    def __init__(
+        self,
+        path: str = LISTING_STORE_FILE,
+        connections: int = QUERY_STORE_CONNECTIONS,
+        cache: Optional[ResponseCache] = None,
+        max_body: int = QUERY_CACHE_MAX_BODY,
+        connection_timeout: float = QUERY_CONNECTION_TIMEOUT,
+    ):
+        # Creates the schema of a new store, so the read-only connections find it
+        ListingStore(path).close()
+        self.cache = cache or ResponseCache()
+        self.max_body = max_body
+        self.connection_timeout = connection_timeout
+        self.routes: Dict[str, Callable[[sqlite3.Connection, dict], Iterator[dict]]] = {
+            "/listings": query_listings,
+            "/summaries": query_summaries,
+            "/changes": query_changes,
+        }
+        self._pool: queue.Queue = queue.Queue()
+        for _ in range(connections):
+            self._pool.put(_connect_read_only(path))
+        self._watcher = _connect_read_only(path)
+        self._watcher_lock = threading.Lock()
+        self._data_version = self._read_data_version()
+        # ETags from an earlier process never match, as its generations differ
+        self._started = time.time_ns()
+
+    def close(self) -> None:
+        self._watcher.close()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    def _read_data_version(self) -> int:
+        return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def check_for_changes(self) -> int:
+        """Invalidate the cache if another connection has written to the store.
+
+        SQLite bumps data_version for every commit made by another connection,
+        so each ingest, dedupe or diff is seen by the next request. Returns
+        the cache generation to answer the request under.
+        """
+        with self._watcher_lock:
+            data_version = self._read_data_version()
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self.cache.invalidate()
+                logging.info("check_for_changes: Store changed, cleared the cache")
+            return self.cache.generation
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._pool.get(timeout=self.connection_timeout)
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def respond(
+        self, path: str, params: Dict[str, str], if_none_match: Optional[str] = None
+    ) -> Response:
+        """Answer a GET of path with the given query parameters"""
+        query = self.routes.get(path)
+        if query is None:
+            return error_response(HTTPStatus.NOT_FOUND, f"No such route: {path}")
+        for name, value in params.items():
+            pattern = PARAMETER_PATTERNS.get(name)
+            if pattern is None or not pattern.fullmatch(value):
+                return error_response(
+                    HTTPStatus.BAD_REQUEST, f"Bad parameter: {name}={value}"
+                )
+
+        generation = self.check_for_changes()
+        key = f"{path}?{urlencode(sorted(params.items()))}"
+        etag = self._etag(key, generation)
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            return Response(HTTPStatus.NOT_MODIFIED, etag)
+        body = self.cache.get(key)
+        if body is not None:
+            return Response(HTTPStatus.OK, etag, body)
+
+        try:
+            body, spool = self._read_reply(query, params)
+        except queue.Empty:
+            logging.warning(f"respond: No store connection free for {key}")
+            return error_response(
+                HTTPStatus.SERVICE_UNAVAILABLE, "Every store connection is busy"
+            )
+        if spool is not None:
+            return Response(HTTPStatus.OK, etag, chunks=_spooled_chunks(spool))
+        self.cache.put(key, body, generation)
+        return Response(HTTPStatus.OK, etag, body)
+
+    def _read_reply(
+        self,
+        query: Callable[[sqlite3.Connection, dict], Iterator[dict]],
+        params: Dict[str, str],
+    ) -> Tuple[bytes, Optional[BinaryIO]]:
+        """Read a whole reply, as a body up to max_body or else a spooled file"""
+        buffered: List[bytes] = []
+        size = 0
+        spool = None
+        try:
+            for chunk in self._encoded_rows(query, params):
+                if spool is not None:
+                    spool.write(chunk)
+                    continue
+                buffered.append(chunk)
+                size += len(chunk)
+                if size > self.max_body:
+                    # Too big to cache or keep in memory
+                    spool = tempfile.TemporaryFile()
+                    spool.writelines(buffered)
+        except BaseException:
+            if spool is not None:
+                spool.close()
+            raise
+        return b"".join(buffered) if spool is None else b"", spool
+
+    def _etag(self, key: str, generation: int) -> str:
+        digest = hashlib.sha1(f"{self._started}:{generation}:{key}".encode())
+        return f'"{digest.hexdigest()[:20]}"'
+
+    def _encoded_rows(
+        self,
+        query: Callable[[sqlite3.Connection, dict], Iterator[dict]],
+        params: Dict[str, str],
+    ) -> Iterator[bytes]:
+        """JSON lines of a query's rows, in chunks of about QUERY_STREAM_CHUNK bytes"""
+        with self._connection() as connection:
+            lines = []
+            size = 0
+            for row in query(connection, params):
+                line = json.dumps(row) + "\n"
+                lines.append(line)
+                size += len(line)
+                if size >= QUERY_STREAM_CHUNK:
+                    yield "".join(lines).encode()
+                    lines = []
+                    size = 0
+            if lines:
+                yield "".join(lines).encode()
+
+
+def _spooled_chunks(spool: BinaryIO) -> Iterator[bytes]:
+    """A spooled reply in QUERY_STREAM_CHUNK pieces, closing the file once sent"""
+    try:
+        spool.seek(0)
+        while chunk := spool.read(QUERY_STREAM_CHUNK):
+            yield chunk
+    finally:
+        spool.close()
+
+
+def _connect_read_only(path: str) -> sqlite3.Connection:
+    # Shared between request threads, one request at a time, through the pool
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Pure function to check an If-None-Match header against an ETag"""
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def error_response(status: HTTPStatus, message: str) -> Response:
+    return Response(status, body=(json.dumps({"error": message}) + "\n").encode())
+
+
+def latest_date(
+    connection: sqlite3.Connection, params: Dict[str, str], column: str, table: str
+) -> Optional[str]:
+    """The requested date, or the most recent one in table"""
+    if "date" in params:
+        return params["date"]
+    return connection.execute(f"SELECT MAX({column}) FROM {table}").fetchone()[0]
+
+
+def query_listings(
+    connection: sqlite3.Connection, params: Dict[str, str]
+) -> Iterator[dict]:
+    """Deduplicated listings of one scrape date, in page order"""
+    scrape_date = latest_date(connection, params, "scrape_date", "listings")
+    query = (
+        f"SELECT {', '.join(LISTING_COLUMNS)} FROM unique_listings"
+        " WHERE scrape_date = ?"
+    )
+    values = [scrape_date]
+    if "postcode" in params:
+        query += " AND postcode = ?"
+        values.append(params["postcode"])
+    rows = connection.execute(query + " ORDER BY postcode, page_num, position", values)
+    for row in rows:
+        yield dict(zip(LISTING_COLUMNS, row))
+
+
+def query_summaries(
+    connection: sqlite3.Connection, params: Dict[str, str]
+) -> Iterator[dict]:
+    """Listing count and price spread of each postcode on one scrape date"""
+    scrape_date = latest_date(connection, params, "scrape_date", "listings")
+    query = "SELECT postcode, price FROM unique_listings WHERE scrape_date = ?"
+    values = [scrape_date]
+    if "postcode" in params:
+        query += " AND postcode = ?"
+        values.append(params["postcode"])
+    rows = connection.execute(query + " ORDER BY postcode, price", values)
+    for postcode, group in itertools.groupby(rows, key=lambda row: row[0]):
+        prices = [price for _, price in group]
+        known = [price for price in prices if price is not None]
+        yield {
+            "postcode": postcode,
+            "scrape_date": scrape_date,
+            "listings": len(prices),
+            "priced": len(known),
+            "median_price": statistics.median(known) if known else None,
+            "min_price": known[0] if known else None,
+            "max_price": known[-1] if known else None,
+        }
+
+
+def query_changes(
+    connection: sqlite3.Connection, params: Dict[str, str]
+) -> Iterator[dict]:
+    """Listing changes reported on one scrape date, from the materialised feed"""
+    new_date = latest_date(connection, params, "new_date", "listing_changes")
+    query = (
+        f"SELECT {', '.join(CHANGE_COLUMNS)} FROM listing_changes WHERE new_date = ?"
+    )
+    values = [new_date]
+    for name in ("postcode", "kind"):
+        if name in params:
+            query += f" AND {name} = ?"
+            values.append(params[name])
+    rows = connection.execute(query + " ORDER BY postcode, listing_id", values)
+    for row in rows:
+        yield dict(zip(CHANGE_COLUMNS, row))
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Serves GET requests from the server's QueryService"""
+
+    protocol_version = "HTTP/1.1"
+    server: "QueryServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        response = self.server.service.respond(
+            url.path, params, self.headers.get("If-None-Match")
+        )
+        self.send_response(response.status)
+        if response.etag is not None:
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            self.end_headers()
+            return
+        self.send_header("Content-Type", CONTENT_TYPE)
+        if response.chunks is None:
+            self.send_header("Content-Length", str(len(response.body)))
+            self.end_headers()
+            self.wfile.write(response.body)
+            return
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._write_chunks(response.chunks)
+
+    def _write_chunks(self, chunks: Iterator[bytes]) -> None:
+        try:
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            # Removes the spooled reply even if the client went away
+            chunks.close()
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+class QueryServer(ThreadingHTTPServer):
+    """A thread per client, so slow or streaming clients never hold up others"""
+
+    daemon_threads = True
+    request_queue_size = QUERY_LISTEN_BACKLOG
+
+    def __init__(self, address, service: QueryService):
+        super().__init__(address, QueryHandler)
+        self.service = service
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Serve listings, postcode summaries and changes over local HTTP"
+    )
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=QUERY_SERVICE_PORT)
+    args = parser.parse_args()
+
+    service = QueryService(args.store)
+    with QueryServer((args.host, args.port), service) as server:
+        logging.info(f"Serving {args.store} on http://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    service.close()
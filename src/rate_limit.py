@@ -0,0 +1,42 @@
+import multiprocessing
+
+import clock
+
+
+class TokenBucket:
+    """Requests-per-minute budget shared by every process it is passed to.
+
+    Its state lives in shared memory behind a lock, so worker processes
+    started with the bucket draw from one budget however many there are.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: int = 1,
+        context=multiprocessing,
+    ):
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self._lock = context.Lock()
+        # Tokens available and when they were last topped up
+        self._state = context.Array("d", [float(burst), clock.monotonic()], lock=False)
+
+    def _refill(self, now: float) -> None:
+        tokens, updated_at = self._state[0], self._state[1]
+        self._state[0] = min(self.burst, tokens + (now - updated_at) * self.rate)
+        self._state[1] = now
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available, else return the seconds until one is"""
+        with self._lock:
+            self._refill(clock.monotonic())
+            if self._state[0] >= 1:
+                self._state[0] -= 1
+                return 0.0
+            return (1 - self._state[0]) / self.rate
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it"""
+        while (wait := self.try_acquire()) > 0:
+            clock.sleep(wait)
@@ -0,0 +1,128 @@
+import logging
+import os
+import shutil
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+import clock
+from browser_controller import BrowserController
+from constants import (
+    BROWSER_OPEN_WAIT,
+    PAGE_LOAD_BASE_WAIT,
+    PAGE_LOAD_JITTER,
+    SAVE_SETTLE_TIME,
+)
+from metrics import Phase, load_spans, summarise_spans
+from run_ledger import SAVED_PAGE_PATTERN
+from synthetic_pages import SEARCH_URL_PATTERN, render_search_page
+
+
+@dataclass(frozen=True)
+class PhaseTimings:
+    """Simulated seconds each controller operation takes"""
+
+    open_browser: float = BROWSER_OPEN_WAIT + 1.0
+    initial_setup: float = 9.0
+    close_browser: float = 0.5
+    # Keyboard entry plus the mean of the exponential page-load wait
+    navigate: float = PAGE_LOAD_BASE_WAIT + PAGE_LOAD_JITTER + 1.0
+    save: float = 4.0 + SAVE_SETTLE_TIME
+    human_activity: float = 8.0
+
+
+def timings_from_metrics(metrics_file: str) -> PhaseTimings:
+    """Median duration of each controller phase of a recorded run, defaults elsewhere"""
+    report = summarise_spans(load_spans(metrics_file))
+    medians = {
+        phase.value: report.phases[phase.value].p50
+        for phase in (
+            Phase.OPEN_BROWSER,
+            Phase.INITIAL_SETUP,
+            Phase.CLOSE_BROWSER,
+            Phase.NAVIGATE,
+            Phase.SAVE,
+            Phase.HUMAN_ACTIVITY,
+        )
+        if phase.value in report.phases
+    }
+    return replace(PhaseTimings(), **medians)
+
+
+class ReplayBrowserController(BrowserController):
+    """Controller that replays a recorded run's pages and sleeps simulated timings.
+
+    Pages of postcodes missing from the recording are generated instead, so a
+    short recorded run can stand in for the whole postcode list. Past a
+    recorded postcode's last page a generated no-results page is served,
+    since its _completed.html marker may be a stub. Sleeps go
+    through the installed clock, which a simulation replaces with a
+    VirtualClock.
+    """
+
+    def __init__(
+        self,
+        recorded_dir: Optional[str] = None,
+        recorded_date: Optional[str] = None,
+        timings: Optional[PhaseTimings] = None,
+        default_results: int = 60,
+    ):
+        self.timings = timings or PhaseTimings()
+        self.default_results = default_results
+        self.current: Optional[Tuple[str, int]] = None
+        self.pages: Dict[str, Dict[int, str]] = {}
+        if recorded_dir and recorded_date:
+            self._scan(recorded_dir, recorded_date)
+
+    def _scan(self, recorded_dir: str, recorded_date: str) -> None:
+        with os.scandir(recorded_dir) as entries:
+            for entry in entries:
+                match = SAVED_PAGE_PATTERN.match(entry.name)
+                if not match or match.group(1) != recorded_date:
+                    continue
+                postcode, page = match.group(2), match.group(3)
+                if page != "completed":
+                    self.pages.setdefault(postcode, {})[int(page)] = entry.path
+        logging.info(
+            f"_scan: Replaying {len(self.pages)} recorded postcodes from {recorded_dir}"
+        )
+
+    def open_browser(self) -> None:
+        clock.sleep(self.timings.open_browser)
+
+    def perform_initial_setup(self) -> None:
+        clock.sleep(self.timings.initial_setup)
+
+    def close_browser(self) -> None:
+        clock.sleep(self.timings.close_browser)
+
+    def navigate_to(self, url: str) -> None:
+        match = SEARCH_URL_PATTERN.search(url)
+        if match is None:
+            raise ValueError(f"Not a search URL: {url}")
+        self.current = (match.group(1), int(match.group(2)))
+        clock.sleep(self.timings.navigate)
+
+    def save_page(self, filepath: str) -> None:
+        if self.current is None:
+            raise RuntimeError("save_page called before navigate_to")
+        postcode, page_num = self.current
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+        pages = self.pages.get(postcode)
+        source = pages.get(page_num) if pages is not None else None
+        if source is None:
+            # Past a recorded postcode's last page the site shows no results
+            total_results = self.default_results if pages is None else 0
+            with open(filepath, "w", encoding="utf-8") as file:
+                file.write(render_search_page(postcode, page_num, total_results))
+        else:
+            # Hard links keep a replayed night from copying gigabytes of pages
+            try:
+                os.link(source, filepath)
+            except OSError:
+                shutil.copyfile(source, filepath)
+        clock.sleep(self.timings.save)
+
+    def perform_human_like_activity(self) -> None:
+        clock.sleep(self.timings.human_activity)
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+
+from constants import METRICS_SUFFIX, OUTPUT_DIR
+from metrics import load_spans, summarise_spans
+from run_ledger import latest_run_date
+
+
+def format_duration(seconds: float) -> str:
+    """Pure function to render seconds as h:mm:ss"""
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Summarise where a scrape run's time went"
+    )
+    parser.add_argument(
+        "metrics_file",
+        nargs="?",
+        help="metrics JSONL to read (default: the latest run's)",
+    )
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    metrics_file = args.metrics_file
+    if metrics_file is None:
+        run_date = latest_run_date(args.output_dir)
+        if run_date is None:
+            sys.exit(f"No runs recorded in {args.output_dir}")
+        metrics_file = os.path.join(args.output_dir, f"{run_date}{METRICS_SUFFIX}")
+
+    report = summarise_spans(load_spans(metrics_file))
+
+    print(
+        f"{'phase':<16}{'count':>8}{'errors':>8}{'p50 s':>10}{'p95 s':>10}{'total':>12}"
+    )
+    for phase, summary in report.phases.items():
+        print(
+            f"{phase:<16}{summary.count:>8}{summary.errors:>8}"
+            f"{summary.p50:>10.2f}{summary.p95:>10.2f}"
+            f"{format_duration(summary.total):>12}"
+        )
+
+    busy = report.wait_seconds + report.work_seconds
+    wait_share = report.wait_seconds / busy * 100 if busy else 0.0
+    print()
+    print(f"Pages            {report.pages}")
+    print(f"Wall clock       {format_duration(report.wall_seconds)}")
+    print(f"Pages per hour   {report.pages_per_hour:.1f}")
+    print(
+        f"Waiting          {format_duration(report.wait_seconds)} ({wait_share:.0f}%)"
+    )
+    print(
+        f"Working          {format_duration(report.work_seconds)}"
+        f" ({100 - wait_share if busy else 0.0:.0f}%)"
+    )
@@ -0,0 +1,379 @@
+import fcntl
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+
+import clock
+from constants import (
+    OUTPUT_DIR,
+    PAGE_RETRY_LIMIT,
+    RUN_LOG_SUFFIX,
+    RUN_RESUME_MAX_DAYS,
+)
+
+SAVED_PAGE_PATTERN = re.compile(r"^(\d{8})_(\d+)_(\d+|completed)\.html$")
+RUN_LOG_PATTERN = re.compile(r"^(\d{8})" + re.escape(RUN_LOG_SUFFIX) + "$")
+
+
+class PageState(str, Enum):
+    PENDING = "pending"
+    SAVED = "saved"
+    STOPPED = "stopped"
+    FAILED = "failed"
+
+
+@dataclass
+class PageRecord:
+    """State of one page of one postcode within a run"""
+
+    postcode: str
+    page_num: int
+    state: PageState
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+@dataclass
+class RetryRecord:
+    """A page queued to be fetched again, with how many times it came back bad"""
+
+    postcode: str
+    page_num: int
+    page_class: str
+    attempts: int = 1
+
+
+@dataclass
+class PostcodeProgress:
+    """Pages seen so far for one postcode and whether it has finished"""
+
+    pages: Dict[int, PageRecord]
+    completed: bool = False
+    planned_pages: Optional[int] = None
+    total_results: Optional[int] = None
+    completed_pages: Optional[int] = None
+    incremental: bool = False
+    retries: Dict[int, RetryRecord] = field(default_factory=dict)
+    given_up: bool = False
+
+
+def is_stale_run(
+    run_date: str, today: str, max_days: int = RUN_RESUME_MAX_DAYS
+) -> bool:
+    """Whether a run started too long before today to be worth resuming"""
+    started = datetime.strptime(run_date, "%Y%m%d")
+    return (datetime.strptime(today, "%Y%m%d") - started).days > max_days
+
+
+def latest_run_date(output_dir: str = OUTPUT_DIR) -> Optional[str]:
+    """Date of the most recent run with an event log in output_dir, if any"""
+    with os.scandir(output_dir) as entries:
+        run_dates = [
+            match.group(1)
+            for entry in entries
+            if (match := RUN_LOG_PATTERN.match(entry.name))
+        ]
+    return max(run_dates, default=None)
+
+
+class RunLedger:
+    """Postcode and page state for one run, pinned to the date the run started.
+
+    State is rebuilt from a single scan of the output directory plus the
+    run's append-only event log, so startup never probes files one by one
+    and a run that crosses midnight keeps using its original date.
+    """
+
+    def __init__(self, run_date: str, output_dir: str = OUTPUT_DIR):
+        self.run_date = run_date
+        self.output_dir = output_dir
+        self.log_path = os.path.join(output_dir, f"{run_date}{RUN_LOG_SUFFIX}")
+        self.finished = False
+        self._progress: Dict[str, PostcodeProgress] = {}
+        self._load()
+
+    @classmethod
+    def resume_or_start(
+        cls,
+        postcodes: List[str],
+        output_dir: str = OUTPUT_DIR,
+        today: Optional[str] = None,
+    ) -> "RunLedger":
+        """Resume the most recent unfinished run, otherwise start one for today.
+
+        A run unfinished for more than RUN_RESUME_MAX_DAYS is abandoned, so a
+        scraper left stopped for weeks does not finish an old run with stale
+        pages before collecting today's.
+        """
+        today = today or datetime.now().strftime("%Y%m%d")
+        os.makedirs(output_dir, exist_ok=True)
+
+        run_date = latest_run_date(output_dir)
+        if run_date is not None:
+            latest = cls(run_date, output_dir)
+            # A run that completed every postcode but exited before recording it
+            if not latest.finished and not latest.remaining_postcodes(postcodes):
+                latest.mark_finished()
+            elif not latest.finished and is_stale_run(run_date, today):
+                logging.warning(
+                    f"resume_or_start: Abandoning run {run_date}, started more than"
+                    f" {RUN_RESUME_MAX_DAYS} days before {today}"
+                )
+                latest.mark_finished()
+            if not latest.finished or latest.run_date == today:
+                return latest
+        return cls(today, output_dir)
+
+    def _progress_for(self, postcode: str) -> PostcodeProgress:
+        return self._progress.setdefault(postcode, PostcodeProgress(pages={}))
+
+    def _load(self) -> None:
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                match = SAVED_PAGE_PATTERN.match(entry.name)
+                if not match or match.group(1) != self.run_date:
+                    continue
+                postcode, page = match.group(2), match.group(3)
+                progress = self._progress_for(postcode)
+                if page == "completed":
+                    progress.completed = True
+                else:
+                    page_num = int(page)
+                    progress.pages[page_num] = PageRecord(
+                        postcode, page_num, PageState.SAVED
+                    )
+
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._apply(json.loads(line))
+
+    def _apply(self, event: Dict) -> None:
+        kind = event["event"]
+        if kind == "run_finished":
+            self.finished = True
+        elif kind == "postcode_completed":
+            progress = self._progress_for(event["postcode"])
+            progress.completed = True
+            progress.completed_pages = event.get("pages")
+            progress.incremental = event.get("incremental", False)
+        elif kind == "postcode_given_up":
+            self._progress_for(event["postcode"]).given_up = True
+        elif kind == "postcode_planned":
+            progress = self._progress_for(event["postcode"])
+            progress.planned_pages = event["planned_pages"]
+            progress.total_results = event["total_results"]
+        elif kind == "page":
+            record = PageRecord(
+                postcode=event["postcode"],
+                page_num=event["page_num"],
+                state=PageState(event["state"]),
+                started_at=event["started_at"],
+                finished_at=event["finished_at"],
+            )
+            self._progress_for(record.postcode).pages[record.page_num] = record
+        elif kind == "page_retry":
+            retries = self._progress_for(event["postcode"]).retries
+            previous = retries.get(event["page_num"])
+            retries[event["page_num"]] = RetryRecord(
+                event["postcode"],
+                event["page_num"],
+                event["page_class"],
+                previous.attempts + 1 if previous else 1,
+            )
+
+    def _append(self, event: Dict) -> None:
+        self._apply(event)
+        # Worker processes share the log, so each event is one locked append
+        with open(self.log_path, "a", encoding="utf-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.write(json.dumps(event) + "\n")
+
+    def is_postcode_completed(self, postcode: str) -> bool:
+        progress = self._progress.get(postcode)
+        return progress is not None and progress.completed
+
+    def is_postcode_given_up(self, postcode: str) -> bool:
+        progress = self._progress.get(postcode)
+        return progress is not None and progress.given_up
+
+    def remaining_postcodes(self, postcodes: Iterable[str]) -> List[str]:
+        """Postcodes neither completed nor given up in this run, in their original order"""
+        return [
+            p
+            for p in postcodes
+            if not self.is_postcode_completed(p) and not self.is_postcode_given_up(p)
+        ]
+
+    def page_state(self, postcode: str, page_num: int) -> PageState:
+        progress = self._progress.get(postcode)
+        if progress is None or page_num not in progress.pages:
+            return PageState.PENDING
+        return progress.pages[page_num].state
+
+    def last_saved_page(self, postcode: str) -> int:
+        """Highest page saved for postcode in this run, 0 if none"""
+        return max(
+            (
+                record.page_num
+                for record in self.pages(postcode)
+                if record.state == PageState.SAVED
+            ),
+            default=0,
+        )
+
+    def pages(self, postcode: str) -> List[PageRecord]:
+        progress = self._progress.get(postcode)
+        if progress is None:
+            return []
+        return sorted(progress.pages.values(), key=lambda record: record.page_num)
+
+    def record_page(
+        self,
+        postcode: str,
+        page_num: int,
+        state: PageState,
+        started_at: Optional[float] = None,
+        finished_at: Optional[float] = None,
+    ) -> None:
+        record = PageRecord(
+            postcode, page_num, state, started_at, finished_at or clock.now()
+        )
+        self._append({"event": "page", **asdict(record), "state": state.value})
+
+    def queue_retry(
+        self,
+        postcode: str,
+        page_num: int,
+        page_class: str,
+        max_attempts: int = PAGE_RETRY_LIMIT,
+    ) -> bool:
+        """Queue a page that was not a genuine result page to be fetched again.
+
+        Once the page has come back bad max_attempts times the postcode is
+        given up on for this run instead, so the run can still finish.
+        Returns whether it was given up.
+        """
+        self._append(
+            {
+                "event": "page_retry",
+                "postcode": postcode,
+                "page_num": page_num,
+                "page_class": page_class,
+            }
+        )
+        if self._progress[postcode].retries[page_num].attempts < max_attempts:
+            return False
+        self._append(
+            {
+                "event": "postcode_given_up",
+                "postcode": postcode,
+                "page_num": page_num,
+                "page_class": page_class,
+            }
+        )
+        return True
+
+    def retry_queue(self, max_attempts: int = PAGE_RETRY_LIMIT) -> List[RetryRecord]:
+        """Queued pages still bad, of unfinished postcodes, not yet given up on.
+
+        A queued page leaves the queue once a later fetch saves it or finds
+        the postcode's genuine end.
+        """
+        return [
+            retry
+            for progress in self._progress.values()
+            if not progress.completed and not progress.given_up
+            for retry in progress.retries.values()
+            if retry.attempts < max_attempts
+            and self.page_state(retry.postcode, retry.page_num) == PageState.FAILED
+        ]
+
+    def retry_postcodes(self, max_attempts: int = PAGE_RETRY_LIMIT) -> List[str]:
+        return sorted({retry.postcode for retry in self.retry_queue(max_attempts)})
+
+    def given_up_postcodes(self, postcodes: Iterable[str]) -> List[str]:
+        return [p for p in postcodes if self.is_postcode_given_up(p)]
+
+    def planned_pages(self, postcode: str) -> Optional[int]:
+        progress = self._progress.get(postcode)
+        return progress.planned_pages if progress is not None else None
+
+    def record_plan(
+        self, postcode: str, planned_pages: int, total_results: int
+    ) -> None:
+        self._append(
+            {
+                "event": "postcode_planned",
+                "postcode": postcode,
+                "planned_pages": planned_pages,
+                "total_results": total_results,
+            }
+        )
+
+    def mark_postcode_completed(
+        self, postcode: str, pages: Optional[int] = None, incremental: bool = False
+    ) -> None:
+        """Record postcode as done, with the number of listing pages it actually had.
+
+        An incremental postcode stopped at already-known listings, so pages
+        is how far it was crawled rather than how many pages it has.
+        """
+        event = {"event": "postcode_completed", "postcode": postcode}
+        if pages is not None:
+            event["pages"] = pages
+        if incremental:
+            event["incremental"] = True
+        self._append(event)
+
+    def is_incremental(self, postcode: str) -> bool:
+        """Whether postcode was completed without crawling all of its pages"""
+        progress = self._progress.get(postcode)
+        return progress is not None and progress.incremental
+
+    def plan_accuracy(self, postcodes: Iterable[str]) -> Dict[str, int]:
+        """Count completed postcodes whose page plan matched, missed, or was absent"""
+        counts = {"matched": 0, "mismatched": 0, "unplanned": 0, "incremental": 0}
+        for postcode in postcodes:
+            progress = self._progress.get(postcode)
+            if progress is None or progress.completed_pages is None:
+                continue
+            if progress.incremental:
+                counts["incremental"] += 1
+            elif progress.planned_pages is None:
+                counts["unplanned"] += 1
+            elif progress.planned_pages == progress.completed_pages:
+                counts["matched"] += 1
+            else:
+                counts["mismatched"] += 1
+        return counts
+
+    def mark_finished(self) -> None:
+        self._append({"event": "run_finished"})
+
+    def state_counts(self, postcodes: Iterable[str]) -> Dict[str, int]:
+        """Summarise postcodes as completed/given_up/in_progress/pending and pages by state"""
+        counts = {"completed": 0, "given_up": 0, "in_progress": 0, "pending": 0}
+        counts.update(
+            {state.value: 0 for state in PageState if state != PageState.PENDING}
+        )
+        for postcode in postcodes:
+            progress = self._progress.get(postcode)
+            if progress is None:
+                counts["pending"] += 1
+                continue
+            if progress.completed:
+                counts["completed"] += 1
+            elif progress.given_up:
+                counts["given_up"] += 1
+            else:
+                counts["in_progress"] += 1
+            for record in progress.pages.values():
+                counts[record.state.value] += 1
+        return counts
@@ -0,0 +1,111 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import time
+from typing import Optional
+
+from constants import SAVE_POLL_INITIAL, SAVE_POLL_MAX, SAVE_SETTLE_TIME, SAVE_TIMEOUT
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+class SaveTimeoutError(Exception):
+    """Raised when a saved page does not appear, or keeps growing, past the timeout"""
+
+
+class DirectoryWatch:
+    """inotify watch on one directory, used only to wake up when it changes"""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def wait(self, timeout: float) -> None:
+        """Block until something in the directory changes or timeout passes"""
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if readable:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_directory_watch(directory: str) -> Optional[DirectoryWatch]:
+    """Watch directory with inotify, or return None where inotify is unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return DirectoryWatch(fd)
+
+
+def _file_size(filepath: str) -> Optional[int]:
+    try:
+        return os.stat(filepath).st_size
+    except FileNotFoundError:
+        return None
+
+
+def wait_for_saved_file(
+    filepath: str,
+    timeout: float = SAVE_TIMEOUT,
+    settle_time: float = SAVE_SETTLE_TIME,
+) -> int:
+    """Wait until filepath exists with a size unchanged for settle_time, and return it.
+
+    Wakes on inotify events for the file's directory, falling back to polling
+    with exponential backoff, so a fast save returns as soon as it settles
+    rather than after a fixed sleep.
+    """
+    deadline = time.monotonic() + timeout
+    directory = os.path.dirname(os.path.abspath(filepath))
+    watch = open_directory_watch(directory)
+    poll_delay = SAVE_POLL_INITIAL
+    last_size: Optional[int] = None
+    changed_at = time.monotonic()
+
+    try:
+        while True:
+            now = time.monotonic()
+            size = _file_size(filepath)
+            if size != last_size:
+                last_size = size
+                changed_at = now
+            elif size and now - changed_at >= settle_time:
+                logging.info(f"wait_for_saved_file: {filepath} settled at {size} bytes")
+                return size
+
+            if now >= deadline:
+                state = "never appeared" if not size else "was still changing"
+                raise SaveTimeoutError(f"{filepath} {state} after {timeout} seconds")
+
+            # Sleep until the size could count as settled, or the deadline
+            wait = deadline - now
+            if size:
+                wait = min(wait, changed_at + settle_time - now)
+            if watch is not None:
+                watch.wait(wait)
+            else:
+                time.sleep(min(wait, poll_delay))
+                poll_delay = min(poll_delay * 2, SAVE_POLL_MAX)
+    finally:
+        if watch is not None:
+            watch.close()
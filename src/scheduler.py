@@ -0,0 +1,306 @@
+import argparse
+import json
+import math
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from constants import (
+    FULL_CRAWL_INTERVAL_DAYS,
+    LISTING_STORE_FILE,
+    OUTPUT_DIR,
+    POSTCODES_FILE,
+    SCHEDULE_BUDGET_PAGES,
+    SCHEDULE_HISTORY_DAYS,
+    SCHEDULE_MAX_INTERVAL_DAYS,
+    SCHEDULE_SECONDS_PER_PAGE,
+    SCHEDULE_SUFFIX,
+)
+from incremental import days_between
+from listing_store import ListingStore
+from postcodes import load_postcodes
+
+
+@dataclass
+class PostcodeHistory:
+    """What recent crawls of one postcode cost and how much changed between them"""
+
+    postcode: str
+    full_pages: List[int]
+    incremental_pages: List[int]
+    changes: int = 0
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+    last_full_date: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ScheduleEntry:
+    """One postcode chosen for a run, with why and at what expected cost"""
+
+    postcode: str
+    reason: str
+    priority: float
+    expected_pages: int
+    full_crawl: bool
+
+
+@dataclass(frozen=True)
+class SchedulePlan:
+    """Postcodes to crawl in one run, highest priority first, within a page budget"""
+
+    run_date: str
+    budget_pages: int
+    entries: List[ScheduleEntry]
+    deferred: List[str]
+
+    @property
+    def postcodes(self) -> List[str]:
+        return [entry.postcode for entry in self.entries]
+
+    @property
+    def expected_pages(self) -> int:
+        return sum(entry.expected_pages for entry in self.entries)
+
+    def entry(self, postcode: str) -> Optional[ScheduleEntry]:
+        return next((e for e in self.entries if e.postcode == postcode), None)
+
+
+def schedule_filename(run_date: str, output_dir: str = OUTPUT_DIR) -> str:
+    """Pure function giving where a run's schedule is written"""
+    return os.path.join(output_dir, f"{run_date}{SCHEDULE_SUFFIX}")
+
+
+def load_history(
+    store: ListingStore, run_date: str, history_days: int = SCHEDULE_HISTORY_DAYS
+) -> Dict[str, PostcodeHistory]:
+    """Page counts, change counts and crawl dates per postcode from the listing store.
+
+    Crawl dates come from published snapshots, so a postcode whose crawls
+    find nothing is still known to have been crawled.
+    """
+    since_date = (
+        datetime.strptime(run_date, "%Y%m%d") - timedelta(days=history_days)
+    ).strftime("%Y%m%d")
+    # Every published crawl has a snapshot, even one that found no listings;
+    # listings add page counts, and dates from before snapshots were kept
+    crawls: Dict[Tuple[str, str], List] = {
+        (postcode, scrape_date): [bool(is_full), 1]
+        for postcode, scrape_date, is_full in store.connection.execute(
+            "SELECT postcode, scrape_date, is_full FROM postcode_snapshots"
+            " WHERE scrape_date < ?",
+            (run_date,),
+        )
+    }
+    rows = store.connection.execute(
+        "SELECT postcode, scrape_date, MAX(page_num) FROM listings"
+        " WHERE scrape_date < ? GROUP BY postcode, scrape_date",
+        (run_date,),
+    )
+    for postcode, scrape_date, pages in rows:
+        crawls.setdefault((postcode, scrape_date), [True, 1])[1] = pages
+
+    history: Dict[str, PostcodeHistory] = {}
+    for (postcode, scrape_date), (is_full, pages) in sorted(crawls.items()):
+        entry = history.setdefault(postcode, PostcodeHistory(postcode, [], []))
+        entry.last_date = scrape_date
+        if is_full:
+            entry.last_full_date = scrape_date
+        if scrape_date < since_date:
+            continue
+        entry.first_date = entry.first_date or scrape_date
+        (entry.full_pages if is_full else entry.incremental_pages).append(pages)
+
+    rows = store.connection.execute(
+        "SELECT postcode, COUNT(*) FROM listing_changes"
+        " WHERE new_date >= ? AND new_date < ? GROUP BY postcode",
+        (since_date, run_date),
+    )
+    for postcode, changes in rows:
+        if postcode in history:
+            history[postcode].changes = changes
+    return history
+
+
+def churn_per_day(history: PostcodeHistory) -> float:
+    """Pure function giving the listing changes per day seen over the history window"""
+    if history.first_date is None or history.first_date == history.last_date:
+        return 0.0
+    return history.changes / days_between(history.first_date, history.last_date)
+
+
+def expected_pages(history: PostcodeHistory, full_crawl: bool) -> int:
+    """Pure function estimating the pages a crawl will load, from recent crawls"""
+    pages = history.full_pages
+    if not full_crawl and history.incremental_pages:
+        pages = history.incremental_pages
+    if not pages:
+        return 1
+    return math.ceil(sum(pages) / len(pages))
+
+
+def schedule_entry(
+    postcode: str,
+    history: Optional[PostcodeHistory],
+    run_date: str,
+    full_crawl_days: int = FULL_CRAWL_INTERVAL_DAYS,
+    max_interval_days: int = SCHEDULE_MAX_INTERVAL_DAYS,
+) -> ScheduleEntry:
+    """Pure function deciding why and how urgently a postcode should be crawled.
+
+    Priority is the number of changes expected to have piled up since the
+    last crawl. Postcodes never crawled, due a full crawl or not visited for
+    max_interval_days are mandatory and get infinite priority.
+    """
+    if history is None or history.last_date is None:
+        return ScheduleEntry(postcode, "new", math.inf, 1, True)
+
+    full_crawl = (
+        history.last_full_date is None
+        or days_between(history.last_full_date, run_date) >= full_crawl_days
+    )
+    days_since = days_between(history.last_date, run_date)
+    pages = expected_pages(history, full_crawl)
+    if full_crawl:
+        return ScheduleEntry(postcode, "full_crawl_due", math.inf, pages, True)
+    if days_since >= max_interval_days:
+        return ScheduleEntry(postcode, "stale", math.inf, pages, False)
+    priority = churn_per_day(history) * days_since
+    return ScheduleEntry(postcode, "churn", priority, pages, False)
+
+
+def build_plan(
+    postcodes: List[str],
+    history: Dict[str, PostcodeHistory],
+    run_date: str,
+    budget_pages: int = SCHEDULE_BUDGET_PAGES,
+    full_crawl_days: int = FULL_CRAWL_INTERVAL_DAYS,
+    max_interval_days: int = SCHEDULE_MAX_INTERVAL_DAYS,
+) -> SchedulePlan:
+    """Greedily fill the page budget, mandatory postcodes first, then by changes per page"""
+    candidates = [
+        schedule_entry(
+            postcode,
+            history.get(postcode),
+            run_date,
+            full_crawl_days,
+            max_interval_days,
+        )
+        for postcode in postcodes
+    ]
+    candidates.sort(key=lambda e: (-e.priority / e.expected_pages, e.postcode))
+
+    entries = []
+    deferred = []
+    pages_left = budget_pages
+    for candidate in candidates:
+        if candidate.priority <= 0 or candidate.expected_pages > pages_left:
+            deferred.append(candidate.postcode)
+            continue
+        entries.append(candidate)
+        pages_left -= candidate.expected_pages
+    return SchedulePlan(run_date, budget_pages, entries, deferred)
+
+
+def write_plan(plan: SchedulePlan, path: str) -> None:
+    """Write the plan as JSON, atomically so a crash never leaves half a plan"""
+    data = asdict(plan)
+    for entry in data["entries"]:
+        # JSON has no infinity, and mandatory entries are marked by their reason
+        if math.isinf(entry["priority"]):
+            entry["priority"] = None
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+    os.replace(temp_path, path)
+
+
+def read_plan(path: str) -> SchedulePlan:
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    entries = [
+        ScheduleEntry(
+            **{
+                **entry,
+                "priority": math.inf
+                if entry["priority"] is None
+                else entry["priority"],
+            }
+        )
+        for entry in data["entries"]
+    ]
+    return SchedulePlan(
+        data["run_date"], data["budget_pages"], entries, data["deferred"]
+    )
+
+
+def load_or_build_plan(
+    postcodes: List[str],
+    store: ListingStore,
+    run_date: str,
+    budget_pages: int = SCHEDULE_BUDGET_PAGES,
+    output_dir: str = OUTPUT_DIR,
+) -> SchedulePlan:
+    """Reuse the run's written plan when resuming, otherwise build and write one"""
+    path = schedule_filename(run_date, output_dir)
+    if os.path.exists(path):
+        return read_plan(path)
+    plan = build_plan(postcodes, load_history(store, run_date), run_date, budget_pages)
+    write_plan(plan, path)
+    return plan
+
+
+def budget_from_hours(
+    hours: float, seconds_per_page: float = SCHEDULE_SECONDS_PER_PAGE
+) -> int:
+    """Pure function converting a wall-clock budget into pages"""
+    return int(hours * 3600 / seconds_per_page)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plan which postcodes the next run should crawl"
+    )
+    parser.add_argument("--postcodes-file", default=POSTCODES_FILE)
+    parser.add_argument("--store", default=LISTING_STORE_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument(
+        "--run-date", default=datetime.now().strftime("%Y%m%d"), help="YYYYMMDD"
+    )
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--budget-pages", type=int, default=SCHEDULE_BUDGET_PAGES)
+    budget.add_argument("--budget-hours", type=float)
+    parser.add_argument(
+        "--seconds-per-page", type=float, default=SCHEDULE_SECONDS_PER_PAGE
+    )
+    parser.add_argument(
+        "--write", action="store_true", help="write the plan for main.py to follow"
+    )
+    args = parser.parse_args()
+
+    budget_pages = args.budget_pages
+    if args.budget_hours is not None:
+        budget_pages = budget_from_hours(args.budget_hours, args.seconds_per_page)
+
+    with ListingStore(args.store) as store:
+        history = load_history(store, args.run_date)
+    plan = build_plan(
+        load_postcodes(args.postcodes_file), history, args.run_date, budget_pages
+    )
+
+    print(f"{'postcode':<10}{'reason':<16}{'priority':>10}{'pages':>8}{'full':>6}")
+    for entry in plan.entries:
+        priority = "-" if math.isinf(entry.priority) else f"{entry.priority:.1f}"
+        print(
+            f"{entry.postcode:<10}{entry.reason:<16}{priority:>10}"
+            f"{entry.expected_pages:>8}{'yes' if entry.full_crawl else '':>6}"
+        )
+    print(
+        f"{len(plan.entries)} postcodes, {plan.expected_pages} of {budget_pages} pages,"
+        f" {len(plan.deferred)} deferred"
+    )
+    if args.write:
+        path = schedule_filename(args.run_date, args.output_dir)
+        write_plan(plan, path)
+        print(f"Wrote {path}")
@@ -1,50 +1,48 @@
 import logging
 import os
-import time
 import traceback
 from datetime import datetime
-from typing import Optional
+from typing import Callable, List, Optional
 
+import clock
 from browser_controller import (
     BrowserController,
     calculate_wait_time,
 )
 from constants import (
+    DEBUG_DUMP_SUFFIX,
     ITERATION_WAIT,
     OUTPUT_DIR,
+    PAGE_RETRY_LIMIT,
     SEARCH_URL_TEMPLATE,
 )
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+from incremental import IncrementalBaseline, count_known_pages
+from logging_setup import dump_recent_events
+from metrics import Phase, span
+from page_classifier import PageClass, classify_file
+from page_plan import read_result_summary
+from run_ledger import PageState, RunLedger
 
 
 def random_wait(base: float = 5, jitter: float = 5, max_wait: float = 30) -> None:
     """Random wait with exponential distribution"""
     wait_time = calculate_wait_time(base, jitter, max_wait)
     logging.info(f"Sleeping for {wait_time:.2f} seconds")
-    time.sleep(wait_time)
+    with span(Phase.WAIT):
+        clock.sleep(wait_time)
 
 
-def contains_residential_card(filename: str) -> bool:
-    """Pure function to check if file contains 'ResidentialCard'"""
-    with open(filename, "r", encoding="utf-8", errors="ignore") as file:
-        content = file.read()
-        return "ResidentialCard" in content
+def classify_page(filename: str) -> PageClass:
+    """Classify a saved page as listings, no results, an error or unknown"""
+    with span(Phase.CHECK_STOP):
+        page_class = classify_file(filename)
+    logging.info(f"classify_page: {filename} is {page_class.value}")
+    return page_class
 
 
 def check_stop(filename: str) -> bool:
-    """Check if the file exists and if it contains 'ResidentialCard'"""
-    logging.info(f"check_stop: {filename}")
-
-    if not os.path.exists(filename):
-        logging.error(f"check_stop: File does not exist: {filename}")
-        return True
-
-    if contains_residential_card(filename):
-        logging.info("check_stop: Continue")
-        return False
-
-    return True
+    """Check whether paging should stop at a page, which is anything but a listings page"""
+    return classify_page(filename) != PageClass.LISTINGS
 
 
 def generate_search_url(postcode: str, page_num: int) -> str:
@@ -53,75 +51,221 @@ def generate_search_url(postcode: str, page_num: int) -> str:
 
 
 def generate_filename(
-    postcode: str, page_num: int, timestamp: Optional[str] = None
+    postcode: str,
+    page_num: int,
+    timestamp: Optional[str] = None,
+    output_dir: str = OUTPUT_DIR,
 ) -> str:
     """Pure function to generate filename for scraped page"""
-    if timestamp is None:
-        date = datetime.now().strftime("%Y%m%d")
-        # time = datetime.now().strftime("%H%M%S")
-    return f"{OUTPUT_DIR}/{date}_{postcode}_{page_num}.html"
+    date = timestamp if timestamp is not None else datetime.now().strftime("%Y%m%d")
+    return f"{output_dir}/{date}_{postcode}_{page_num}.html"
 
 
-def generate_completed_filename(postcode: str, timestamp: Optional[str] = None) -> str:
+def generate_completed_filename(
+    postcode: str, timestamp: Optional[str] = None, output_dir: str = OUTPUT_DIR
+) -> str:
     """Pure function to generate completed filename for a postcode"""
-    if timestamp is None:
-        date = datetime.now().strftime("%Y%m%d")
-    return f"{OUTPUT_DIR}/{date}_{postcode}_completed.html"
+    date = timestamp if timestamp is not None else datetime.now().strftime("%Y%m%d")
+    return f"{output_dir}/{date}_{postcode}_completed.html"
 
 
-def is_postcode_completed(postcode: str) -> bool:
-    """Check if a postcode has already been completed"""
-    completed_filename = generate_completed_filename(postcode)
-    return os.path.exists(completed_filename)
+def generate_debug_dump_filename(
+    postcode: str, timestamp: str, output_dir: str = OUTPUT_DIR
+) -> str:
+    """Pure function to generate the filename recent debug events are dumped to"""
+    return f"{output_dir}/{timestamp}_{postcode}{DEBUG_DUMP_SUFFIX}"
 
 
 def scrape_single_page(
-    postcode: str, page_num: int, browser_controller: BrowserController
+    postcode: str,
+    page_num: int,
+    browser_controller: BrowserController,
+    run_date: Optional[str] = None,
+    output_dir: str = OUTPUT_DIR,
 ) -> str:
     """Scrape a single page and return the filename"""
     url = generate_search_url(postcode, page_num)
     browser_controller.navigate_to(url)
 
-    filename = generate_filename(postcode, page_num)
+    filename = generate_filename(postcode, page_num, run_date, output_dir)
     browser_controller.save_page(filename)
     browser_controller.perform_human_like_activity()
 
     return filename
 
 
-def handle_stopping_file(filename: str, postcode: str) -> None:
+def handle_stopping_file(
+    filename: str, postcode: str, ledger: RunLedger, page_num: int
+) -> None:
     """Handle a file that triggers the stopping condition"""
-    completed_filename = generate_completed_filename(postcode)
+    completed_filename = generate_completed_filename(
+        postcode, ledger.run_date, ledger.output_dir
+    )
     os.rename(filename, completed_filename)
+    ledger.mark_postcode_completed(postcode, pages=page_num - 1)
     logging.info(f"Renamed stopping file to: {completed_filename}")
 
 
-def scrape_all_pages(postcode: str, browser_controller: BrowserController) -> None:
-    """Scrape all pages for a postcode until stopping condition is met"""
+def queue_page_retry(
+    postcode: str,
+    page_num: int,
+    page_class: PageClass,
+    ledger: RunLedger,
+    started_at: Optional[float] = None,
+) -> None:
+    """Leave the postcode unfinished at a page that is not a genuine result page"""
+    ledger.record_page(postcode, page_num, PageState.FAILED, started_at)
+    if ledger.queue_retry(postcode, page_num, page_class.value):
+        logging.error(
+            f"queue_page_retry: {postcode} page {page_num} is {page_class.value}"
+            f" after {PAGE_RETRY_LIMIT} attempts, giving up on it for this run"
+        )
+        return
+    logging.warning(
+        f"queue_page_retry: {postcode} page {page_num} is {page_class.value},"
+        " queued for retry"
+    )
+
+
+def plan_postcode_pages(postcode: str, first_page: str, ledger: RunLedger) -> None:
+    """Record how many pages the postcode should have, from its first page"""
+    summary = read_result_summary(first_page)
+    if summary is None:
+        logging.warning(f"plan_postcode_pages: No result count found for {postcode}")
+        return
+    ledger.record_plan(postcode, summary.planned_pages, summary.total_results)
+    logging.info(
+        f"plan_postcode_pages: {postcode} has {summary.total_results} results"
+        f" over {summary.planned_pages} pages"
+    )
+
+
+def is_last_planned_page(postcode: str, page_num: int, ledger: RunLedger) -> bool:
+    planned_pages = ledger.planned_pages(postcode)
+    return planned_pages is not None and page_num >= planned_pages
+
+
+def complete_planned_postcode(postcode: str, page_num: int, ledger: RunLedger) -> None:
+    """Finish a postcode after its last planned page, without loading the empty page"""
+    completed_filename = generate_completed_filename(
+        postcode, ledger.run_date, ledger.output_dir
+    )
+    with open(completed_filename, "w", encoding="utf-8") as file:
+        file.write(f"<!-- completed after planned page {page_num} -->\n")
+    ledger.mark_postcode_completed(postcode, pages=page_num)
+    logging.info(f"Completed {postcode} after planned page {page_num}")
+
+
+def complete_incremental_postcode(
+    postcode: str, page_num: int, ledger: RunLedger
+) -> None:
+    """Finish a postcode once its pages only hold listings known from earlier crawls"""
+    completed_filename = generate_completed_filename(
+        postcode, ledger.run_date, ledger.output_dir
+    )
+    with open(completed_filename, "w", encoding="utf-8") as file:
+        file.write(f"<!-- stopped at known listings after page {page_num} -->\n")
+    ledger.mark_postcode_completed(postcode, pages=page_num, incremental=True)
+    logging.info(f"Completed {postcode} incrementally after page {page_num}")
+
+
+def scrape_all_pages(
+    postcode: str,
+    browser_controller: BrowserController,
+    ledger: RunLedger,
+    baseline: Optional[IncrementalBaseline] = None,
+) -> None:
+    """Scrape all pages for a postcode until stopping condition is met.
+
+    The result count on page 1 plans the number of pages, so the postcode
+    finishes after its last listing page. A genuine no-results page still
+    ends it early if a planned page turns out to be empty, and is the only
+    stop condition when page 1 has no result count. With a baseline, the
+    postcode also finishes once its pages hold only listings the baseline
+    already knows. An error, partly saved or unrecognised page leaves the
+    postcode unfinished, with the page queued for retry_queued_pages.
+    """
+    # Made here rather than on import, so importing this module has no side effects
+    os.makedirs(ledger.output_dir, exist_ok=True)
+    last_saved_page = ledger.last_saved_page(postcode)
+    known_pages = 0
     page_num = 1
     while True:
-        filename = generate_filename(postcode, page_num)
+        filename = generate_filename(
+            postcode, page_num, ledger.run_date, ledger.output_dir
+        )
 
-        # Skip scraping if file already exists
-        if os.path.exists(filename):
-            logging.info(f"File already exists, skipping: {filename}")
-            if check_stop(filename):
-                handle_stopping_file(filename, postcode)
+        # Skip pages this run already saved. Only the last one is re-checked, in
+        # case the previous attempt was interrupted between saving and checking it
+        if ledger.page_state(postcode, page_num) == PageState.SAVED:
+            logging.info(f"Page already saved, skipping: {filename}")
+            if page_num == last_saved_page:
+                page_class = classify_page(filename)
+                if page_class == PageClass.NO_RESULTS:
+                    handle_stopping_file(filename, postcode, ledger, page_num)
+                    break
+                if page_class != PageClass.LISTINGS:
+                    queue_page_retry(postcode, page_num, page_class, ledger)
+                    break
+            if page_num == 1 and ledger.planned_pages(postcode) is None:
+                plan_postcode_pages(postcode, filename, ledger)
+            if page_num == last_saved_page and is_last_planned_page(
+                postcode, page_num, ledger
+            ):
+                complete_planned_postcode(postcode, page_num, ledger)
+                break
+            known_pages = count_known_pages(filename, baseline, known_pages)
+            if (
+                page_num == last_saved_page
+                and baseline
+                and baseline.is_exhausted(known_pages)
+            ):
+                complete_incremental_postcode(postcode, page_num, ledger)
                 break
             page_num += 1
             continue
 
-        filename = scrape_single_page(postcode, page_num, browser_controller)
-
-        if check_stop(filename):
-            handle_stopping_file(filename, postcode)
+        started_at = clock.now()
+        with span(Phase.PAGE, postcode, page_num):
+            try:
+                filename = scrape_single_page(
+                    postcode,
+                    page_num,
+                    browser_controller,
+                    ledger.run_date,
+                    ledger.output_dir,
+                )
+            except Exception:
+                ledger.record_page(postcode, page_num, PageState.FAILED, started_at)
+                raise
+            page_class = classify_page(filename)
+
+        if page_class == PageClass.NO_RESULTS:
+            ledger.record_page(postcode, page_num, PageState.STOPPED, started_at)
+            handle_stopping_file(filename, postcode, ledger, page_num)
+            break
+        if page_class != PageClass.LISTINGS:
+            queue_page_retry(postcode, page_num, page_class, ledger, started_at)
             break
 
+        ledger.record_page(postcode, page_num, PageState.SAVED, started_at)
+        if page_num == 1:
+            plan_postcode_pages(postcode, filename, ledger)
+        if is_last_planned_page(postcode, page_num, ledger):
+            complete_planned_postcode(postcode, page_num, ledger)
+            break
+        known_pages = count_known_pages(filename, baseline, known_pages)
+        if baseline and baseline.is_exhausted(known_pages):
+            complete_incremental_postcode(postcode, page_num, ledger)
+            break
         page_num += 1
 
 
 def scrape_realestate_postcode(
-    postcode: str, browser_controller: BrowserController
+    postcode: str,
+    browser_controller: BrowserController,
+    ledger: RunLedger,
+    baseline: Optional[IncrementalBaseline] = None,
 ) -> None:
     """Scrape realestate.com.au for a specific postcode using a browser controller"""
     if not postcode or not postcode.strip():
@@ -129,14 +273,50 @@ def scrape_realestate_postcode(
 
     logging.info(f"scrape_realestate_postcode: {postcode}")
     try:
-        scrape_all_pages(postcode, browser_controller)
+        with span(Phase.POSTCODE, postcode):
+            scrape_all_pages(postcode, browser_controller, ledger, baseline)
 
     except Exception as e:
         logging.error(
             f"Unexpected error scraping postcode {postcode}: {e}\n{traceback.format_exc()}"
         )
+        dump_recent_events(
+            generate_debug_dump_filename(postcode, ledger.run_date, ledger.output_dir)
+        )
         raise
 
     finally:
         logging.info(f"Finished scraping postcode {postcode}")
-        time.sleep(ITERATION_WAIT)
+        with span(Phase.WAIT, postcode):
+            clock.sleep(ITERATION_WAIT)
+
+
+def retry_queued_pages(
+    browser_controller: BrowserController,
+    ledger: RunLedger,
+    baseline_for: Optional[Callable[[str], Optional[IncrementalBaseline]]] = None,
+) -> List[str]:
+    """Scrape the postcodes of queued pages again, returning those it completed.
+
+    Pages saved earlier in the run are skipped, so each postcode resumes at
+    its queued page. A postcode that fails again is left for the next run.
+    """
+    completed = []
+    for postcode in ledger.retry_postcodes():
+        logging.info(f"retry_queued_pages: Retrying {postcode}")
+        try:
+            browser_controller.open_browser()
+            scrape_realestate_postcode(
+                postcode,
+                browser_controller,
+                ledger,
+                baseline_for(postcode) if baseline_for else None,
+            )
+        except Exception as e:
+            logging.error(
+                f"retry_queued_pages: Retrying {postcode} failed, it stays queued: {e}"
+            )
+            continue
+        if ledger.is_postcode_completed(postcode):
+            completed.append(postcode)
+    return completed
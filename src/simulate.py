@@ -0,0 +1,126 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List
+
+import scrape
+from browser_controller import InstrumentedBrowserController
+from browser_session import BrowserSession
+from clock import SystemClock, VirtualClock, install_clock
+from constants import METRICS_SUFFIX, OUTPUT_DIR, POSTCODES_FILE, SESSION_MAX_PAGES
+from metrics import (
+    MetricsRecorder,
+    RunReport,
+    install_recorder,
+    load_spans,
+    summarise_spans,
+)
+from postcodes import load_postcodes
+from replay_controller import (
+    PhaseTimings,
+    ReplayBrowserController,
+    timings_from_metrics,
+)
+from report import format_duration
+from run_ledger import RunLedger, latest_run_date
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """Simulated duration of a run and the report of its phase timings"""
+
+    simulated_seconds: float
+    report: RunReport
+
+
+def simulate_run(
+    postcodes: List[str],
+    controller: ReplayBrowserController,
+    output_dir: str,
+    max_pages: int = SESSION_MAX_PAGES,
+) -> SimulationResult:
+    """Run the scrape loop over postcodes on a virtual clock, saving into output_dir"""
+    virtual_clock = VirtualClock()
+    install_clock(virtual_clock)
+    run_date = datetime.fromtimestamp(virtual_clock.start).strftime("%Y%m%d")
+    metrics_file = os.path.join(output_dir, f"{run_date}{METRICS_SUFFIX}")
+    recorder = MetricsRecorder(metrics_file)
+    install_recorder(recorder)
+    ledger = RunLedger(run_date, output_dir)
+    session = BrowserSession(InstrumentedBrowserController(controller), max_pages)
+    try:
+        for postcode in ledger.remaining_postcodes(postcodes):
+            session.open_browser()
+            scrape.scrape_realestate_postcode(postcode, session, ledger)
+        session.close_browser()
+        ledger.mark_finished()
+    finally:
+        install_recorder(None)
+        recorder.close()
+        install_clock(SystemClock())
+    return SimulationResult(
+        virtual_clock.elapsed, summarise_spans(load_spans(metrics_file))
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate a whole scrape run in seconds on a virtual clock"
+    )
+    parser.add_argument("--postcodes-file", default=POSTCODES_FILE)
+    parser.add_argument(
+        "--recorded-dir",
+        default=OUTPUT_DIR,
+        help="saved pages to replay; other postcodes get generated pages",
+    )
+    parser.add_argument(
+        "--recorded-date", help="run date to replay (default: latest run)"
+    )
+    parser.add_argument(
+        "--timings-from",
+        metavar="METRICS_FILE",
+        help="take per-phase timings from a recorded run's metrics",
+    )
+    parser.add_argument("--restart-every", type=int, default=SESSION_MAX_PAGES)
+    parser.add_argument("--output-dir", help="default: a new temporary directory")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="simulated_run_")
+    if os.path.abspath(output_dir) == os.path.abspath(args.recorded_dir):
+        sys.exit("--output-dir must differ from --recorded-dir")
+    os.makedirs(output_dir, exist_ok=True)
+
+    recorded_date = args.recorded_date
+    if recorded_date is None and os.path.isdir(args.recorded_dir):
+        recorded_date = latest_run_date(args.recorded_dir)
+    timings = (
+        timings_from_metrics(args.timings_from) if args.timings_from else PhaseTimings()
+    )
+    controller = ReplayBrowserController(args.recorded_dir, recorded_date, timings)
+    postcodes = load_postcodes(args.postcodes_file)
+
+    real_start = time.perf_counter()
+    result = simulate_run(postcodes, controller, output_dir, args.restart_every)
+    real_seconds = time.perf_counter() - real_start
+
+    report = result.report
+    print(f"Postcodes        {len(postcodes)}")
+    print(f"Pages            {report.pages}")
+    print(f"Simulated time   {format_duration(result.simulated_seconds)}")
+    print(f"Pages per hour   {report.pages_per_hour:.1f}")
+    print(f"Waiting          {format_duration(report.wait_seconds)}")
+    print(f"Working          {format_duration(report.work_seconds)}")
+    print(f"Real time        {real_seconds:.1f}s")
+    print(f"Output           {output_dir}")
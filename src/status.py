@@ -0,0 +1,49 @@
+import argparse
+import os
+
+from constants import OUTPUT_DIR, PAGE_RETRY_LIMIT, POSTCODES_FILE
+from postcodes import load_postcodes
+from run_ledger import RunLedger, latest_run_date
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show progress of the latest scrape run without touching it"
+    )
+    parser.add_argument("--postcodes-file", default=POSTCODES_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument(
+        "--remaining", action="store_true", help="List postcodes still to scrape"
+    )
+    args = parser.parse_args()
+
+    postcodes = load_postcodes(args.postcodes_file)
+    run_date = None
+    if os.path.isdir(args.output_dir):
+        run_date = latest_run_date(args.output_dir)
+
+    if run_date is None:
+        print(f"No runs recorded in {args.output_dir}")
+        counts = {"pending": len(postcodes)}
+        plan_counts = {}
+        remaining = postcodes
+        given_up = []
+    else:
+        ledger = RunLedger(run_date, args.output_dir)
+        counts = ledger.state_counts(postcodes)
+        plan_counts = ledger.plan_accuracy(postcodes)
+        remaining = ledger.remaining_postcodes(postcodes)
+        given_up = ledger.given_up_postcodes(postcodes)
+        print(f"Run {run_date}{' (finished)' if ledger.finished else ''}")
+
+    for name, count in counts.items():
+        print(f"  {name:<12}{count:>6}")
+    if plan_counts:
+        print("Page plans")
+        for name, count in plan_counts.items():
+            print(f"  {name:<12}{count:>6}")
+
+    if given_up:
+        print(f"Given up after {PAGE_RETRY_LIMIT} bad fetches: {' '.join(given_up)}")
+
+    if args.remaining:
+        print("\n".join(remaining))
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import random
+import re
+from typing import Dict, List, Optional, Tuple
+
+from browser_controller import BrowserController
+from constants import STOP_MARKER
+
+SEARCH_URL_PATTERN = re.compile(r"/in-(\d+)/list-(\d+)")
+SYNTHETIC_PAGE_SIZE = 25
+STREETS = ["King St", "Enmore Rd", "Missenden Rd", "Wilson St", "Australia St"]
+STATUSES = ["", "", "", "New", "Under contract"]
+
+CARD_TEMPLATE = """
+<article class="results-card residential-card" data-testid="{marker}">
+  <a href="/property-unit-nsw-sydney-{listing_id}" class="details-link"></a>
+  <h2 class="residential-card__address-heading">
+    <a href="/property-unit-nsw-sydney-{listing_id}"><span>{address}</span></a>
+  </h2>
+  <div class="residential-card__price"><span class="property-price ">{price}</span></div>
+  <ul class="residential-card__primary">
+    <li aria-label="{bedrooms} bedrooms"><p>{bedrooms}</p></li>
+    <li aria-label="{bathrooms} bathrooms"><p>{bathrooms}</p></li>
+    <li aria-label="{parking} car space"><p>{parking}</p></li>
+  </ul>
+  <span class="residential-card__property-type">Unit</span>
+  <span class="residential-card__status-label">{status}</span>
+  <span>Added {days_ago} days ago</span>
+</article>
+"""
+
+
+def padding_lines(size: int) -> List[str]:
+    """Pure function returning about size bytes of script tags like a page's bundles"""
+    lines = []
+    total = 0
+    while total < size:
+        digest = hashlib.sha1(str(len(lines)).encode()).hexdigest()
+        lines.append(f'<script src="/assets/{digest}.js" async></script>\n')
+        total += len(lines[-1])
+    return lines
+
+
+def listings_on_page(total_results: int, page_num: int, page_size: int) -> int:
+    """Pure function giving how many listings a search result page shows"""
+    return max(0, min(page_size, total_results - (page_num - 1) * page_size))
+
+
+def render_search_page(
+    postcode: str,
+    page_num: int,
+    total_results: int,
+    page_size: int = SYNTHETIC_PAGE_SIZE,
+    padding_bytes: int = 0,
+    seed: int = 0,
+) -> str:
+    """Render a search page shaped like a saved realestate.com.au result page.
+
+    Pages past the last result carry no listing cards, and page 1 shows the
+    "1-25 of N results" summary, as on the real site.
+    """
+    rng = random.Random(f"{seed}-{postcode}-{page_num}")
+    num_listings = listings_on_page(total_results, page_num, page_size)
+    padding = padding_lines(padding_bytes)
+    head = "".join(padding[: len(padding) // 2])
+    tail = "".join(padding[len(padding) // 2 :])
+
+    parts = [f"<!DOCTYPE html>\n<html><head>{head}</head><body>"]
+    if num_listings and page_num == 1:
+        parts.append(f"<h1>1-{num_listings} of {total_results} results</h1>")
+    if not num_listings:
+        parts.append("<p>No exact matches found</p>")
+    for position in range(num_listings):
+        listing_number = (page_num - 1) * page_size + position + 1
+        price = rng.randrange(400, 3000) * 1000
+        parts.append(
+            CARD_TEMPLATE.format(
+                marker=STOP_MARKER,
+                listing_id=f"{postcode}{listing_number:05d}",
+                address=f"{listing_number} {rng.choice(STREETS)}, {postcode}",
+                price=f"${price:,}" if rng.random() < 0.7 else "Contact agent",
+                bedrooms=rng.randint(1, 4),
+                bathrooms=rng.randint(1, 3),
+                parking=rng.randint(0, 2),
+                status=rng.choice(STATUSES),
+                days_ago=rng.randint(2, 60),
+            )
+        )
+    parts.append(f"{tail}</body></html>\n")
+    return "".join(parts)
+
+
+def write_corpus(
+    directory: str,
+    scrape_date: str,
+    total_results: Dict[str, int],
+    page_size: int = SYNTHETIC_PAGE_SIZE,
+    padding_bytes: int = 0,
+    include_empty_page: bool = False,
+    seed: int = 0,
+) -> List[str]:
+    """Write every listing page of each postcode as a saved run would, return paths"""
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for postcode, total in total_results.items():
+        num_pages = -(-total // page_size)
+        if include_empty_page:
+            num_pages += 1
+        for page_num in range(1, num_pages + 1):
+            filename = os.path.join(
+                directory, f"{scrape_date}_{postcode}_{page_num}.html"
+            )
+            page = render_search_page(
+                postcode, page_num, total, page_size, padding_bytes, seed
+            )
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(page)
+            filenames.append(filename)
+    return filenames
+
+
+class SyntheticBrowserController(BrowserController):
+    """Controller that serves generated search pages without a browser or display.
+
+    Pages are rendered once per (postcode, page) and kept in memory, so
+    repeated runs measure the scrape loop rather than page generation.
+    """
+
+    def __init__(
+        self,
+        total_results: Optional[Dict[str, int]] = None,
+        default_results: int = 60,
+        page_size: int = SYNTHETIC_PAGE_SIZE,
+        padding_bytes: int = 0,
+    ):
+        self.total_results = total_results or {}
+        self.default_results = default_results
+        self.page_size = page_size
+        self.padding_bytes = padding_bytes
+        self.current: Optional[Tuple[str, int]] = None
+        self.navigations = 0
+        self._pages: Dict[Tuple[str, int], str] = {}
+
+    def open_browser(self) -> None:
+        pass
+
+    def perform_initial_setup(self) -> None:
+        pass
+
+    def close_browser(self) -> None:
+        pass
+
+    def navigate_to(self, url: str) -> None:
+        match = SEARCH_URL_PATTERN.search(url)
+        if match is None:
+            raise ValueError(f"Not a search URL: {url}")
+        self.current = (match.group(1), int(match.group(2)))
+        self.navigations += 1
+
+    def save_page(self, filepath: str) -> None:
+        if self.current is None:
+            raise RuntimeError("save_page called before navigate_to")
+        if self.current not in self._pages:
+            postcode, page_num = self.current
+            self._pages[self.current] = render_search_page(
+                postcode,
+                page_num,
+                self.total_results.get(postcode, self.default_results),
+                self.page_size,
+                self.padding_bytes,
+            )
+        with open(filepath, "w", encoding="utf-8") as file:
+            file.write(self._pages[self.current])
+
+    def perform_human_like_activity(self) -> None:
+        pass
@@ -0,0 +1,372 @@
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+import clock
+from constants import (
+    WORK_QUEUE_BUSY_TIMEOUT,
+    WORK_QUEUE_LEASE_SECONDS,
+    WORK_QUEUE_MAX_ATTEMPTS,
+    WORK_QUEUE_POLL_INTERVAL,
+)
+from run_ledger import is_stale_run
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_date TEXT PRIMARY KEY,
+    finished INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS postcode_leases (
+    run_date TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed_by TEXT,
+    PRIMARY KEY (run_date, postcode)
+);
+
+CREATE INDEX IF NOT EXISTS idx_postcode_leases_claim
+    ON postcode_leases (run_date, state, position);
+"""
+
+
+def default_owner() -> str:
+    """Name identifying this process to other hosts sharing the queue"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Postcodes of each run handed out to hosts under time-limited leases.
+
+    The queue is a SQLite file on a volume every host mounts. Claims take
+    a write lock for the whole read-then-update, so two hosts never lease
+    the same postcode. A host that crashes stops renewing its lease, and
+    the postcode is handed to the next host that asks once the lease runs
+    out. The rollback journal is used rather than WAL, which needs shared
+    memory that network filesystems do not provide.
+    """
+
+    def __init__(self, path: str, owner: Optional[str] = None):
+        self.path = path
+        self.owner = owner or default_owner()
+        self.connection = sqlite3.connect(
+            path,
+            timeout=WORK_QUEUE_BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        # The lease renewal thread shares the connection
+        self._lock = threading.Lock()
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def open_run(self, postcodes: List[str], today: Optional[str] = None) -> str:
+        """Date of the run every host should work on, starting today's if none is open.
+
+        Mirrors RunLedger.resume_or_start: the latest unfinished run is
+        resumed unless it is stale, and a finished run is only replaced by
+        a new day's run.
+        """
+        today = today or datetime.now().strftime("%Y%m%d")
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT run_date, finished FROM runs ORDER BY run_date DESC LIMIT 1"
+            ).fetchone()
+            if row is not None and not row[1] and is_stale_run(row[0], today):
+                logging.warning(f"open_run: Abandoning stale run {row[0]}")
+                connection.execute(
+                    "UPDATE runs SET finished = 1 WHERE run_date = ?", (row[0],)
+                )
+            elif row is not None and (not row[1] or row[0] == today):
+                return row[0]
+            connection.execute("INSERT INTO runs (run_date) VALUES (?)", (today,))
+            connection.executemany(
+                "INSERT INTO postcode_leases (run_date, postcode, position)"
+                " VALUES (?, ?, ?)",
+                (
+                    (today, postcode, position)
+                    for position, postcode in enumerate(postcodes)
+                ),
+            )
+        logging.info(f"open_run: Queued {len(postcodes)} postcodes for run {today}")
+        return today
+
+    def claim(
+        self,
+        run_date: str,
+        lease_seconds: float = WORK_QUEUE_LEASE_SECONDS,
+        max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS,
+    ) -> Optional[str]:
+        """Lease the next pending or abandoned postcode, None when there is none.
+
+        An abandoned lease that already had max_attempts is given up rather
+        than handed out again, so a postcode that crashes hosts cannot keep
+        the run open.
+        """
+        now = clock.now()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE postcode_leases SET state = 'given_up', lease_expires = NULL"
+                " WHERE run_date = ? AND state = 'leased' AND lease_expires < ?"
+                " AND attempts >= ?",
+                (run_date, now, max_attempts),
+            )
+            if cursor.rowcount:
+                self._finish_if_done(run_date)
+            row = connection.execute(
+                "SELECT postcode FROM postcode_leases WHERE run_date = ?"
+                " AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))"
+                " ORDER BY position LIMIT 1",
+                (run_date, now),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE postcode_leases SET state = 'leased', owner = ?,"
+                " lease_expires = ?, attempts = attempts + 1"
+                " WHERE run_date = ? AND postcode = ?",
+                (self.owner, now + lease_seconds, run_date, row[0]),
+            )
+        return row[0]
+
+    def renew(
+        self,
+        run_date: str,
+        postcode: str,
+        lease_seconds: float = WORK_QUEUE_LEASE_SECONDS,
+    ) -> bool:
+        """Extend this host's lease, False if it has already passed to another host"""
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE postcode_leases SET lease_expires = ?"
+                " WHERE run_date = ? AND postcode = ? AND state = 'leased' AND owner = ?",
+                (clock.now() + lease_seconds, run_date, postcode, self.owner),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, run_date: str, postcode: str) -> bool:
+        """Report postcode done, unless another host has since taken over its lease.
+
+        A lease that expired but was not yet reclaimed still counts, since no
+        other host has started on the postcode.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE postcode_leases SET state = 'done', completed_by = ?,"
+                " lease_expires = NULL"
+                " WHERE run_date = ? AND postcode = ? AND state = 'leased' AND owner = ?",
+                (self.owner, run_date, postcode, self.owner),
+            )
+            if cursor.rowcount == 1:
+                self._finish_if_done(run_date)
+        return cursor.rowcount == 1
+
+    def release(
+        self,
+        run_date: str,
+        postcode: str,
+        max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS,
+    ) -> None:
+        """Give a leased postcode back at once, so another host can retry it.
+
+        Claims hand out the lowest pending position first, so a postcode that
+        fails every time would come straight back; once it has been leased
+        max_attempts times it is given up for the run instead.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE postcode_leases SET owner = NULL, lease_expires = NULL,"
+                " state = CASE WHEN attempts >= ? THEN 'given_up' ELSE 'pending' END"
+                " WHERE run_date = ? AND postcode = ? AND state = 'leased' AND owner = ?",
+                (max_attempts, run_date, postcode, self.owner),
+            )
+            if cursor.rowcount == 1 and self._state(run_date, postcode) == "given_up":
+                logging.error(
+                    f"release: Giving up on {postcode} after {max_attempts} attempts"
+                )
+                self._finish_if_done(run_date)
+
+    def _state(self, run_date: str, postcode: str) -> str:
+        return self.connection.execute(
+            "SELECT state FROM postcode_leases WHERE run_date = ? AND postcode = ?",
+            (run_date, postcode),
+        ).fetchone()[0]
+
+    def _unfinished(self, run_date: str) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM postcode_leases WHERE run_date = ?"
+            " AND state NOT IN ('done', 'given_up')",
+            (run_date,),
+        ).fetchone()[0]
+
+    def _finish_if_done(self, run_date: str) -> None:
+        """Mark the run finished once no postcode is left to work on"""
+        if not self._unfinished(run_date):
+            self.connection.execute(
+                "UPDATE runs SET finished = 1 WHERE run_date = ?", (run_date,)
+            )
+
+    def iter_claims(
+        self,
+        run_date: str,
+        lease_seconds: float = WORK_QUEUE_LEASE_SECONDS,
+        poll_interval: float = WORK_QUEUE_POLL_INTERVAL,
+    ) -> Iterator[str]:
+        """Lease postcodes one after another until every postcode of the run is done.
+
+        Once only other hosts' leases are left this keeps polling, so the
+        postcode of a host that crashes is taken over when its lease runs out.
+        """
+        while True:
+            postcode = self.claim(run_date, lease_seconds)
+            if postcode is not None:
+                yield postcode
+                continue
+            with self._lock:
+                if not self._unfinished(run_date):
+                    return
+            clock.sleep(poll_interval)
+
+    def state_counts(self, run_date: str) -> Dict[str, int]:
+        """Postcodes of the run by state, counting expired leases as abandoned"""
+        counts = {
+            "pending": 0,
+            "leased": 0,
+            "abandoned": 0,
+            "done": 0,
+            "given_up": 0,
+        }
+        rows = self.connection.execute(
+            "SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'abandoned'"
+            " ELSE state END, COUNT(*) FROM postcode_leases"
+            " WHERE run_date = ? GROUP BY 1",
+            (clock.now(), run_date),
+        )
+        counts.update(dict(rows))
+        return counts
+
+    def latest_run_date(self) -> Optional[str]:
+        return self.connection.execute("SELECT MAX(run_date) FROM runs").fetchone()[0]
+
+
+class LeaseKeeper:
+    """Renews a postcode's lease from a background thread while it is scraped"""
+
+    def __init__(
+        self,
+        work_queue: WorkQueue,
+        run_date: str,
+        postcode: str,
+        lease_seconds: float = WORK_QUEUE_LEASE_SECONDS,
+    ):
+        self.work_queue = work_queue
+        self.run_date = run_date
+        self.postcode = postcode
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._renew_until_stopped, daemon=True)
+
+    def _renew_until_stopped(self) -> None:
+        # Renewing three times per lease survives one slow or failed renewal
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.work_queue.renew(
+                    self.run_date, self.postcode, self.lease_seconds
+                )
+            except sqlite3.Error as e:
+                logging.warning(f"LeaseKeeper: Renewing {self.postcode} failed: {e}")
+                continue
+            if not renewed:
+                self.lost = True
+                logging.error(f"LeaseKeeper: Lost the lease on {self.postcode}")
+                return
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+
+@contextmanager
+def hold_lease(
+    work_queue: Optional[WorkQueue],
+    run_date: str,
+    postcode: str,
+    lease_seconds: float = WORK_QUEUE_LEASE_SECONDS,
+    done: Optional[Callable[[], bool]] = None,
+) -> Iterator[None]:
+    """Keep postcode leased while the block runs, then report it done.
+
+    done says whether the postcode needs no more work once the block has
+    run, so one stopped at a bad page is given back rather than marked done.
+    A block that raises also gives the postcode back for another host to
+    retry, until the queue gives up on it after WORK_QUEUE_MAX_ATTEMPTS
+    leases. Without a queue the block just runs, so callers need no second
+    code path.
+    """
+    if work_queue is None:
+        yield
+        return
+    with LeaseKeeper(work_queue, run_date, postcode, lease_seconds) as keeper:
+        try:
+            yield
+        except BaseException:
+            work_queue.release(run_date, postcode)
+            raise
+    if done is not None and not done():
+        if not keeper.lost:
+            work_queue.release(run_date, postcode)
+        logging.info(f"hold_lease: {postcode} is unfinished, giving it back")
+        return
+    if keeper.lost or not work_queue.complete(run_date, postcode):
+        logging.warning(f"hold_lease: {postcode} was taken over by another host")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show the shared work queue's progress for its latest run"
+    )
+    parser.add_argument("queue", help="path of the work queue database")
+    args = parser.parse_args()
+
+    with WorkQueue(args.queue) as work_queue:
+        run_date = work_queue.latest_run_date()
+        if run_date is None:
+            print(f"No runs queued in {args.queue}")
+        else:
+            print(f"Run {run_date}")
+            for name, count in work_queue.state_counts(run_date).items():
+                print(f"  {name:<12}{count:>6}")
@@ -0,0 +1,270 @@
+import logging
+import multiprocessing
+import os
+import queue
+import subprocess
+import traceback
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional
+
+import clock
+from constants import (
+    BASE_URL,
+    DEVTOOLS_PORT,
+    METRICS_SUFFIX,
+    OUTPUT_DIR,
+    PROFILE_TEMPLATE_DIR,
+    SESSION_MAX_PAGES,
+    USER_DATA_DIR,
+    WORKER_DISPLAY_BASE,
+    WORKER_POLL_INTERVAL,
+    WORKER_REQUESTS_PER_MINUTE,
+    XVFB_COMMAND,
+    XVFB_SCREEN,
+    XVFB_STARTUP_TIMEOUT,
+)
+from incremental import IncrementalBaseline
+from rate_limit import TokenBucket
+
+# Messages workers send back to the coordinator
+CLAIMED = "claimed"
+FINISHED = "finished"
+
+
+class XvfbDisplay:
+    """A private virtual X display for one worker, running for the context's lifetime"""
+
+    def __init__(self, number: int, screen: str = XVFB_SCREEN):
+        self.number = number
+        self.name = f":{number}"
+        self.screen = screen
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "XvfbDisplay":
+        self.process = subprocess.Popen(
+            [XVFB_COMMAND, self.name, "-screen", "0", self.screen, "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        socket_path = f"/tmp/.X11-unix/X{self.number}"
+        deadline = clock.monotonic() + XVFB_STARTUP_TIMEOUT
+        while not os.path.exists(socket_path):
+            if self.process.poll() is not None or clock.monotonic() > deadline:
+                self.__exit__(None, None, None)
+                raise RuntimeError(f"Xvfb did not start on display {self.name}")
+            clock.sleep(0.1)
+        logging.info(f"XvfbDisplay: Started display {self.name}")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def worker_controller(name: str, worker_id: int):
+    """Controller of the given kind with its own profile, template and debugging port"""
+    user_data_dir = f"{USER_DATA_DIR}_{worker_id}"
+    template_dir = f"{PROFILE_TEMPLATE_DIR}_{worker_id}"
+    if name == "devtools":
+        from devtools_controller import DevToolsBrowserController
+
+        return DevToolsBrowserController(
+            BASE_URL,
+            port=DEVTOOLS_PORT + worker_id,
+            user_data_dir=user_data_dir,
+            template_dir=template_dir,
+        )
+    from brave_controller import BraveBrowserController
+
+    return BraveBrowserController(BASE_URL, user_data_dir, template_dir)
+
+
+def run_worker(
+    worker_id: int,
+    display: Optional[str],
+    controller_factory: Callable[[int], object],
+    run_date: str,
+    output_dir: str,
+    bucket: TokenBucket,
+    tasks,
+    results,
+    max_pages: int = SESSION_MAX_PAGES,
+    slim_mode: Optional[str] = None,
+    log_mode: str = "sync",
+) -> None:
+    """Scrape postcodes from the task queue until it hands out None"""
+    if display is not None:
+        os.environ["DISPLAY"] = display
+    # pyautogui binds to $DISPLAY when first imported, so the scrape modules
+    # are only imported once this worker's display is set
+    import scrape
+    from browser_controller import (
+        InstrumentedBrowserController,
+        RateLimitedBrowserController,
+        SlimmingBrowserController,
+    )
+    from browser_session import BrowserSession
+    from logging_setup import setup_logging
+    from metrics import MetricsRecorder, install_recorder
+    from run_ledger import RunLedger
+
+    setup_logging(log_mode, worker_id, logging.INFO)
+    ledger = RunLedger(run_date, output_dir)
+    recorder = MetricsRecorder(os.path.join(output_dir, f"{run_date}{METRICS_SUFFIX}"))
+    install_recorder(recorder)
+    controller = InstrumentedBrowserController(
+        RateLimitedBrowserController(controller_factory(worker_id), bucket)
+    )
+    if slim_mode:
+        controller = SlimmingBrowserController(controller, slim_mode)
+    session = BrowserSession(controller, max_pages)
+    try:
+        while (task := tasks.get()) is not None:
+            postcode, baseline = task
+            results.put((CLAIMED, worker_id, postcode, None, False, False))
+            error = None
+            try:
+                session.open_browser()
+                scrape.scrape_realestate_postcode(postcode, session, ledger, baseline)
+            except Exception as e:
+                # The session already discarded the browser; the postcode stays
+                # incomplete in the ledger and is retried when the run resumes
+                error = f"{type(e).__name__}: {e}"
+                logging.error(
+                    f"run_worker: {postcode} failed\n{traceback.format_exc()}"
+                )
+            results.put(
+                (
+                    FINISHED,
+                    worker_id,
+                    postcode,
+                    error,
+                    ledger.is_postcode_completed(postcode),
+                    ledger.is_incremental(postcode),
+                )
+            )
+    finally:
+        session.close_browser()
+        install_recorder(None)
+        recorder.close()
+
+
+def run_pool(
+    postcodes: List[str],
+    run_date: str,
+    controller_factory: Callable[[int], object],
+    num_workers: int,
+    on_finished: Callable[[str, Optional[str], bool, bool], None],
+    baseline_for: Optional[Callable[[str], Optional[IncrementalBaseline]]] = None,
+    requests_per_minute: float = WORKER_REQUESTS_PER_MINUTE,
+    output_dir: str = OUTPUT_DIR,
+    max_pages: int = SESSION_MAX_PAGES,
+    use_xvfb: bool = True,
+    slim_mode: Optional[str] = None,
+    log_mode: str = "sync",
+) -> None:
+    """Scrape postcodes across worker processes that share one request budget.
+
+    The coordinator keeps one postcode queued per worker, so baselines are
+    only loaded as postcodes are handed out. on_finished gets each postcode
+    with its error, if any, whether the ledger shows it completed, since a
+    postcode stopped at a bad page ends without an error, and whether it
+    was completed incrementally. It runs in this process, which keeps
+    listing store writes in one place. A worker that dies loses only its
+    current postcode, which the ledger still shows as incomplete. With a
+    slim_mode, workers slim each page as soon as it is saved.
+    """
+    context = multiprocessing.get_context("spawn")
+    bucket = TokenBucket(requests_per_minute, context=context)
+    tasks = context.Queue()
+    results = context.Queue()
+    pending = iter(postcodes)
+
+    def dispatch() -> bool:
+        postcode = next(pending, None)
+        if postcode is None:
+            return False
+        tasks.put((postcode, baseline_for(postcode) if baseline_for else None))
+        return True
+
+    with ExitStack() as stack:
+        displays = [
+            stack.enter_context(XvfbDisplay(WORKER_DISPLAY_BASE + worker_id)).name
+            if use_xvfb
+            else None
+            for worker_id in range(num_workers)
+        ]
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(
+                    worker_id,
+                    displays[worker_id],
+                    controller_factory,
+                    run_date,
+                    output_dir,
+                    bucket,
+                    tasks,
+                    results,
+                    max_pages,
+                    slim_mode,
+                    log_mode,
+                ),
+            )
+            for worker_id in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        claimed: Dict[int, str] = {}
+        in_flight = sum(dispatch() for _ in workers)
+        try:
+            while in_flight:
+                try:
+                    kind, worker_id, postcode, error, completed, incremental = (
+                        results.get(timeout=WORKER_POLL_INTERVAL)
+                    )
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers):
+                        raise RuntimeError(
+                            "run_pool: Every worker has exited"
+                        ) from None
+                    for _ in range(_reap_dead_workers(workers, claimed, on_finished)):
+                        in_flight += dispatch() - 1
+                    continue
+                if kind == CLAIMED:
+                    claimed[worker_id] = postcode
+                    continue
+                claimed.pop(worker_id, None)
+                on_finished(postcode, error, completed, incremental)
+                in_flight -= 1
+                in_flight += dispatch()
+
+            for _ in workers:
+                tasks.put(None)
+            for worker in workers:
+                worker.join()
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+
+def _reap_dead_workers(workers, claimed: Dict[int, str], on_finished) -> int:
+    """Fail the postcodes of workers that exited mid-task, returning how many"""
+    reaped = 0
+    for worker_id, worker in enumerate(workers):
+        if worker.is_alive() or worker_id not in claimed:
+            continue
+        postcode = claimed.pop(worker_id)
+        logging.error(f"run_pool: Worker {worker_id} exited while scraping {postcode}")
+        on_finished(
+            postcode, f"worker exited with code {worker.exitcode}", False, False
+        )
+        reaped += 1
+    return reaped
@@ -0,0 +1,209 @@
+import numpy as np
+
+from analytics import (
+    DAILY,
+    WEEKLY,
+    WEEKLY_BY_TYPE,
+    RollupStore,
+    day_to_date,
+    group_median,
+    load_listings,
+    median_price_by_postcode_week,
+    price_per_bedroom_by_type,
+    refresh_rollups,
+    rollup,
+    table_from_rows,
+)
+from listing_parser import Listing
+from listing_store import LedgerEntry, ListingStore
+
+
+def listing(scrape_date, postcode, position, price, bedrooms=2, kind="Apartment"):
+    return Listing(
+        listing_id=str(position),
+        address="",
+        price_text="",
+        price=price,
+        bedrooms=bedrooms,
+        bathrooms=None,
+        parking=None,
+        property_type=kind,
+        status="",
+        list_date=None,
+        source_file=f"{scrape_date}_{postcode}_1.html",
+        scrape_date=scrape_date,
+        postcode=postcode,
+        page_num=1,
+        position=position,
+    )
+
+
+def record_page(store: ListingStore, listings) -> None:
+    """Store listings as the single page their first listing names"""
+    filename = listings[0].source_file
+    store.record_files([(LedgerEntry(filename, 0, 0, "", len(listings)), listings)])
+
+
+def medians_by_key(result):
+    return {
+        tuple(int(key[i]) for key in result.keys): result.medians[i]
+        for i in range(len(result.medians))
+    }
+
+
+class TestGroupMedian:
+    """Test suite for the vectorised weighted median"""
+
+    def test_group_median_odd_total_picks_middle_value(self):
+        """Each group's median is its middle value once weights are expanded"""
+        keys = (np.array([1, 1, 1, 2]),)
+        result = group_median(keys, np.array([30, 10, 20, 5]), np.array([1, 1, 1, 1]))
+
+        assert result.medians.tolist() == [20, 5]
+        assert result.listings.tolist() == [3, 1]
+
+    def test_group_median_even_total_averages_middle_values(self):
+        """Weights count as repeated rows, and an even count averages the middle two"""
+        keys = (np.array([1, 1]),)
+        result = group_median(keys, np.array([100, 200]), np.array([3, 1]))
+
+        assert result.medians.tolist() == [100]
+
+        result = group_median(keys, np.array([100, 200]), np.array([2, 2]))
+
+        assert result.medians.tolist() == [150]
+
+
+class TestAggregates:
+    """Test suite for the report aggregates over raw and rolled-up tables"""
+
+    def test_median_price_by_postcode_week_groups_days_into_weeks(self):
+        """Monday to Sunday share a week, and unpriced listings are ignored"""
+        table = table_from_rows(
+            [
+                ("20250106", "2000", "Apartment", 2, 500),  # Monday
+                ("20250112", "2000", "Apartment", 2, 700),  # Sunday
+                ("20250113", "2000", "Apartment", 2, 900),  # next Monday
+                ("20250106", "2000", "Apartment", 2, None),
+            ]
+        )
+
+        result = median_price_by_postcode_week(table)
+
+        assert [day_to_date(week) for week in result.keys[0]] == [
+            "20250106",
+            "20250113",
+        ]
+        assert result.medians.tolist() == [600, 900]
+
+    def test_rollup_aggregates_match_raw_listings(self):
+        """Merging identical rows changes no median"""
+        rows = [
+            ("20250106", "2000", "House", 3, 900),
+            ("20250106", "2000", "House", 3, 900),
+            ("20250107", "2000", "House", 4, 1000),
+            ("20250107", "2010", "Apartment", 1, 450),
+            ("20250107", "2010", "Apartment", 2, 600),
+        ]
+        table = table_from_rows(rows)
+        rolled = rollup(table)
+
+        assert len(rolled) == 4
+        assert medians_by_key(median_price_by_postcode_week(rolled)) == (
+            medians_by_key(median_price_by_postcode_week(table))
+        )
+        assert medians_by_key(price_per_bedroom_by_type(rolled)) == (
+            medians_by_key(price_per_bedroom_by_type(table))
+        )
+
+    def test_price_per_bedroom_by_type_skips_unknown_bedrooms(self):
+        """Listings without a bedroom count cannot give a price per bedroom"""
+        table = table_from_rows(
+            [
+                ("20250106", "2000", "House", 2, 800),
+                ("20250106", "2000", "House", None, 5000),
+            ]
+        )
+
+        result = price_per_bedroom_by_type(table)
+
+        assert result.medians.tolist() == [400]
+
+
+class TestRefreshRollups:
+    """Test suite for keeping the rollup layers in step with the listing store"""
+
+    def test_refresh_rollups_adds_new_day(self, tmp_path):
+        """A newly ingested day is rolled up alongside the days already stored"""
+        rollup_store = RollupStore(str(tmp_path / "rollups"))
+        with ListingStore(str(tmp_path / "listings.sqlite3")) as store:
+            record_page(store, [listing("20250106", "2000", 0, 500)])
+            refresh_rollups(store, rollup_store)
+            record_page(store, [listing("20250107", "2000", 1, 700)])
+
+            assert refresh_rollups(store, rollup_store) == {"20250107"}
+
+        daily = rollup_store.load(DAILY)
+        assert [day_to_date(day) for day in daily.day] == ["20250106", "20250107"]
+        assert rollup_store.load(WEEKLY).count.tolist() == [1, 1]
+
+    def test_refresh_rollups_without_new_listings_rolls_up_nothing(self, tmp_path):
+        """Days already rolled up are not read from the listing store again"""
+        rollup_store = RollupStore(str(tmp_path / "rollups"))
+        with ListingStore(str(tmp_path / "listings.sqlite3")) as store:
+            record_page(store, [listing("20250105", "2000", 0, 400)])
+            record_page(store, [listing("20250106", "2000", 0, 500)])
+            refresh_rollups(store, rollup_store)
+
+            assert refresh_rollups(store, rollup_store) == set()
+
+    def test_refresh_rollups_replaces_earlier_day_in_order(self, tmp_path):
+        """A day passed explicitly is rolled up again and the layer stays sorted"""
+        rollup_store = RollupStore(str(tmp_path / "rollups"))
+        with ListingStore(str(tmp_path / "listings.sqlite3")) as store:
+            record_page(store, [listing("20250106", "2000", 0, 500)])
+            record_page(store, [listing("20250107", "2000", 1, 700)])
+            refresh_rollups(store, rollup_store)
+            record_page(store, [listing("20250106", "2000", 0, 650)])
+
+            refresh_rollups(store, rollup_store, ["20250106"])
+
+        assert rollup_store.load(DAILY).price.tolist() == [650, 700]
+        assert rollup_store.load(WEEKLY).price.tolist() == [650, 700]
+
+    def test_refresh_rollups_weekly_layers_match_raw_listings(self, tmp_path):
+        """Aggregates over the weekly layers equal those over the raw listings"""
+        rollup_store = RollupStore(str(tmp_path / "rollups"))
+        with ListingStore(str(tmp_path / "listings.sqlite3")) as store:
+            record_page(
+                store,
+                [
+                    listing("20250106", "2000", 0, 500),
+                    listing("20250106", "2000", 1, 900, bedrooms=3, kind="House"),
+                ],
+            )
+            record_page(store, [listing("20250113", "2010", 0, 450, bedrooms=1)])
+            refresh_rollups(store, rollup_store)
+            raw = load_listings(store)
+
+        assert medians_by_key(
+            median_price_by_postcode_week(rollup_store.load(WEEKLY))
+        ) == medians_by_key(median_price_by_postcode_week(raw))
+        by_type = price_per_bedroom_by_type(rollup_store.load(WEEKLY_BY_TYPE))
+        assert sorted(by_type.medians.tolist()) == [300, 350]
+
+    def test_refresh_rollups_weekly_counts_each_listing_once(self, tmp_path):
+        """A listing seen all week counts once, and partial crawls are left out"""
+        rollup_store = RollupStore(str(tmp_path / "rollups"))
+        with ListingStore(str(tmp_path / "listings.sqlite3")) as store:
+            for scrape_date in ("20250106", "20250107", "20250108"):
+                record_page(store, [listing(scrape_date, "2000", 0, 500)])
+            record_page(store, [listing("20250109", "2000", 1, 900)])
+            record_page(store, [listing("20250110", "2000", 2, 300)])
+            store.record_snapshot("20250110", "2000", is_full=False)
+            refresh_rollups(store, rollup_store)
+
+        weekly = rollup_store.load(WEEKLY)
+        assert (weekly.price.tolist(), weekly.count.tolist()) == ([500, 900], [1, 1])
+        assert median_price_by_postcode_week(weekly).medians.tolist() == [700]
+        assert rollup_store.load(DAILY).listings == 4
@@ -1,7 +1,7 @@
 import logging
 import time
 
-from browser_controller import BraveBrowserController
+from brave_controller import BraveBrowserController
 
 
 class TestBraveBrowserController:
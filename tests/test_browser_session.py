@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from browser_controller import (
+    BrowserController,
+    reset_user_data_dir,
+    wait_for_profile_closed,
+)
+from browser_session import BrowserSession
+
+
+class CountingBrowserController(BrowserController):
+    """Controller that records launches and can fail on a chosen navigation"""
+
+    def __init__(self, user_data_dir=None, template_dir=None, fail_on_page=None):
+        self.user_data_dir = user_data_dir
+        self.template_dir = template_dir
+        self.fail_on_page = fail_on_page
+        self.launches = 0
+        self.closes = 0
+        self.navigations = 0
+
+    def open_browser(self) -> None:
+        self.launches += 1
+        if self.user_data_dir:
+            path = reset_user_data_dir(self.user_data_dir, self.template_dir)
+            with open(f"{path}/Preferences", "a") as file:
+                file.write(f"launch {self.launches}\n")
+            with open(f"{path}/Cookies", "w") as file:
+                file.write("session=1\n")
+
+    def perform_initial_setup(self) -> None:
+        pass
+
+    def close_browser(self) -> None:
+        self.closes += 1
+
+    def navigate_to(self, url: str) -> None:
+        self.navigations += 1
+        if self.navigations == self.fail_on_page:
+            raise RuntimeError("renderer crashed")
+
+    def save_page(self, filepath: str) -> None:
+        pass
+
+    def perform_human_like_activity(self) -> None:
+        pass
+
+
+def visit(session: BrowserSession, num_pages: int) -> None:
+    for page_num in range(1, num_pages + 1):
+        session.navigate_to(f"https://example.com/list-{page_num}")
+
+
+class TestBrowserSession:
+    """Test suite for the persistent browser session"""
+
+    def test_open_browser_across_postcodes_launches_once(self):
+        """Opening the session for each postcode reuses the running browser"""
+        controller = CountingBrowserController()
+        session = BrowserSession(controller, max_pages=100)
+
+        for _ in range(3):
+            session.open_browser()
+            visit(session, 5)
+        session.close_browser()
+
+        assert (controller.launches, controller.closes) == (1, 1)
+
+    def test_navigate_to_page_budget_restarts_browser(self):
+        """The browser is relaunched once it has served max_pages pages"""
+        controller = CountingBrowserController()
+        session = BrowserSession(controller, max_pages=4)
+
+        visit(session, 10)
+
+        assert controller.launches == 3
+        assert session.pages_since_start == 2
+
+    def test_navigate_to_failure_relaunches_on_next_use(self):
+        """A failing browser call closes the browser and the next page relaunches it"""
+        controller = CountingBrowserController(fail_on_page=2)
+        session = BrowserSession(controller)
+
+        with pytest.raises(RuntimeError):
+            visit(session, 2)
+        assert not session.is_open
+
+        session.navigate_to("https://example.com/list-2")
+        assert controller.launches == 2
+
+    def test_close_browser_first_profile_becomes_template(self, tmp_path):
+        """Later launches start from a copy of the first launch's profile"""
+        template_dir = tmp_path / "template"
+        controller = CountingBrowserController(
+            str(tmp_path / "profile"), str(template_dir)
+        )
+        session = BrowserSession(controller, max_pages=1)
+
+        visit(session, 3)
+
+        assert (template_dir / "Preferences").read_text() == "launch 1\n"
+        assert not (template_dir / "Cookies").exists()
+        assert (tmp_path / "profile" / "Preferences").read_text() == (
+            "launch 1\nlaunch 3\n"
+        )
+
+    def test_close_browser_profile_still_locked_is_not_template(self, tmp_path):
+        """A profile the browser has not yet released is not copied"""
+        profile_dir = tmp_path / "profile"
+        profile_dir.mkdir()
+        os.symlink("host-1234", profile_dir / "SingletonLock")
+
+        assert not wait_for_profile_closed(str(profile_dir), timeout=0.05)
+        os.unlink(profile_dir / "SingletonLock")
+        assert wait_for_profile_closed(str(profile_dir), timeout=0.05)
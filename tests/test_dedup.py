@@ -0,0 +1,136 @@
+from dedup import dedupe_day, fuzzy_token, normalise_address
+from listing_diff import diff_dates
+from listing_parser import Listing
+from listing_store import LedgerEntry, ListingStore
+
+
+def make_listing(
+    listing_id: str,
+    scrape_date: str,
+    address: str,
+    postcode: str = "2000",
+    page_num: int = 1,
+    bedrooms: int = 2,
+) -> Listing:
+    return Listing(
+        listing_id=listing_id,
+        address=address,
+        price_text="$650 per week",
+        price=650,
+        bedrooms=bedrooms,
+        bathrooms=1,
+        parking=1,
+        property_type="Apartment",
+        status="",
+        list_date=None,
+        source_file="",
+        scrape_date=scrape_date,
+        postcode=postcode,
+        page_num=page_num,
+        position=int(listing_id),
+    )
+
+
+def store_pages(store: ListingStore, listings) -> None:
+    """Store each listing as if it came from its own page file"""
+    store.record_files(
+        (
+            LedgerEntry(
+                f"{x.scrape_date}_{x.postcode}_{x.page_num}_{x.listing_id}.html",
+                0,
+                0,
+                "",
+                1,
+            ),
+            [x],
+        )
+        for x in listings
+    )
+
+
+def open_store(directory) -> ListingStore:
+    return ListingStore(str(directory / "listings.sqlite3"))
+
+
+class TestAddressNormalisation:
+    """Test suite for the address keys listings are matched on"""
+
+    def test_normalise_address_formatting_variants_match(self):
+        """Unit prefixes, street type spelling, state and postcode do not matter"""
+        assert normalise_address("Unit 3, 12 King Street, Newtown NSW 2042") == (
+            normalise_address("3/12 King St Newtown")
+        )
+
+    def test_fuzzy_token_misspelling_shares_skeleton(self):
+        """Doubled letters and vowels are dropped, numbers are kept"""
+        assert fuzzy_token("parramatta") == fuzzy_token("paramatta")
+        assert fuzzy_token("12") == "12"
+
+
+class TestDedupeDay:
+    """Test suite for marking repeats and re-listings in the listing store"""
+
+    def test_dedupe_day_repeat_on_next_page_is_duplicate(self, tmp_path):
+        """A listing pushed onto the next page mid-crawl is only counted once"""
+        with open_store(tmp_path) as store:
+            store_pages(
+                store,
+                [
+                    make_listing("1", "20250101", "1 King St"),
+                    make_listing("1", "20250101", "1 King St", page_num=2),
+                    make_listing("2", "20250101", "2 King St", page_num=2),
+                ],
+            )
+
+            summary = dedupe_day(store, "20250101")
+
+            assert summary.repeats == 1
+            assert store.count_listings() == 3
+            assert store.count_listings(deduplicated=True) == 2
+
+    def test_dedupe_day_relisting_takes_earlier_id(self, tmp_path):
+        """A property re-listed under a new id is diffed as the same listing"""
+        with open_store(tmp_path) as store:
+            store_pages(store, [make_listing("1", "20250101", "5 Parramatta Road")])
+            store_pages(store, [make_listing("2", "20250102", "5 Paramatta Rd")])
+            dedupe_day(store, "20250101")
+
+            summary = dedupe_day(store, "20250102")
+
+            assert summary.relistings == 1
+            assert list(diff_dates(store, "20250101", "20250102")) == []
+
+    def test_dedupe_day_different_attributes_are_not_matched(self, tmp_path):
+        """Another unit at the same address with more bedrooms stays separate"""
+        with open_store(tmp_path) as store:
+            store_pages(
+                store,
+                [
+                    make_listing("1", "20250101", "5 King St"),
+                    make_listing("2", "20250101", "5 King St", bedrooms=3),
+                ],
+            )
+
+            summary = dedupe_day(store, "20250101")
+
+            assert summary.repeats == 0
+            assert summary.relistings == 0
+
+    def test_dedupe_day_overlapping_postcode_search_kept_under_lowest(self, tmp_path):
+        """A listing also found by a neighbouring postcode's search is kept once"""
+        with open_store(tmp_path) as store:
+            store_pages(
+                store,
+                [
+                    make_listing("1", "20250101", "1 King St", postcode="2000"),
+                    make_listing("1", "20250101", "1 King St", postcode="2010"),
+                ],
+            )
+            dedupe_day(store, "20250101", "2010")
+
+            dedupe_day(store, "20250101", "2000")
+
+            kept = store.connection.execute(
+                "SELECT postcode FROM unique_listings"
+            ).fetchall()
+            assert kept == [("2000",)]
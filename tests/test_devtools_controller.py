@@ -0,0 +1,218 @@
+import json
+import os
+import socketserver
+import struct
+import threading
+
+import pytest
+
+from devtools_controller import (
+    OPCODE_TEXT,
+    DevToolsBrowserController,
+    DevToolsError,
+    encode_frame,
+    websocket_accept_key,
+)
+
+PAGE_HTML = "<html><body>" + "ResidentialCard " * 10000 + "</body></html>"
+
+
+def read_client_frame(rfile) -> bytes:
+    """Read one masked client frame and return its unmasked payload"""
+    first, second = rfile.read(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", rfile.read(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", rfile.read(8))
+    masking_key = rfile.read(4)
+    payload = rfile.read(length)
+    if first & 0x0F != OPCODE_TEXT:
+        return b""
+    return bytes(b ^ masking_key[i % 4] for i, b in enumerate(payload))
+
+
+class FakeDevToolsHandler(socketserver.StreamRequestHandler):
+    """Serves /json/list and a page websocket answering a few DevTools commands"""
+
+    def handle(self):
+        request_line = self.rfile.readline().decode()
+        headers = {}
+        for line in iter(self.rfile.readline, b"\r\n"):
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if request_line.startswith("GET /json/list"):
+            self._send_json_list()
+        else:
+            self._serve_websocket(headers["sec-websocket-key"])
+
+    def _send_json_list(self):
+        port = self.server.server_address[1]
+        body = json.dumps(
+            [
+                {"type": "service_worker", "id": "sw"},
+                {
+                    "type": "page",
+                    "id": "1",
+                    "webSocketDebuggerUrl": f"ws://127.0.0.1:{port}/devtools/page/1",
+                },
+            ]
+        ).encode()
+        self.wfile.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+
+    def _serve_websocket(self, key: str):
+        self.wfile.write(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            + f"Sec-WebSocket-Accept: {websocket_accept_key(key)}\r\n\r\n".encode()
+        )
+        while True:
+            try:
+                payload = read_client_frame(self.rfile)
+            except ValueError:
+                return
+            if not payload:
+                return
+            command = json.loads(payload)
+            self.server.commands.append(command)
+            for message in self.server.respond(command):
+                self.wfile.write(
+                    encode_frame(OPCODE_TEXT, json.dumps(message).encode(), mask=False)
+                )
+
+
+class FakeDevToolsServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, navigate_error: str = ""):
+        super().__init__(("127.0.0.1", 0), FakeDevToolsHandler)
+        self.navigate_error = navigate_error
+        self.evaluate_exception = None
+        self.commands = []
+
+    def respond(self, command):
+        """Messages a browser would send back for one command"""
+        method = command["method"]
+        reply = {"id": command["id"], "result": {}}
+        if method == "Page.navigate":
+            # Unrelated events and the command reply arrive before the page loads
+            reply["result"] = {"frameId": "1", "errorText": self.navigate_error}
+            return [
+                {"method": "Network.requestWillBeSent", "params": {}},
+                reply,
+                {"method": "Page.domContentEventFired", "params": {}},
+                {"method": "Page.loadEventFired", "params": {"timestamp": 1.0}},
+            ]
+        if method == "Runtime.evaluate" and self.evaluate_exception:
+            reply["result"] = {
+                "result": {"type": "object", "subtype": "error"},
+                "exceptionDetails": {"text": self.evaluate_exception},
+            }
+            return [reply]
+        if method == "Runtime.evaluate":
+            reply["result"] = {"result": {"type": "string", "value": PAGE_HTML}}
+            return [reply]
+        if method == "Page.enable":
+            return [reply]
+        return [{"id": command["id"], "error": {"code": -32601, "message": method}}]
+
+
+@pytest.fixture
+def devtools_server():
+    server = FakeDevToolsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def connected_controller(server: FakeDevToolsServer) -> DevToolsBrowserController:
+    """Controller attached to the fake endpoint without launching a browser"""
+    controller = DevToolsBrowserController(port=server.server_address[1])
+    controller.connect()
+    return controller
+
+
+class TestDevToolsBrowserController:
+    """Test suite for the DevTools protocol browser controller"""
+
+    def test_navigate_to_waits_for_load_event(self, devtools_server):
+        """Navigation returns once the load event arrives, skipping other events"""
+        controller = connected_controller(devtools_server)
+
+        controller.navigate_to("https://example.com/buy/in-2000/list-1")
+        controller.close_browser()
+
+        assert [c["method"] for c in devtools_server.commands] == [
+            "Page.enable",
+            "Page.navigate",
+        ]
+        assert devtools_server.commands[1]["params"] == {
+            "url": "https://example.com/buy/in-2000/list-1"
+        }
+
+    def test_navigate_to_error_text_raises(self, devtools_server):
+        """A navigation the browser reports as failed raises instead of saving"""
+        devtools_server.navigate_error = "net::ERR_NAME_NOT_RESOLVED"
+        controller = connected_controller(devtools_server)
+
+        with pytest.raises(DevToolsError, match="ERR_NAME_NOT_RESOLVED"):
+            controller.navigate_to("https://example.invalid")
+        controller.close_browser()
+
+    def test_save_page_writes_dom_to_target_path(self, devtools_server, tmp_path):
+        """The serialised DOM is written whole to the target file"""
+        controller = connected_controller(devtools_server)
+        filepath = tmp_path / "20250101_2000_1.html"
+
+        controller.save_page(str(filepath))
+        controller.close_browser()
+
+        assert filepath.read_text(encoding="utf-8") == "<!DOCTYPE html>\n" + PAGE_HTML
+        assert os.listdir(tmp_path) == ["20250101_2000_1.html"]
+        assert filepath.stat().st_mode & 0o777 == 0o644
+
+    def test_save_page_script_exception_raises_and_leaves_no_file(
+        self, devtools_server, tmp_path
+    ):
+        """A DOM read the page's script rejects is a DevToolsError, not a KeyError"""
+        devtools_server.evaluate_exception = "Uncaught"
+        controller = connected_controller(devtools_server)
+
+        with pytest.raises(DevToolsError, match="Uncaught"):
+            controller.save_page(str(tmp_path / "20250101_2000_1.html"))
+        controller.close_browser()
+
+        assert os.listdir(tmp_path) == []
+
+    def test_save_page_failed_rename_removes_temp_file(
+        self, devtools_server, tmp_path, monkeypatch
+    ):
+        """A save that fails part way leaves nothing behind in the page directory"""
+        controller = connected_controller(devtools_server)
+
+        def fail_replace(source, target):
+            raise OSError("No space left on device")
+
+        monkeypatch.setattr(os, "replace", fail_replace)
+        with pytest.raises(OSError):
+            controller.save_page(str(tmp_path / "20250101_2000_1.html"))
+        monkeypatch.undo()
+        controller.close_browser()
+
+        assert os.listdir(tmp_path) == []
+
+    def test_send_unknown_command_raises(self, devtools_server):
+        """Protocol errors are surfaced as DevToolsError"""
+        controller = connected_controller(devtools_server)
+
+        with pytest.raises(DevToolsError, match="Browser.bogus"):
+            controller.session.send("Browser.bogus")
+        controller.close_browser()
@@ -0,0 +1,73 @@
+import os
+
+from extract import extract_file, iter_extractions, list_page_files
+from page_archive import PageArchive
+
+CARD = (
+    '<article data-testid="ResidentialCard">'
+    '<a href="/property-unit-nsw-sydney-{listing_id}"></a>'
+    '<span class="property-price">$500,000</span>'
+    "</article>"
+)
+
+
+def write_pages(directory, num_pages: int) -> None:
+    """Write num_pages single-card search pages for postcode 2000"""
+    for page_num in range(1, num_pages + 1):
+        card = CARD.format(listing_id=100 + page_num)
+        (directory / f"20250101_2000_{page_num}.html").write_text(card)
+
+
+class TestExtract:
+    """Test suite for the batch extraction pipeline"""
+
+    def test_list_page_files_ignores_non_page_files(self, tmp_path):
+        """Only YYYYMMDD_<postcode>_<page>.html files are listed"""
+        write_pages(tmp_path, 2)
+        (tmp_path / "20250101_2000_completed.html").write_text("")
+        (tmp_path / "notes.txt").write_text("")
+
+        assert [p.rsplit("/", 1)[1] for p in list_page_files(str(tmp_path))] == [
+            "20250101_2000_1.html",
+            "20250101_2000_2.html",
+        ]
+
+    def test_list_page_files_includes_archived_pages(self, tmp_path):
+        """Pages packed into the archive and removed are still listed and extracted"""
+        output_dir = tmp_path / "pages"
+        output_dir.mkdir()
+        write_pages(output_dir, 2)
+        archived = str(output_dir / "20250101_2000_1.html")
+        archive_dir = str(tmp_path / "archive")
+        with PageArchive(archive_dir) as archive:
+            archive.store_page(archived)
+            archive.store_page(str(output_dir / "20250101_2000_2.html"))
+        os.remove(archived)
+
+        page_files = list_page_files(str(output_dir), archive_dir)
+        result = extract_file(archived, archive_dir)
+
+        assert [p.rsplit("/", 1)[1] for p in page_files] == [
+            "20250101_2000_1.html",
+            "20250101_2000_2.html",
+        ]
+        assert [listing.listing_id for listing in result.listings] == ["101"]
+
+    def test_extract_file_unreadable_file_returns_error(self, tmp_path):
+        """A file that cannot be read is reported rather than raised"""
+        result = extract_file(str(tmp_path / "20250101_2000_1.html"))
+
+        assert result.listings == []
+        assert result.error.startswith("FileNotFoundError")
+
+    def test_iter_extractions_process_pool_returns_every_page(self, tmp_path):
+        """Pages spread across workers and batches all come back exactly once"""
+        write_pages(tmp_path, 7)
+        page_files = list_page_files(str(tmp_path))
+
+        results = list(iter_extractions(page_files, max_workers=2, batch_size=2))
+
+        assert sorted(r.filename for r in results) == page_files
+        assert sorted(r.listings[0].listing_id for r in results) == [
+            str(100 + n) for n in range(1, 8)
+        ]
@@ -0,0 +1,49 @@
+from incremental import IncrementalBaseline, count_known_pages, load_baseline
+from ingest import ingest_postcode
+from listing_store import ListingStore
+from synthetic_pages import write_corpus
+
+
+def store_crawl(store: ListingStore, directory, scrape_date: str, results: int):
+    """Save and ingest a crawl of postcode 2000, returning its page filenames"""
+    filenames = write_corpus(str(directory), scrape_date, {"2000": results})
+    ingest_postcode(store, scrape_date, "2000", str(directory))
+    return filenames
+
+
+def synthetic_ids(first: int, last: int):
+    return {f"2000{n:05d}" for n in range(first, last + 1)}
+
+
+class TestIncrementalBaseline:
+    """Test suite for choosing between incremental and full crawls"""
+
+    def test_load_baseline_knows_listings_since_last_full_crawl(self, tmp_path):
+        """Known listings cover the last full crawl and the incremental ones after it"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_crawl(store, tmp_path, "20250101", 5)
+            store_crawl(store, tmp_path, "20250103", 2)
+            store_crawl(store, tmp_path, "20250104", 3)
+            store.record_snapshot("20250104", "2000", is_full=False)
+
+            baseline = load_baseline(store, "2000", "20250105", full_crawl_days=7)
+
+        assert baseline.full_date == "20250103"
+        assert baseline.known_ids == synthetic_ids(1, 3)
+
+    def test_load_baseline_full_crawl_due_returns_none(self, tmp_path):
+        """A postcode is crawled in full again once its last full crawl is too old"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_crawl(store, tmp_path, "20250101", 5)
+
+            assert load_baseline(store, "2000", "20250108", full_crawl_days=7) is None
+            assert load_baseline(store, "2010", "20250102") is None
+
+    def test_count_known_pages_resets_on_new_listing(self, tmp_path):
+        """Only an unbroken run of pages holding known listings is counted"""
+        first, second = write_corpus(str(tmp_path), "20250102", {"2000": 50})
+        baseline = IncrementalBaseline("20250101", frozenset(synthetic_ids(26, 50)))
+
+        assert count_known_pages(first, baseline, 1) == 0
+        assert count_known_pages(second, baseline, 0) == 1
+        assert count_known_pages(second, None, 0) == 0
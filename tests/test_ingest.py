@@ -0,0 +1,112 @@
+import os
+
+from ingest import ingest_directory, ingest_postcode
+from listing_store import ListingStore
+
+CARD = (
+    '<article data-testid="ResidentialCard">'
+    '<a href="/property-unit-nsw-sydney-{listing_id}"></a>'
+    '<span class="property-price">{price}</span>'
+    "</article>"
+)
+
+
+def write_page(directory, name: str, listings) -> str:
+    """Write a search page with a card per (listing_id, price) pair"""
+    path = directory / name
+    path.write_text("".join(CARD.format(listing_id=i, price=p) for i, p in listings))
+    return str(path)
+
+
+def open_store(directory) -> ListingStore:
+    return ListingStore(str(directory / "listings.sqlite3"))
+
+
+class TestIngestDirectory:
+    """Test suite for incremental ingestion into the listing store"""
+
+    def test_ingest_directory_new_files_are_stored(self, tmp_path):
+        """Listings from every new page end up in the store"""
+        pages = tmp_path / "pages"
+        pages.mkdir()
+        write_page(pages, "20250101_2000_1.html", [(1, "$500,000"), (2, "$600,000")])
+        write_page(pages, "20250101_2010_1.html", [(3, "$700,000")])
+
+        with open_store(tmp_path) as store:
+            summary = ingest_directory(store, str(pages), max_workers=1)
+
+            assert summary.new_or_changed == 2
+            assert [listing.listing_id for listing in store.listings_for("2000")] == [
+                "1",
+                "2",
+            ]
+            assert store.listings_for("2010")[0].source_file == "20250101_2010_1.html"
+
+    def test_ingest_directory_rerun_skips_unchanged_files(self, tmp_path):
+        """A second pass over the same directory parses nothing"""
+        pages = tmp_path / "pages"
+        pages.mkdir()
+        write_page(pages, "20250101_2000_1.html", [(1, "$500,000")])
+
+        with open_store(tmp_path) as store:
+            ingest_directory(store, str(pages), max_workers=1)
+            summary = ingest_directory(store, str(pages), max_workers=1)
+
+            assert summary.new_or_changed == 0
+            assert summary.touched_only == 0
+            assert store.count_listings() == 1
+
+    def test_ingest_directory_changed_file_replaces_its_listings(self, tmp_path):
+        """A rewritten page replaces, rather than adds to, its previous listings"""
+        pages = tmp_path / "pages"
+        pages.mkdir()
+        path = write_page(pages, "20250101_2000_1.html", [(1, "$500,000")])
+
+        with open_store(tmp_path) as store:
+            ingest_directory(store, str(pages), max_workers=1)
+            write_page(pages, "20250101_2000_1.html", [(1, "$450,000"), (2, "$1")])
+            os.utime(path, ns=(0, 10**18))
+            ingest_directory(store, str(pages), max_workers=1)
+
+            assert [(x.listing_id, x.price) for x in store.listings_for("2000")] == [
+                ("1", 450000),
+                ("2", 1),
+            ]
+
+    def test_ingest_directory_touched_file_is_not_reparsed(self, tmp_path):
+        """A file whose mtime changed but content did not only refreshes the ledger"""
+        pages = tmp_path / "pages"
+        pages.mkdir()
+        path = write_page(pages, "20250101_2000_1.html", [(1, "$500,000")])
+
+        with open_store(tmp_path) as store:
+            ingest_directory(store, str(pages), max_workers=1)
+            os.utime(path, ns=(0, 10**18))
+            summary = ingest_directory(store, str(pages), max_workers=1)
+
+            assert summary.touched_only == 1
+            assert store.load_ledger()["20250101_2000_1.html"].num_listings == 1
+            assert ingest_directory(store, str(pages), max_workers=1).touched_only == 0
+
+
+class TestIngestPostcode:
+    """Test suite for ingesting one postcode as soon as it is scraped"""
+
+    def test_ingest_postcode_reads_only_its_ledger_entries(self, tmp_path):
+        """Only the postcode's pages are ingested, against its part of the ledger"""
+        pages = tmp_path / "pages"
+        pages.mkdir()
+        write_page(pages, "20250101_2000_1.html", [(1, "$500,000")])
+        write_page(pages, "20250101_2000_2.html", [(2, "$600,000")])
+        write_page(pages, "20250101_20001_1.html", [(3, "$700,000")])
+        write_page(pages, "20250101_2010_1.html", [(4, "$800,000")])
+
+        with open_store(tmp_path) as store:
+            ingested = ingest_postcode(store, "20250101", "2000", str(pages))
+
+            assert ingested == 2
+            assert sorted(store.load_ledger("20250101_2000_")) == [
+                "20250101_2000_1.html",
+                "20250101_2000_2.html",
+            ]
+            assert len(store.load_ledger()) == 2
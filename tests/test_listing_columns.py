@@ -0,0 +1,120 @@
+import dataclasses
+import json
+
+from listing_columns import (
+    columns_from_listings,
+    load_jsonl_columns,
+    load_store_columns,
+    suburb_from_address,
+)
+from listing_parser import Listing
+from listing_store import LedgerEntry, ListingStore
+
+
+def listing(
+    position: int,
+    postcode: str = "2000",
+    price=650,
+    list_date=None,
+    suburb: str = "Sydney",
+    kind: str = "Apartment",
+) -> Listing:
+    return Listing(
+        listing_id=f"{postcode}-{position}",
+        address=f"{position} King St, {suburb} NSW {postcode}",
+        price_text=f"${price} per week" if price is not None else "Contact agent",
+        price=price,
+        bedrooms=2,
+        bathrooms=None,
+        parking=1,
+        property_type=kind,
+        status="",
+        list_date=list_date,
+        source_file="20250101_2000_1.html",
+        scrape_date="20250101",
+        postcode=postcode,
+        page_num=1,
+        position=position,
+    )
+
+
+LISTINGS = [
+    listing(1, "2000", 700, "20241220", "Sydney"),
+    listing(2, "2042", 550, "20241230", "Newtown", "House"),
+    listing(3, "2000", None, None, "Sydney"),
+    listing(4, "2042", 480, "20250101", "Enmore"),
+    listing(5, "2010", 900, "20241215", "Surry Hills", "House"),
+    listing(6, "2042", 620, "20241225", "Newtown"),
+]
+
+
+class TestSuburbFromAddress:
+    """Test suite for reading the suburb out of a listing address"""
+
+    def test_suburb_from_address_state_and_postcode_dropped(self):
+        """Multi-word suburbs survive, with or without a comma before the state"""
+        assert suburb_from_address("1 A Rd, Elizabeth Bay NSW 2011") == "Elizabeth Bay"
+        assert suburb_from_address("1 X St, Kings Cross, nsw 2011") == "Kings Cross"
+        assert suburb_from_address("12 King St") == ""
+
+
+class TestListingColumns:
+    """Test suite for the columnar listing container"""
+
+    def test_listing_columns_rows_round_trip(self):
+        """Every row reads back as the listing it was built from"""
+        columns = columns_from_listings(LISTINGS, batch_size=4)
+
+        assert len(columns) == len(LISTINGS)
+        assert [row.to_listing() for row in columns.rows(range(len(columns)))] == (
+            LISTINGS
+        )
+        assert columns[3].suburb == "Enmore"
+        assert columns[2].price is None
+
+    def test_listing_columns_select_combines_filters(self):
+        """Indexed ranges and plain filters intersect, missing values never match"""
+        columns = columns_from_listings(LISTINGS)
+
+        assert columns.select(postcode="2042").tolist() == [1, 3, 5]
+        assert columns.select(prices=(0, 10_000)).tolist() == [0, 1, 3, 4, 5]
+        assert columns.select(
+            postcode="2042", list_dates=("20241225", "20241231"), suburb="Newtown"
+        ).tolist() == [1, 5]
+        assert columns.select(property_type="House", prices=(600, 1000)).tolist() == [4]
+        assert columns.select(postcode="3000").tolist() == []
+        assert columns.select(suburb="Parramatta").tolist() == []
+
+    def test_listing_columns_many_strings_use_wider_codes(self):
+        """Codes widen past 256 distinct values and still keep their order"""
+        listings = [listing(i, str(2000 + i)) for i in range(300)]
+        columns = columns_from_listings(listings, batch_size=128)
+
+        assert columns.keys("postcode").dtype.itemsize == 2
+        assert columns.select(postcode="2299").tolist() == [299]
+        assert columns[150].listing_id == "2150-150"
+
+
+class TestLoadColumns:
+    """Test suite for loading columns from the listing store and JSON lines"""
+
+    def test_load_store_columns_matches_jsonl(self, tmp_path):
+        """The store and an extract file of the same listings load the same rows"""
+        store = ListingStore(str(tmp_path / "listings.sqlite3"))
+        store.record_files(
+            [(LedgerEntry("20250101_2000_1.html", 0, 0, "", len(LISTINGS)), LISTINGS)]
+        )
+        jsonl = tmp_path / "extracted_listings.jsonl"
+        jsonl.write_text(
+            "".join(json.dumps(dataclasses.asdict(x)) + "\n" for x in LISTINGS),
+            encoding="utf-8",
+        )
+
+        from_store = load_store_columns(store, batch_size=4)
+        from_jsonl = load_jsonl_columns(str(jsonl))
+
+        def rows(columns):
+            listings = (row.to_listing() for row in columns.rows(range(len(columns))))
+            return sorted(listings, key=lambda x: x.position)
+
+        assert rows(from_store) == rows(from_jsonl) == LISTINGS
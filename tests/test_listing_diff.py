@@ -0,0 +1,170 @@
+from listing_diff import (
+    ChangeKind,
+    diff_dates,
+    load_changes,
+    materialise_postcode_changes,
+)
+from listing_parser import Listing
+from listing_store import LedgerEntry, ListingStore
+
+
+def make_listing(
+    listing_id: str,
+    scrape_date: str,
+    postcode: str = "2000",
+    price_text: str = "$500,000",
+    status: str = "",
+    page_num: int = 1,
+) -> Listing:
+    return Listing(
+        listing_id=listing_id,
+        address=f"{listing_id} King St",
+        price_text=price_text,
+        price=None,
+        bedrooms=2,
+        bathrooms=1,
+        parking=1,
+        property_type="Unit",
+        status=status,
+        list_date=None,
+        source_file="",
+        scrape_date=scrape_date,
+        postcode=postcode,
+        page_num=page_num,
+        position=int(listing_id),
+    )
+
+
+def store_snapshot(store: ListingStore, listings) -> None:
+    """Store each listing as if it came from its own page file"""
+    store.record_files(
+        (
+            LedgerEntry(
+                f"{x.scrape_date}_{x.postcode}_{x.page_num}_{x.listing_id}.html",
+                0,
+                0,
+                "",
+                1,
+            ),
+            [x],
+        )
+        for x in listings
+    )
+
+
+def kinds(changes):
+    return [(change.listing_id, change.kind) for change in changes]
+
+
+class TestListingDiff:
+    """Test suite for the day-over-day listing diff engine"""
+
+    def test_diff_dates_reports_each_change_kind(self, tmp_path):
+        """Added, removed, price and status changes are detected by listing id"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_snapshot(
+                store,
+                [
+                    make_listing("1", "20250101"),
+                    make_listing("2", "20250101"),
+                    make_listing("3", "20250101"),
+                    make_listing("4", "20250101"),
+                ],
+            )
+            store_snapshot(
+                store,
+                [
+                    make_listing("2", "20250102", price_text="$480,000"),
+                    make_listing("3", "20250102", status="Under contract"),
+                    make_listing("4", "20250102"),
+                    make_listing("5", "20250102"),
+                ],
+            )
+
+            changes = list(diff_dates(store, "20250101", "20250102"))
+
+        assert kinds(changes) == [
+            ("1", ChangeKind.REMOVED),
+            ("2", ChangeKind.PRICE_CHANGED),
+            ("3", ChangeKind.STATUS_CHANGED),
+            ("5", ChangeKind.ADDED),
+        ]
+        assert (changes[1].old_value, changes[1].new_value) == ("$500,000", "$480,000")
+
+    def test_diff_dates_listing_on_two_pages_is_not_duplicated(self, tmp_path):
+        """A listing pushed onto the next page mid-crawl is only diffed once"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_snapshot(store, [make_listing("1", "20250101")])
+            store_snapshot(
+                store,
+                [
+                    make_listing("1", "20250102", page_num=1),
+                    make_listing("1", "20250102", page_num=2),
+                ],
+            )
+
+            assert list(diff_dates(store, "20250101", "20250102")) == []
+
+    def test_diff_dates_postcode_missing_one_day_is_skipped(self, tmp_path):
+        """A postcode not crawled on one of the days produces no changes"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_snapshot(store, [make_listing("1", "20250101", postcode="2000")])
+            store_snapshot(store, [make_listing("2", "20250102", postcode="2010")])
+
+            assert list(diff_dates(store, "20250101", "20250102")) == []
+
+    def test_materialise_postcode_changes_uses_previous_snapshot(self, tmp_path):
+        """Changes for a finished postcode are stored against its last snapshot"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_snapshot(store, [make_listing("1", "20250101")])
+            store_snapshot(store, [make_listing("2", "20250103")])
+
+            count = materialise_postcode_changes(store, "2000", "20250103")
+
+            assert count == 2
+            assert kinds(load_changes(store, "20250103")) == [
+                ("1", ChangeKind.REMOVED),
+                ("2", ChangeKind.ADDED),
+            ]
+            assert load_changes(store, "20250103")[0].old_date == "20250101"
+
+    def test_diff_dates_incremental_snapshot_reports_no_removals(self, tmp_path):
+        """Listings an incremental crawl never reached are not reported as removed"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_snapshot(
+                store, [make_listing("1", "20250101"), make_listing("2", "20250101")]
+            )
+            store_snapshot(
+                store,
+                [
+                    make_listing("2", "20250102", price_text="$480,000"),
+                    make_listing("3", "20250102"),
+                ],
+            )
+            store.record_snapshot("20250102", "2000", is_full=False)
+
+            changes = list(diff_dates(store, "20250101", "20250102"))
+
+        assert kinds(changes) == [
+            ("2", ChangeKind.PRICE_CHANGED),
+            ("3", ChangeKind.ADDED),
+        ]
+
+    def test_diff_dates_after_incremental_snapshot_skips_known_listings(self, tmp_path):
+        """A full crawl after an incremental one does not re-add older listings"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store_snapshot(
+                store, [make_listing("1", "20250101"), make_listing("2", "20250101")]
+            )
+            store_snapshot(store, [make_listing("2", "20250102")])
+            store.record_snapshot("20250102", "2000", is_full=False)
+            store_snapshot(
+                store, [make_listing("1", "20250103"), make_listing("3", "20250103")]
+            )
+
+            changes = list(diff_dates(store, "20250102", "20250103"))
+
+        assert kinds(changes) == [
+            ("2", ChangeKind.REMOVED),
+            ("3", ChangeKind.ADDED),
+        ]
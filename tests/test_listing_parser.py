@@ -0,0 +1,118 @@
+from listing_parser import (
+    PageFile,
+    extract_listings,
+    parse_list_date,
+    parse_page_filename,
+    parse_price,
+)
+
+CARD_TEMPLATE = """
+<article class="results-card residential-card" data-testid="ResidentialCard">
+  <a href="/property-house-nsw-newtown-{listing_id}" class="details-link"></a>
+  <h2 class="residential-card__address-heading">
+    <a href="/property-house-nsw-newtown-{listing_id}"><span>{address}</span></a>
+  </h2>
+  <div class="residential-card__price"><span class="property-price ">{price}</span></div>
+  <ul class="residential-card__primary">
+    <li aria-label="3 bedrooms"><svg><path d="M0"/></svg><p>3</p></li>
+    <li aria-label="2 bathrooms"><p>2</p></li>
+    <li aria-label="1 car space"><p>1</p></li>
+  </ul>
+  <span class="residential-card__property-type">House</span>
+  <span class="residential-card__status-label">{status}</span>
+  <span>Added 2 days ago</span>
+</article>
+"""
+
+
+def write_search_page(directory, name: str, cards: str) -> str:
+    """Write a search page wrapping the given cards and return its path"""
+    path = directory / name
+    path.write_text(
+        f"<html><body><script>var x = '<div>';</script>{cards}</body></html>"
+    )
+    return str(path)
+
+
+class TestParseHelpers:
+    """Test suite for the pure parsing helpers"""
+
+    def test_parse_page_filename_page_file_returns_parts(self):
+        """A saved page filename is split into date, postcode and page"""
+        assert parse_page_filename("html_pages/20250101_2042_3.html") == PageFile(
+            "20250101", "2042", 3
+        )
+
+    def test_parse_page_filename_completed_file_returns_none(self):
+        """Completed marker files are not treated as search pages"""
+        assert parse_page_filename("20250101_2042_completed.html") is None
+
+    def test_parse_price_formats_return_dollars(self):
+        """Plain, ranged and suffixed prices parse to whole dollars"""
+        assert parse_price("$1,250,000") == 1250000
+        assert parse_price("$900,000 - $950,000") == 900000
+        assert parse_price("Offers over $1.2m") == 1200000
+        assert parse_price("$850k") == 850000
+
+    def test_parse_price_no_amount_returns_none(self):
+        """Price text without a dollar figure has no parsed price"""
+        assert parse_price("Contact Agent") is None
+
+    def test_parse_list_date_relative_text_returns_iso_date(self):
+        """Relative 'Added' text is resolved against the scrape date"""
+        assert parse_list_date("Added 2 days ago", "20250310") == "2025-03-08"
+        assert parse_list_date("Added 05/03/2025", "20250310") == "2025-03-05"
+
+
+class TestExtractListings:
+    """Test suite for extracting listing cards from saved pages"""
+
+    def test_extract_listings_cards_returns_typed_records(self, tmp_path):
+        """Each card becomes a Listing with parsed fields and its page position"""
+        cards = CARD_TEMPLATE.format(
+            listing_id="143000001",
+            address="1 King St, Newtown",
+            price="$1,100,000",
+            status="New",
+        ) + CARD_TEMPLATE.format(
+            listing_id="143000002",
+            address="2 King St, Newtown",
+            price="Auction",
+            status="Under contract",
+        )
+        filename = write_search_page(tmp_path, "20250310_2042_2.html", cards)
+
+        first, second = extract_listings(filename)
+
+        assert first.listing_id == "143000001"
+        assert first.address == "1 King St, Newtown"
+        assert first.price == 1100000
+        assert (first.bedrooms, first.bathrooms, first.parking) == (3, 2, 1)
+        assert first.property_type == "House"
+        assert second.status == "Under contract"
+        assert first.list_date == "2025-03-08"
+        assert (first.postcode, first.page_num, first.position) == ("2042", 2, 1)
+        assert second.price is None
+        assert second.position == 2
+
+    def test_extract_listings_small_chunks_match_whole_file(self, tmp_path):
+        """Feeding the parser in tiny chunks gives the same listings"""
+        cards = CARD_TEMPLATE.format(
+            listing_id="143000001",
+            address="1 King St, Newtown",
+            price="$1,100,000",
+            status="",
+        )
+        filename = write_search_page(tmp_path, "20250310_2042_1.html", cards)
+
+        assert extract_listings(filename, chunk_size=7) == extract_listings(filename)
+
+    def test_extract_listings_truncated_card_is_dropped(self, tmp_path):
+        """A card cut off by a half-saved file does not produce a listing"""
+        card = CARD_TEMPLATE.format(
+            listing_id="143000001", address="1 King St, Newtown", price="$1", status=""
+        )
+        path = tmp_path / "20250310_2042_1.html"
+        path.write_text(card[: len(card) // 2])
+
+        assert extract_listings(str(path)) == []
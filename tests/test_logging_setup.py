@@ -0,0 +1,72 @@
+import io
+import logging
+
+import pytest
+
+from logging_setup import AsyncLogging, RingBufferHandler, dump_recent_events
+
+
+@pytest.fixture
+def async_logging():
+    stream = io.StringIO()
+    async_logging = AsyncLogging(worker_id=2, capacity=3, stream=stream)
+    async_logging.install()
+    yield async_logging, stream
+    async_logging.close()
+
+
+def read_lines(path) -> list:
+    with open(path, encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+class TestRingBufferHandler:
+    """Test suite for the in-memory buffer of recent records"""
+
+    def test_ring_buffer_dump_keeps_most_recent_records(self, tmp_path):
+        """Older records fall out once the buffer is full, and a dump empties it"""
+        logger = logging.getLogger("test_ring_buffer")
+        handler = RingBufferHandler(capacity=2)
+        logger.addHandler(handler)
+        try:
+            for step in range(4):
+                logger.warning("step %d", step)
+        finally:
+            logger.removeHandler(handler)
+
+        assert handler.dump(str(tmp_path / "debug.log")) == 2
+        lines = read_lines(tmp_path / "debug.log")
+        assert [line.split(": ", 1)[1] for line in lines] == ["step 2", "step 3"]
+        assert handler.dump(str(tmp_path / "empty.log")) == 0
+
+
+class TestAsyncLogging:
+    """Test suite for the queued, ring-buffered logging mode"""
+
+    def test_async_logging_info_written_as_logfmt(self, async_logging):
+        """INFO lines reach the stream once flushed, DEBUG lines do not"""
+        installed, stream = async_logging
+        logging.debug("moving to %d", 10)
+        logging.info('saved "%s"', "page.html")
+        installed.close()
+
+        [line] = stream.getvalue().splitlines()
+        assert " level=info src=test_logging_setup." in line
+        assert line.endswith(' worker=2 msg="saved \\"page.html\\""')
+
+    def test_dump_recent_events_writes_debug_records(self, async_logging, tmp_path):
+        """The failure dump holds the DEBUG records the stream never saw"""
+        logging.debug("moving to %d", 10)
+
+        dump_recent_events(str(tmp_path / "debug.log"))
+
+        assert read_lines(tmp_path / "debug.log")[0].endswith(
+            "DEBUG test_logging_setup.test_dump_recent_events_writes_debug_records:"
+            " moving to 10"
+        )
+
+    def test_dump_recent_events_without_buffer_writes_nothing(self, tmp_path):
+        """Outside the async mode there is nothing to dump"""
+        dump_recent_events(str(tmp_path / "debug.log"))
+
+        assert not (tmp_path / "debug.log").exists()
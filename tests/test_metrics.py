@@ -0,0 +1,93 @@
+import pytest
+
+from metrics import (
+    MetricsRecorder,
+    Phase,
+    Span,
+    load_spans,
+    percentile,
+    summarise_spans,
+)
+
+
+def make_span(phase: Phase, duration: float, started_at: float = 0.0, parent=None):
+    return Span(phase.value, "2000", 1, started_at, duration, "ok", parent)
+
+
+class TestMetricsRecorder:
+    """Test suite for span recording and the Prometheus export"""
+
+    def test_span_nested_span_inherits_postcode_and_page(self, tmp_path):
+        """Inner spans are attributed to the page of the span enclosing them"""
+        recorder = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+
+        with recorder.span(Phase.PAGE, "2000", 3):
+            with recorder.span(Phase.NAVIGATE):
+                pass
+        recorder.close()
+
+        navigate, page = load_spans(str(tmp_path / "metrics.jsonl"))
+        assert (navigate.phase, navigate.postcode, navigate.page_num) == (
+            "navigate",
+            "2000",
+            3,
+        )
+        assert navigate.parent == "page"
+        assert page.parent is None
+
+    def test_span_exception_records_error_outcome(self, tmp_path):
+        """A failing phase is written with its outcome and re-raised"""
+        recorder = MetricsRecorder(
+            str(tmp_path / "metrics.jsonl"), str(tmp_path / "scrape.prom")
+        )
+
+        with pytest.raises(TimeoutError):
+            with recorder.span(Phase.SAVE, "2000", 1):
+                raise TimeoutError
+        recorder.close()
+
+        [span] = load_spans(str(tmp_path / "metrics.jsonl"))
+        assert (span.outcome, span.error) == ("error", "TimeoutError")
+        assert (
+            'scrape_phase_seconds_count{phase="save",outcome="error"} 1'
+            in (tmp_path / "scrape.prom").read_text()
+        )
+
+
+class TestSummariseSpans:
+    """Test suite for the run report calculations"""
+
+    def test_percentile_nearest_rank(self):
+        """p50 and p95 use the nearest-rank definition"""
+        values = [float(n) for n in range(1, 21)]
+
+        assert (percentile(values, 0.5), percentile(values, 0.95)) == (10.0, 19.0)
+
+    def test_summarise_spans_nested_wait_counts_as_waiting(self):
+        """A page-load pause inside a navigation moves from work to waiting"""
+        spans = [
+            make_span(Phase.WAIT, 2.0, started_at=0.5, parent="navigate"),
+            make_span(Phase.NAVIGATE, 3.0, parent="page"),
+            make_span(Phase.SAVE, 1.0, started_at=3.0, parent="page"),
+            make_span(Phase.HUMAN_ACTIVITY, 5.0, started_at=4.0, parent="page"),
+            make_span(Phase.PAGE, 9.0),
+        ]
+
+        report = summarise_spans(spans)
+
+        assert (report.wait_seconds, report.work_seconds) == (7.0, 2.0)
+        assert report.pages == 1
+        assert report.pages_per_hour == 400.0
+        assert report.phases["navigate"].p95 == 3.0
+
+    def test_summarise_spans_resume_gap_left_out_of_wall_time(self):
+        """Hours between an interrupted run and its resume are not wall time"""
+        spans = [
+            make_span(Phase.PAGE, 10.0),
+            make_span(Phase.PAGE, 10.0, started_at=12.0),
+            make_span(Phase.PAGE, 10.0, started_at=3 * 3600.0),
+        ]
+
+        report = summarise_spans(spans)
+
+        assert report.wall_seconds == 32.0
@@ -0,0 +1,118 @@
+import hashlib
+import os
+
+from archive import list_archivable_pages
+from listing_store import LedgerEntry
+from page_archive import (
+    PageArchive,
+    iter_page_chunks,
+    page_exists,
+    train_dictionary,
+)
+
+# Hashed asset names compress poorly alone but repeat on every page
+BOILERPLATE = b"".join(
+    b'<script src="/assets/%s.js" async></script>\n'
+    % hashlib.sha256(b"%d" % i).hexdigest().encode()
+    for i in range(200)
+)
+
+
+def write_page(directory, name: str, body: bytes) -> str:
+    """Write a saved page made of shared boilerplate plus a unique body"""
+    path = directory / name
+    path.write_bytes(BOILERPLATE + body)
+    return str(path)
+
+
+class TestPageArchive:
+    """Test suite for the content-addressed page archive"""
+
+    def test_store_page_round_trips_page_body(self, tmp_path):
+        """A stored page reads back byte for byte"""
+        filename = write_page(tmp_path, "20250101_2000_1.html", b"ResidentialCard")
+
+        with PageArchive(str(tmp_path / "archive")) as archive:
+            archive.store_page(filename)
+
+            assert archive.read_page(("20250101", "2000", "1")) == BOILERPLATE + (
+                b"ResidentialCard"
+            )
+
+    def test_store_page_identical_days_share_one_blob(self, tmp_path):
+        """The same page body saved on two days is stored once"""
+        first = write_page(tmp_path, "20250101_2000_completed.html", b"no results")
+        second = write_page(tmp_path, "20250102_2000_completed.html", b"no results")
+
+        with PageArchive(str(tmp_path / "archive")) as archive:
+            archive.store_page(first)
+            archive.store_page(second)
+
+            stats = archive.stats()
+            assert (stats.pages, stats.blobs) == (2, 1)
+
+    def test_store_page_trained_dictionary_shrinks_blobs(self, tmp_path):
+        """Compressing against a dictionary of shared boilerplate stores fewer bytes"""
+        samples = [
+            write_page(tmp_path, f"20250101_2000_{n}.html", b"listing %d" % n)
+            for n in range(1, 5)
+        ]
+        target = write_page(tmp_path, "20250102_2000_1.html", b"listing new")
+
+        with PageArchive(str(tmp_path / "plain")) as plain:
+            plain.store_page(target)
+            plain_size = plain.stats().stored_bytes
+        with PageArchive(str(tmp_path / "trained")) as trained:
+            trained.set_dictionary(train_dictionary(samples))
+            trained.store_page(target)
+
+            assert trained.stats().stored_bytes < plain_size / 2
+            assert trained.read_page(("20250102", "2000", "1")).endswith(b"new")
+
+    def test_iter_page_chunks_removed_original_reads_from_archive(self, tmp_path):
+        """Readers see an archived page after its original file is deleted"""
+        filename = write_page(tmp_path, "20250101_2000_1.html", b"ResidentialCard")
+        archive_dir = str(tmp_path / "archive")
+        with PageArchive(archive_dir) as archive:
+            archive.store_page(filename)
+        os.remove(filename)
+
+        assert page_exists(filename, archive_dir)
+        assert b"".join(iter_page_chunks(filename, 64, archive_dir)).endswith(
+            b"ResidentialCard"
+        )
+        assert not page_exists(str(tmp_path / "20250101_2000_2.html"), archive_dir)
+
+
+class TestListArchivablePages:
+    """Test suite for choosing which saved pages to pack"""
+
+    def test_list_archivable_pages_only_ingested_pages(self, tmp_path):
+        """Pages not ingested, or changed since, stay out of the archive"""
+        names = ["20250101_2000_1.html", "20250101_2000_2.html", "20250101_2010_1.html"]
+        paths = [write_page(tmp_path, name, b"body") for name in names]
+        ingested = {}
+        for name, path in zip(names[:2], paths):
+            stat = os.stat(path)
+            ingested[name] = LedgerEntry(name, stat.st_size, stat.st_mtime_ns, "", 0)
+        with open(paths[1], "ab") as file:
+            file.write(b"more")
+        write_page(tmp_path, "20250102_2000_1.html", b"today")
+
+        assert list_archivable_pages(str(tmp_path), "20250102", ingested) == paths[:1]
+
+    def test_list_archivable_pages_packs_completed_markers(self, tmp_path, caplog):
+        """Completed markers are archived and not counted as waiting for ingestion"""
+        page = write_page(tmp_path, "20250101_2000_1.html", b"body")
+        marker = write_page(tmp_path, "20250101_2000_completed.html", b"")
+        stat = os.stat(page)
+        ingested = {
+            "20250101_2000_1.html": LedgerEntry(
+                "20250101_2000_1.html", stat.st_size, stat.st_mtime_ns, "", 0
+            )
+        }
+
+        pages = list_archivable_pages(str(tmp_path), "20250102", ingested)
+
+        assert pages == [page, marker]
+        assert "not ingested" not in caplog.text
@@ -0,0 +1,53 @@
+import os
+
+from page_archive import PageArchive
+from page_classifier import PageClass, classify_chunks, classify_file
+
+LISTINGS_PAGE = b"<html><article data-testid='ResidentialCard'></article></html>"
+NO_RESULTS_PAGE = b"<html><body><p>No exact matches found</p></body></html>"
+BLOCK_PAGE = b"<html><title>Pardon Our Interruption</title></html>"
+
+
+def classify(page: bytes, chunk_size: int = 1 << 16) -> PageClass:
+    chunks = [page[i : i + chunk_size] for i in range(0, len(page), chunk_size)]
+    return classify_chunks(chunks, len(page), page[-1024:])
+
+
+class TestClassifyChunks:
+    """Test suite for telling saved pages apart by their bytes and size"""
+
+    def test_classify_chunks_signatures_pick_class(self):
+        """Cards, a no-results message and a block page each have their class"""
+        assert classify(LISTINGS_PAGE) == PageClass.LISTINGS
+        assert classify(NO_RESULTS_PAGE) == PageClass.NO_RESULTS
+        assert classify(BLOCK_PAGE) == PageClass.ERROR
+
+    def test_classify_chunks_signature_split_across_chunks(self):
+        """A signature cut by a chunk boundary is still found"""
+        assert classify(NO_RESULTS_PAGE, chunk_size=7) == PageClass.NO_RESULTS
+
+    def test_classify_chunks_truncated_page_is_error(self):
+        """A page cut off before </html> was only partly saved, cards or not"""
+        assert classify(LISTINGS_PAGE[:-7]) == PageClass.ERROR
+
+    def test_classify_chunks_large_page_without_signatures_is_unknown(self):
+        """A whole page of unrecognised content is neither results nor an error"""
+        page = b"<html>" + b"<div>interstitial</div>" * 1000 + b"</html>"
+
+        assert classify(page) == PageClass.UNKNOWN
+        assert classify(page[:200] + b"</html>") == PageClass.ERROR
+
+    def test_classify_file_missing_page_is_error(self, tmp_path):
+        """A page that never landed on disk is an error"""
+        assert classify_file(str(tmp_path / "20250101_2000_1.html")) == PageClass.ERROR
+
+    def test_classify_file_archived_page_is_read_from_archive(self, tmp_path):
+        """A page packed into the archive keeps its class after the original goes"""
+        page = tmp_path / "20250101_2000_1.html"
+        page.write_bytes(NO_RESULTS_PAGE)
+        archive_dir = str(tmp_path / "archive")
+        with PageArchive(archive_dir) as archive:
+            archive.store_page(str(page))
+        os.remove(page)
+
+        assert classify_file(str(page), 16, archive_dir) == PageClass.NO_RESULTS
@@ -0,0 +1,25 @@
+from page_plan import ResultSummary, parse_result_summary
+
+
+class TestParseResultSummary:
+    """Test suite for reading the result count off a first search page"""
+
+    def test_parse_result_summary_range_split_across_chunks(self):
+        """The visible range is found even when a chunk boundary cuts through it"""
+        page = b"<div>x</div><h1>1-25 of 1,204 results</h1><p>Sydney</p>"
+        chunks = [page[i : i + 7] for i in range(0, len(page), 7)]
+
+        summary = parse_result_summary(chunks)
+
+        assert summary == ResultSummary(total_results=1204, page_size=25)
+        assert summary.planned_pages == 49
+
+    def test_parse_result_summary_embedded_state_fallback(self):
+        """Without the visible range, the embedded search state is used"""
+        page = b'<script>{"pageSize":25,"totalResultsCount":50}</script>'
+
+        assert parse_result_summary([page]).planned_pages == 2
+
+    def test_parse_result_summary_no_count_returns_none(self):
+        """Pages without any result count cannot be planned"""
+        assert parse_result_summary([b"<p>No results</p>"]) is None
@@ -0,0 +1,71 @@
+from page_scanner import (
+    chunks_contain_marker,
+    file_contains_marker,
+    files_containing_marker,
+)
+
+MARKER = b"ResidentialCard"
+
+
+def write_page(directory, name: str, content: bytes) -> str:
+    """Write a page into directory and return its path as a string"""
+    path = directory / name
+    path.write_bytes(content)
+    return str(path)
+
+
+class TestChunksContainMarker:
+    """Test suite for the streaming marker search"""
+
+    def test_chunks_contain_marker_marker_spans_boundary_returns_true(self):
+        """A marker split across two chunks is still found"""
+        chunks = [b"<div data-testid='Resident", b"ialCard'></div>"]
+
+        assert chunks_contain_marker(chunks, MARKER)
+
+    def test_chunks_contain_marker_marker_spans_many_chunks_returns_true(self):
+        """A marker split across several tiny chunks is still found"""
+        content = b"xx ResidentialCard yy"
+        chunks = [content[i : i + 3] for i in range(0, len(content), 3)]
+
+        assert chunks_contain_marker(chunks, MARKER)
+
+    def test_chunks_contain_marker_marker_absent_returns_false(self):
+        """Chunks that never contain the marker return False"""
+        chunks = [b"Residential", b"Cars are not here", b"Card"]
+
+        assert not chunks_contain_marker(chunks, MARKER)
+
+    def test_chunks_contain_marker_match_stops_reading(self):
+        """The search stops consuming chunks once the marker is found"""
+        consumed = []
+
+        def chunks():
+            for chunk in [b"ResidentialCard", b"never", b"read"]:
+                consumed.append(chunk)
+                yield chunk
+
+        assert chunks_contain_marker(chunks(), MARKER)
+        assert consumed == [b"ResidentialCard"]
+
+
+class TestFileContainsMarker:
+    """Test suite for file and batch marker detection"""
+
+    def test_file_contains_marker_small_chunk_size_finds_boundary_marker(
+        self, tmp_path
+    ):
+        """A marker straddling the read chunk size is found in a file"""
+        filename = write_page(tmp_path, "page.html", b"a" * 10 + MARKER + b"b" * 10)
+
+        assert file_contains_marker(filename, MARKER, chunk_size=16)
+
+    def test_files_containing_marker_batch_returns_result_per_file(self, tmp_path):
+        """Each file in a batch maps to its own result, missing files map to False"""
+        with_cards = write_page(tmp_path, "1.html", b"<div>ResidentialCard</div>")
+        without_cards = write_page(tmp_path, "2.html", b"<div>No results</div>")
+        missing = str(tmp_path / "3.html")
+
+        results = files_containing_marker([with_cards, without_cards, missing])
+
+        assert results == {with_cards: True, without_cards: False, missing: False}
@@ -0,0 +1,100 @@
+import dataclasses
+import os
+
+from listing_parser import extract_listings
+from page_classifier import PageClass, classify_file
+from page_plan import read_result_summary
+from page_slimmer import slim_filename, slim_page
+from synthetic_pages import render_search_page
+
+# Markup around and inside cards that no downstream step reads
+NOISE = (
+    "<style>.residential-card { color: red }</style>"
+    '<svg viewBox="0 0 24 24"><svg><path d="M0 0h24"/></svg></svg>'
+    '<img src="https://tracker.example/pixel.gif" width="1" height="1">'
+    "<!-- analytics -->"
+)
+
+
+def noisy_page(postcode: str, page_num: int, total_results: int) -> str:
+    page = render_search_page(postcode, page_num, total_results, padding_bytes=200_000)
+    return page.replace("<ul ", NOISE + "<ul ").replace("<body>", "<body>" + NOISE)
+
+
+def write_page(directory, content: str, name: str = "20250101_2000_1.html") -> str:
+    filename = os.path.join(directory, name)
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write(content)
+    return filename
+
+
+def listing_fields(filename: str):
+    return [
+        dataclasses.replace(listing, source_file="")
+        for listing in extract_listings(filename)
+    ]
+
+
+class TestSlimPage:
+    """Test suite for stripping saved pages down to their data-bearing parts"""
+
+    def test_slim_page_listings_unchanged(self, tmp_path):
+        """Every listing field parses the same from the slim page"""
+        filename = write_page(tmp_path, noisy_page("2000", 1, 60))
+        expected = listing_fields(filename)
+
+        slim_page(filename, chunk_size=1000)
+
+        assert len(expected) == 25
+        assert listing_fields(filename) == expected
+
+    def test_slim_page_result_summary_unchanged(self, tmp_path):
+        """The visible result range and the embedded search state both survive"""
+        visible = write_page(tmp_path, noisy_page("2000", 1, 60))
+        embedded = write_page(
+            tmp_path,
+            '<script src="/bundle.js"></script>'
+            '<script>window.ArgonautExchange={"pageSize":25,"totalResultsCount":60}'
+            "</script>",
+            "20250101_2010_1.html",
+        )
+
+        slim_page(visible)
+        slim_page(embedded)
+
+        assert read_result_summary(visible).planned_pages == 3
+        assert read_result_summary(embedded).planned_pages == 3
+        with open(embedded, encoding="utf-8") as file:
+            assert "bundle.js" not in file.read()
+
+    def test_slim_page_classification_unchanged(self, tmp_path):
+        """Pages with cards, empty pages and pages whose scripts name the marker"""
+        pages = {
+            "20250101_2000_1.html": noisy_page("2000", 1, 60),
+            "20250101_2000_4.html": noisy_page("2000", 4, 60),
+            "20250101_2000_5.html": "<html><script>load('ResidentialCard')</script></html>",
+        }
+        filenames = [write_page(tmp_path, page, name) for name, page in pages.items()]
+        expected = [classify_file(filename) for filename in filenames]
+
+        for filename in filenames:
+            slim_page(filename)
+
+        assert expected == [
+            PageClass.LISTINGS,
+            PageClass.NO_RESULTS,
+            PageClass.LISTINGS,
+        ]
+        assert [classify_file(filename) for filename in filenames] == expected
+
+    def test_slim_page_beside_keeps_original_and_is_ten_times_smaller(self, tmp_path):
+        """The slim copy is written next to the untouched original"""
+        content = noisy_page("2000", 1, 60)
+        filename = write_page(tmp_path, content)
+
+        slim_path = slim_page(filename, "beside")
+
+        assert slim_path == slim_filename(filename)
+        with open(filename, encoding="utf-8") as file:
+            assert file.read() == content
+        assert os.path.getsize(filename) > 10 * os.path.getsize(slim_path)
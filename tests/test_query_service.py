@@ -0,0 +1,171 @@
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+
+from listing_diff import materialise_postcode_changes
+from listing_parser import Listing
+from listing_store import LedgerEntry, ListingStore
+from query_service import QueryServer, QueryService
+
+
+def make_listing(
+    scrape_date: str, postcode: str, position: int, price, page_num: int = 1
+) -> Listing:
+    return Listing(
+        listing_id=f"{postcode}-{position}",
+        address=f"{position} King St, Sydney NSW {postcode}",
+        price_text=f"${price} per week" if price is not None else "Contact agent",
+        price=price,
+        bedrooms=2,
+        bathrooms=1,
+        parking=None,
+        property_type="Apartment",
+        status="",
+        list_date=None,
+        source_file="",
+        scrape_date=scrape_date,
+        postcode=postcode,
+        page_num=page_num,
+        position=position,
+    )
+
+
+def record_page(store: ListingStore, listings) -> None:
+    first = listings[0]
+    filename = f"{first.scrape_date}_{first.postcode}_{first.page_num}.html"
+    store.record_files([(LedgerEntry(filename, 0, 0, "", len(listings)), listings)])
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ListingStore(str(tmp_path / "listings.sqlite3")) as store:
+        record_page(store, [make_listing("20250101", "2000", i, 600) for i in range(3)])
+        record_page(store, [make_listing("20250101", "2042", 1, 500)])
+        record_page(
+            store,
+            [make_listing("20250102", "2000", i, p) for i, p in enumerate([650, None])],
+        )
+        yield store
+
+
+@pytest.fixture
+def server(store):
+    service = QueryService(store.path, connections=4, max_body=512)
+    server = QueryServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def get(server, target: str, headers=None):
+    """GET target, returning the response and its body decoded as JSON lines"""
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        connection.request("GET", target, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    return response, [json.loads(line) for line in body.splitlines()]
+
+
+class TestQueryService:
+    """Test suite for the local HTTP query service"""
+
+    def test_query_service_defaults_to_latest_date(self, server):
+        """Listings and summaries answer for the most recent scrape date"""
+        response, listings = get(server, "/listings?postcode=2000")
+        _, [summary] = get(server, "/summaries")
+
+        assert response.status == 200
+        assert [x["listing_id"] for x in listings] == ["2000-0", "2000-1"]
+        assert summary == {
+            "postcode": "2000",
+            "scrape_date": "20250102",
+            "listings": 2,
+            "priced": 1,
+            "median_price": 650,
+            "min_price": 650,
+            "max_price": 650,
+        }
+
+    def test_query_service_etag_revalidates_until_ingest(self, server, store):
+        """A matching If-None-Match gets 304 until new data is ingested"""
+        first, _ = get(server, "/changes?postcode=2000")
+        etag = first.getheader("ETag")
+
+        unchanged, body = get(server, "/changes?postcode=2000", {"If-None-Match": etag})
+        record_page(store, [make_listing("20250102", "2000", 5, 700, page_num=2)])
+        materialise_postcode_changes(store, "2000", "20250102")
+        changed, changes = get(
+            server, "/changes?postcode=2000", {"If-None-Match": etag}
+        )
+
+        assert (unchanged.status, body) == (304, [])
+        assert changed.status == 200
+        assert changed.getheader("ETag") != etag
+        assert {(x["listing_id"], x["kind"]) for x in changes} == {
+            ("2000-2", "removed"),
+            ("2000-5", "added"),
+            ("2000-0", "price_changed"),
+            ("2000-1", "price_changed"),
+        }
+
+    def test_query_service_large_reply_streamed_not_cached(self, server):
+        """Replies over the cache limit arrive chunked and complete"""
+        response, listings = get(server, "/listings?date=20250101")
+        _, cached = get(server, "/summaries?date=20250101")
+
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        assert len(listings) == 4
+        assert [x["postcode"] for x in cached] == ["2000", "2042"]
+        assert len(server.service.cache) == 1
+
+    def test_query_service_bad_requests_rejected(self, server):
+        """Unknown routes and malformed parameters are client errors"""
+        missing, _ = get(server, "/prices")
+        bad, [error] = get(server, "/listings?postcode=20000")
+
+        assert missing.status == 404
+        assert bad.status == 400
+        assert "postcode" in error["error"]
+
+    def test_query_service_many_concurrent_clients(self, server):
+        """More clients than store connections are all answered"""
+        with ThreadPoolExecutor(max_workers=64) as pool:
+            results = list(
+                pool.map(lambda _: get(server, "/listings?date=20250101"), range(200))
+            )
+
+        assert {response.status for response, _ in results} == {200}
+        assert {len(listings) for _, listings in results} == {4}
+
+    def test_query_service_unread_stream_frees_connection(self, store):
+        """A large reply nobody reads yet leaves the only connection free"""
+        service = QueryService(store.path, connections=1, max_body=64)
+        try:
+            streamed = service.respond("/listings", {"date": "20250101"})
+            cached = service.respond("/summaries", {"postcode": "2042"})
+
+            assert b"".join(streamed.chunks).count(b"\n") == 4
+            assert cached.status == HTTPStatus.OK
+        finally:
+            service.close()
+
+    def test_query_service_busy_connections_answer_503(self, store):
+        """A request that waits too long for a connection is turned away"""
+        service = QueryService(store.path, connections=1, connection_timeout=0.05)
+        try:
+            with service._connection():
+                response = service.respond("/summaries", {})
+        finally:
+            service.close()
+
+        assert response.status == HTTPStatus.SERVICE_UNAVAILABLE
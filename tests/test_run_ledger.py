@@ -0,0 +1,115 @@
+from run_ledger import PageState, RunLedger, latest_run_date
+
+
+def touch(directory, name: str) -> None:
+    (directory / name).write_text("")
+
+
+class TestRunLedger:
+    """Test suite for the per-run postcode and page ledger"""
+
+    def test_run_ledger_scan_marks_completed_and_saved_pages(self, tmp_path):
+        """Saved pages and completed markers for the run date are picked up"""
+        touch(tmp_path, "20250101_2000_1.html")
+        touch(tmp_path, "20250101_2000_completed.html")
+        touch(tmp_path, "20250101_2010_1.html")
+        touch(tmp_path, "20241231_2020_completed.html")
+
+        ledger = RunLedger("20250101", str(tmp_path))
+
+        assert ledger.remaining_postcodes(["2000", "2010", "2020"]) == ["2010", "2020"]
+        assert ledger.page_state("2010", 1) == PageState.SAVED
+        assert ledger.page_state("2010", 2) == PageState.PENDING
+
+    def test_run_ledger_events_survive_reload(self, tmp_path):
+        """Recorded page states and timings are restored from the event log"""
+        ledger = RunLedger("20250101", str(tmp_path))
+        ledger.record_page("2000", 1, PageState.FAILED, started_at=10.0)
+        ledger.mark_postcode_completed("2010")
+
+        reloaded = RunLedger("20250101", str(tmp_path))
+
+        [record] = reloaded.pages("2000")
+        assert record.state == PageState.FAILED
+        assert record.started_at == 10.0
+        assert reloaded.is_postcode_completed("2010")
+
+    def test_run_ledger_plan_and_actual_pages_survive_reload(self, tmp_path):
+        """Planned and actual page counts are restored from the event log"""
+        ledger = RunLedger("20250101", str(tmp_path))
+        ledger.record_plan("2000", planned_pages=3, total_results=70)
+        ledger.mark_postcode_completed("2000", pages=2)
+
+        reloaded = RunLedger("20250101", str(tmp_path))
+
+        assert reloaded.planned_pages("2000") == 3
+        assert reloaded.plan_accuracy(["2000"]) == {
+            "matched": 0,
+            "mismatched": 1,
+            "unplanned": 0,
+            "incremental": 0,
+        }
+
+    def test_run_ledger_retry_queue_drops_pages_saved_later(self, tmp_path):
+        """A queued page leaves the queue once a later fetch saves it"""
+        ledger = RunLedger("20250101", str(tmp_path))
+        for postcode in ("2000", "2010"):
+            ledger.record_page(postcode, 2, PageState.FAILED)
+            ledger.queue_retry(postcode, 2, "error")
+        ledger.record_page("2010", 2, PageState.SAVED)
+
+        reloaded = RunLedger("20250101", str(tmp_path))
+
+        assert reloaded.retry_postcodes() == ["2000"]
+
+    def test_run_ledger_retry_queue_gives_up_after_limit(self, tmp_path):
+        """A page that keeps coming back bad is no longer retried"""
+        ledger = RunLedger("20250101", str(tmp_path))
+        for _ in range(2):
+            ledger.record_page("2000", 1, PageState.FAILED)
+            ledger.queue_retry("2000", 1, "unknown")
+
+        assert ledger.retry_queue(max_attempts=3)[0].attempts == 2
+        assert ledger.retry_queue(max_attempts=2) == []
+
+    def test_run_ledger_postcode_given_up_at_limit_is_not_remaining(self, tmp_path):
+        """The last allowed bad fetch gives the postcode up, so the run can finish"""
+        ledger = RunLedger("20250101", str(tmp_path))
+        given_up = []
+        for _ in range(2):
+            ledger.record_page("2000", 1, PageState.FAILED)
+            given_up.append(ledger.queue_retry("2000", 1, "error", max_attempts=2))
+
+        reloaded = RunLedger("20250101", str(tmp_path))
+
+        assert given_up == [False, True]
+        assert reloaded.remaining_postcodes(["2000", "2010"]) == ["2010"]
+        assert reloaded.retry_postcodes() == []
+        assert reloaded.state_counts(["2000"])["given_up"] == 1
+
+    def test_resume_or_start_unfinished_run_is_resumed(self, tmp_path):
+        """An unfinished run from an earlier date is resumed instead of restarted"""
+        RunLedger("20000101", str(tmp_path)).record_page("2000", 1, PageState.SAVED)
+
+        ledger = RunLedger.resume_or_start(["2000"], str(tmp_path), today="20000102")
+
+        assert ledger.run_date == "20000101"
+
+    def test_resume_or_start_stale_run_is_abandoned(self, tmp_path):
+        """An unfinished run older than the resume limit is closed, not resumed"""
+        RunLedger("20000101", str(tmp_path)).record_page("2000", 1, PageState.SAVED)
+
+        ledger = RunLedger.resume_or_start(["2000"], str(tmp_path), today="20000301")
+
+        assert ledger.run_date == "20000301"
+        assert RunLedger("20000101", str(tmp_path)).finished
+
+    def test_resume_or_start_fully_completed_run_starts_new_run(self, tmp_path):
+        """A run with every postcode completed is closed and a new run begins"""
+        RunLedger("20000101", str(tmp_path)).mark_postcode_completed("2000")
+
+        ledger = RunLedger.resume_or_start(["2000"], str(tmp_path))
+
+        assert ledger.run_date != "20000101"
+        assert RunLedger("20000101", str(tmp_path)).finished
+        assert latest_run_date(str(tmp_path)) == "20000101"
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+import pytest
+
+import save_waiter
+from save_waiter import SaveTimeoutError, wait_for_saved_file
+
+
+def write_later(path, chunks, delay: float) -> threading.Thread:
+    """Write chunks to path from another thread, pausing delay before each one"""
+
+    def write():
+        for chunk in chunks:
+            time.sleep(delay)
+            with open(path, "ab") as file:
+                file.write(chunk)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watch_mode(request, monkeypatch):
+    """Run each test with inotify and with the polling fallback"""
+    if request.param == "polling":
+        monkeypatch.setattr(save_waiter, "open_directory_watch", lambda _: None)
+    return request.param
+
+
+class TestWaitForSavedFile:
+    """Test suite for the save-completion waiter"""
+
+    def test_wait_for_saved_file_growing_file_returns_final_size(
+        self, tmp_path, watch_mode
+    ):
+        """The waiter returns only once the file stops growing"""
+        path = tmp_path / "20250101_2000_1.html"
+        thread = write_later(path, [b"a" * 100] * 3, delay=0.05)
+
+        size = wait_for_saved_file(str(path), timeout=5, settle_time=0.2)
+        thread.join()
+
+        assert size == 300
+
+    def test_wait_for_saved_file_fast_save_returns_before_timeout(
+        self, tmp_path, watch_mode
+    ):
+        """A file that is already complete costs only the settle time"""
+        path = tmp_path / "20250101_2000_1.html"
+        path.write_bytes(b"<html></html>")
+
+        started = time.monotonic()
+        wait_for_saved_file(str(path), timeout=5, settle_time=0.1)
+
+        assert time.monotonic() - started < 1
+
+    def test_wait_for_saved_file_renamed_into_place_is_detected(
+        self, tmp_path, watch_mode
+    ):
+        """Browsers write a partial file and rename it to the target"""
+        path = tmp_path / "20250101_2000_1.html"
+        partial = tmp_path / "20250101_2000_1.html.crdownload"
+        partial.write_bytes(b"<html></html>")
+        timer = threading.Timer(0.1, os.replace, (partial, path))
+        timer.start()
+
+        assert wait_for_saved_file(str(path), timeout=5, settle_time=0.1) == 13
+        timer.join()
+
+    def test_wait_for_saved_file_missing_file_raises_timeout(
+        self, tmp_path, watch_mode
+    ):
+        """A save that never lands raises instead of looking like an empty page"""
+        with pytest.raises(SaveTimeoutError, match="never appeared"):
+            wait_for_saved_file(str(tmp_path / "missing.html"), timeout=0.3)
@@ -0,0 +1,123 @@
+import math
+
+from ingest import ingest_postcode
+from listing_store import ListingStore
+from scheduler import (
+    PostcodeHistory,
+    build_plan,
+    load_history,
+    load_or_build_plan,
+    read_plan,
+    schedule_filename,
+)
+from synthetic_pages import write_corpus
+
+RUN_DATE = "20250110"
+
+
+def make_history(
+    postcode: str,
+    pages: int = 2,
+    changes: int = 0,
+    last_date: str = "20250109",
+    last_full_date: str = "20250105",
+) -> PostcodeHistory:
+    return PostcodeHistory(
+        postcode,
+        full_pages=[pages],
+        incremental_pages=[],
+        changes=changes,
+        first_date="20250101",
+        last_date=last_date,
+        last_full_date=last_full_date,
+    )
+
+
+class TestBuildPlan:
+    """Test suite for prioritising postcodes within a run budget"""
+
+    def test_build_plan_orders_by_churn_per_page_within_budget(self):
+        """Busy postcodes come first and quiet ones are deferred past the budget"""
+        history = {
+            "2000": make_history("2000", pages=4, changes=80),
+            "2010": make_history("2010", pages=1, changes=40),
+            "2020": make_history("2020", pages=4, changes=8),
+        }
+
+        plan = build_plan(list(history), history, RUN_DATE, budget_pages=6)
+
+        assert plan.postcodes == ["2010", "2000"]
+        assert plan.deferred == ["2020"]
+        assert plan.expected_pages == 5
+
+    def test_build_plan_mandatory_postcodes_precede_churn(self):
+        """New, stale and full-crawl-due postcodes are planned before busy ones"""
+        history = {
+            "2000": make_history("2000", changes=800),
+            "2010": make_history("2010", last_full_date="20250101"),
+            "2020": make_history("2020", last_date="20250101"),
+        }
+
+        plan = build_plan(["2000", "2010", "2020", "2030"], history, RUN_DATE)
+
+        assert [(e.postcode, e.reason) for e in plan.entries] == [
+            ("2010", "full_crawl_due"),
+            ("2020", "stale"),
+            ("2030", "new"),
+            ("2000", "churn"),
+        ]
+        assert plan.entry("2010").full_crawl
+        assert not plan.entry("2020").full_crawl
+
+    def test_build_plan_unchanged_postcode_waits_until_stale(self):
+        """A postcode with no recorded changes is skipped until it goes stale"""
+        history = {"2000": make_history("2000", changes=0)}
+
+        plan = build_plan(["2000"], history, RUN_DATE)
+
+        assert plan.entries == []
+        assert plan.deferred == ["2000"]
+
+
+class TestSchedulePersistence:
+    """Test suite for history loading and the written plan"""
+
+    def test_load_history_counts_pages_per_crawl(self, tmp_path):
+        """Page counts and crawl dates come from the listing store"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            for scrape_date, results in (("20250101", 60), ("20250102", 30)):
+                write_corpus(str(tmp_path), scrape_date, {"2000": results})
+                ingest_postcode(store, scrape_date, "2000", str(tmp_path))
+            store.record_snapshot("20250102", "2000", is_full=False)
+
+            history = load_history(store, RUN_DATE)["2000"]
+
+        assert (history.full_pages, history.incremental_pages) == ([3], [2])
+        assert (history.last_date, history.last_full_date) == ("20250102", "20250101")
+
+    def test_load_history_empty_crawl_still_dates_postcode(self, tmp_path):
+        """A postcode whose crawls found no listings is not new on every plan"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            store.record_snapshot("20250108", "2999", is_full=True)
+
+            history = load_history(store, RUN_DATE)["2999"]
+            plan = build_plan(["2999"], {"2999": history}, RUN_DATE)
+
+        assert (history.last_date, history.full_pages) == ("20250108", [1])
+        assert plan.deferred == ["2999"]
+
+    def test_load_or_build_plan_resumes_the_written_plan(self, tmp_path):
+        """A resumed run follows the plan written when it started"""
+        with ListingStore(str(tmp_path / "store.sqlite3")) as store:
+            first = load_or_build_plan(
+                ["2000", "2010"], store, RUN_DATE, output_dir=str(tmp_path)
+            )
+            resumed = load_or_build_plan(
+                ["2000"], store, RUN_DATE, output_dir=str(tmp_path)
+            )
+
+        assert resumed == first
+        assert resumed.postcodes == ["2000", "2010"]
+        assert math.isinf(
+            read_plan(schedule_filename(RUN_DATE, str(tmp_path))).entries[0].priority
+        )
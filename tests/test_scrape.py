@@ -0,0 +1,259 @@
+import os
+from typing import Optional
+
+import pytest
+
+import scrape
+from browser_controller import BrowserController, InstrumentedBrowserController
+from clock import SystemClock, VirtualClock, install_clock
+from incremental import IncrementalBaseline
+from logging_setup import AsyncLogging
+from metrics import MetricsRecorder, install_recorder, load_spans
+from run_ledger import PageState, RunLedger
+from synthetic_pages import SyntheticBrowserController
+
+LISTING_PAGE = "<html><article data-testid='ResidentialCard'></article></html>"
+EMPTY_PAGE = "<html><p>No exact matches found</p></html>"
+
+
+class PagedBrowserController(BrowserController):
+    """Controller that saves listing pages until last_page, then an empty page.
+
+    With total_results, page 1 also shows a "1-25 of N results" summary.
+    """
+
+    def __init__(self, last_page: int, total_results: Optional[int] = None):
+        self.last_page = last_page
+        self.total_results = total_results
+        self.current_url = ""
+        self.saved = []
+
+    def open_browser(self) -> None:
+        pass
+
+    def perform_initial_setup(self) -> None:
+        pass
+
+    def close_browser(self) -> None:
+        pass
+
+    def navigate_to(self, url: str) -> None:
+        self.current_url = url
+
+    def save_page(self, filepath: str) -> None:
+        page_num = int(self.current_url.split("/list-")[1].split("?")[0])
+        with open(filepath, "w") as file:
+            if page_num == 1 and self.total_results is not None:
+                file.write(f"<h1>1-25 of {self.total_results} results</h1>")
+            file.write(LISTING_PAGE if page_num <= self.last_page else EMPTY_PAGE)
+        self.saved.append(page_num)
+
+    def perform_human_like_activity(self) -> None:
+        pass
+
+
+class FailingSaveBrowserController(PagedBrowserController):
+    """Controller whose save always fails"""
+
+    def save_page(self, filepath: str) -> None:
+        raise OSError("No space left on device")
+
+
+class FlakyBrowserController(PagedBrowserController):
+    """Controller whose first save of error_page is a block page"""
+
+    def __init__(self, last_page: int, error_page: int):
+        super().__init__(last_page)
+        self.error_page = error_page
+
+    def save_page(self, filepath: str) -> None:
+        super().save_page(filepath)
+        if self.saved.count(self.error_page) == 1 and self.saved[-1] == self.error_page:
+            with open(filepath, "w", encoding="utf-8") as file:
+                file.write("<html><title>Access Denied</title></html>")
+
+
+class FailingLaunchBrowserController(PagedBrowserController):
+    """Controller whose first launch fails"""
+
+    def __init__(self, last_page: int):
+        super().__init__(last_page)
+        self.launches = 0
+
+    def open_browser(self) -> None:
+        self.launches += 1
+        if self.launches == 1:
+            raise RuntimeError("browser did not start")
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    """Temporary directory the run ledger, and so the scrape, writes into"""
+    return tmp_path
+
+
+class TestScrapeAllPages:
+    """Test suite for the paging loop of a single postcode"""
+
+    def test_scrape_all_pages_empty_page_completes_postcode(self, output_dir):
+        """Paging stops at the first page without listings, which becomes the marker"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = PagedBrowserController(last_page=2)
+
+        scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert controller.saved == [1, 2, 3]
+        assert ledger.is_postcode_completed("2000")
+        assert ledger.page_state("2000", 3) == PageState.STOPPED
+        assert os.path.exists(output_dir / "20250101_2000_completed.html")
+
+    def test_scrape_all_pages_resume_skips_saved_pages(self, output_dir):
+        """Pages saved earlier in the run are not fetched again"""
+        for page_num in (1, 2):
+            (output_dir / f"20250101_2000_{page_num}.html").write_text(LISTING_PAGE)
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = PagedBrowserController(last_page=3)
+
+        scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert controller.saved == [3, 4]
+
+    def test_scrape_all_pages_save_error_records_failed_page(self, output_dir):
+        """A page whose save raises is recorded as failed and the error propagates"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = FailingSaveBrowserController(last_page=1)
+
+        with pytest.raises(OSError):
+            scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert ledger.page_state("2000", 1) == PageState.FAILED
+        assert not ledger.is_postcode_completed("2000")
+
+    def test_scrape_all_pages_error_page_queued_for_retry(self, output_dir):
+        """A block page leaves the postcode unfinished instead of completing it"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = FlakyBrowserController(last_page=3, error_page=2)
+
+        scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert controller.saved == [1, 2]
+        assert not ledger.is_postcode_completed("2000")
+        assert ledger.retry_postcodes() == ["2000"]
+
+    def test_retry_queued_pages_resumes_at_queued_page(self, output_dir):
+        """The retry pass fetches the queued page and the rest, not earlier pages"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = FlakyBrowserController(last_page=3, error_page=2)
+        scrape.scrape_all_pages("2000", controller, ledger)
+        install_clock(VirtualClock())
+        try:
+            completed = scrape.retry_queued_pages(controller, ledger)
+        finally:
+            install_clock(SystemClock())
+
+        assert completed == ["2000"]
+        assert controller.saved == [1, 2, 2, 3, 4]
+        assert ledger.retry_postcodes() == []
+
+    def test_retry_queued_pages_failed_launch_keeps_postcode_queued(self, output_dir):
+        """A launch failure skips that postcode only, which stays queued"""
+        ledger = RunLedger("20250101", str(output_dir))
+        for postcode in ("2000", "2010"):
+            ledger.record_page(postcode, 1, PageState.FAILED)
+            ledger.queue_retry(postcode, 1, "error")
+        controller = FailingLaunchBrowserController(last_page=1)
+        install_clock(VirtualClock())
+        try:
+            completed = scrape.retry_queued_pages(controller, ledger)
+        finally:
+            install_clock(SystemClock())
+
+        assert completed == ["2010"]
+        assert ledger.retry_postcodes() == ["2000"]
+
+    def test_scrape_all_pages_planned_pages_skip_empty_page(self, output_dir):
+        """With a result count on page 1, the terminal empty page is never loaded"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = PagedBrowserController(last_page=2, total_results=45)
+
+        scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert controller.saved == [1, 2]
+        assert ledger.is_postcode_completed("2000")
+        assert ledger.plan_accuracy(["2000"])["matched"] == 1
+        assert os.path.exists(output_dir / "20250101_2000_completed.html")
+
+    def test_scrape_all_pages_overstated_count_falls_back_to_check_stop(
+        self, output_dir
+    ):
+        """A planned page that turns out empty still stops the postcode"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = PagedBrowserController(last_page=2, total_results=60)
+
+        scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert controller.saved == [1, 2, 3]
+        assert ledger.page_state("2000", 3) == PageState.STOPPED
+        assert ledger.plan_accuracy(["2000"])["mismatched"] == 1
+
+    def test_scrape_all_pages_records_spans_per_page(self, output_dir):
+        """Each page and each controller call is timed against its page"""
+        ledger = RunLedger("20250101", str(output_dir))
+        controller = InstrumentedBrowserController(PagedBrowserController(last_page=1))
+        recorder = MetricsRecorder(str(output_dir / "metrics.jsonl"))
+        install_recorder(recorder)
+        try:
+            scrape.scrape_all_pages("2000", controller, ledger)
+        finally:
+            install_recorder(None)
+            recorder.close()
+
+        spans = load_spans(str(output_dir / "metrics.jsonl"))
+        assert [(s.phase, s.page_num) for s in spans if s.parent == "page"] == [
+            ("navigate", 1),
+            ("save", 1),
+            ("human_activity", 1),
+            ("check_stop", 1),
+            ("navigate", 2),
+            ("save", 2),
+            ("human_activity", 2),
+            ("check_stop", 2),
+        ]
+        assert {s.postcode for s in spans} == {"2000"}
+
+    def test_scrape_all_pages_incremental_stops_after_known_pages(self, output_dir):
+        """Paging stops once known pages cover the overlap margin"""
+        ledger = RunLedger("20250102", str(output_dir))
+        controller = SyntheticBrowserController({"2000": 200})
+        # Yesterday's crawl knew everything but today's ten newest listings
+        known_ids = frozenset(f"2000{n:05d}" for n in range(11, 201))
+        baseline = IncrementalBaseline("20250101", known_ids, overlap_pages=1)
+
+        scrape.scrape_all_pages("2000", controller, ledger, baseline)
+
+        assert controller.navigations == 3
+        assert ledger.is_postcode_completed("2000")
+        assert ledger.is_incremental("2000")
+        assert ledger.plan_accuracy(["2000"])["incremental"] == 1
+
+
+class TestScrapeRealestatePostcode:
+    """Test suite for scraping one postcode end to end"""
+
+    def test_scrape_realestate_postcode_failure_dumps_recent_events(self, output_dir):
+        """A failed postcode leaves the DEBUG lines leading up to it on disk"""
+        ledger = RunLedger("20250101", str(output_dir))
+        async_logging = AsyncLogging()
+        async_logging.install()
+        install_clock(VirtualClock())
+        try:
+            with pytest.raises(OSError):
+                scrape.scrape_realestate_postcode(
+                    "2000", FailingSaveBrowserController(last_page=1), ledger
+                )
+        finally:
+            install_clock(SystemClock())
+            async_logging.close()
+
+        dump = (output_dir / "20250101_2000_debug.log").read_text()
+        assert "No space left on device" in dump
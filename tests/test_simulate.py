@@ -0,0 +1,121 @@
+import os
+import time
+
+import pytest
+
+import clock
+from clock import SystemClock, VirtualClock, install_clock
+from page_classifier import PageClass, classify_file
+from replay_controller import PhaseTimings, ReplayBrowserController
+from simulate import simulate_run
+from synthetic_pages import write_corpus
+
+RECORDED_DATE = "20250101"
+
+
+@pytest.fixture
+def virtual_clock():
+    virtual_clock = VirtualClock(start=1_000.0)
+    install_clock(virtual_clock)
+    yield virtual_clock
+    install_clock(SystemClock())
+
+
+def count_saved_pages(directory) -> int:
+    return sum(
+        1
+        for name in os.listdir(directory)
+        if name.endswith(".html") and "completed" not in name
+    )
+
+
+class TestVirtualClock:
+    """Test suite for the virtual clock"""
+
+    def test_virtual_clock_sleep_advances_without_waiting(self, virtual_clock):
+        """A virtual hour of sleeps returns at once and moves time forward"""
+        started = time.perf_counter()
+        clock.sleep(3_600)
+        real_seconds = time.perf_counter() - started
+
+        assert real_seconds < 1
+        assert (clock.now(), clock.monotonic()) == (4_600.0, 3_600.0)
+        assert virtual_clock.slept == 3_600
+
+    def test_virtual_clock_advance_counts_elapsed_not_slept(self):
+        """Explicit advances add to elapsed time but not to time slept"""
+        virtual_clock = VirtualClock(start=0.0)
+
+        virtual_clock.advance(5)
+        virtual_clock.sleep(-1)
+
+        assert (virtual_clock.elapsed, virtual_clock.slept) == (5, 0)
+
+
+class TestReplayBrowserController:
+    """Test suite for replaying recorded pages"""
+
+    def test_replay_save_page_serves_recorded_page(self, tmp_path, virtual_clock):
+        """A recorded postcode's page is replayed byte for byte"""
+        recorded = write_corpus(str(tmp_path / "recorded"), RECORDED_DATE, {"2000": 30})
+        controller = ReplayBrowserController(str(tmp_path / "recorded"), RECORDED_DATE)
+        target = tmp_path / "page.html"
+
+        controller.navigate_to("https://www.realestate.com.au/rent/in-2000/list-2")
+        controller.save_page(str(target))
+
+        with open(recorded[1], "rb") as file:
+            assert target.read_bytes() == file.read()
+
+    def test_replay_save_page_generates_unrecorded_postcode(
+        self, tmp_path, virtual_clock
+    ):
+        """Postcodes missing from the recording get a generated page"""
+        controller = ReplayBrowserController(default_results=10)
+        target = tmp_path / "page.html"
+
+        controller.navigate_to("https://www.realestate.com.au/rent/in-2050/list-1")
+        controller.save_page(str(target))
+
+        assert "1-10 of 10 results" in target.read_text()
+
+    def test_replay_save_page_past_last_recorded_page_is_no_results(
+        self, tmp_path, virtual_clock
+    ):
+        """A page past the recording is a whole no-results page, not the stub marker"""
+        recorded_dir = tmp_path / "recorded"
+        write_corpus(str(recorded_dir), RECORDED_DATE, {"2000": 30})
+        (recorded_dir / f"{RECORDED_DATE}_2000_completed.html").write_text("stub")
+        controller = ReplayBrowserController(str(recorded_dir), RECORDED_DATE)
+        target = tmp_path / f"{RECORDED_DATE}_2000_3.html"
+
+        controller.navigate_to("https://www.realestate.com.au/rent/in-2000/list-3")
+        controller.save_page(str(target))
+
+        assert classify_file(str(target)) == PageClass.NO_RESULTS
+
+
+class TestSimulateRun:
+    """Test suite for time-compressed end-to-end runs"""
+
+    def test_simulate_run_compresses_a_night_into_seconds(self, tmp_path):
+        """Simulated time covers every timed pause while the run takes real seconds"""
+        recorded_dir = str(tmp_path / "recorded")
+        write_corpus(recorded_dir, RECORDED_DATE, {"2000": 60}, include_empty_page=True)
+        output_dir = tmp_path / "output"
+        output_dir.mkdir()
+        postcodes = ["2000", "2001", "2002"]
+        controller = ReplayBrowserController(
+            recorded_dir, RECORDED_DATE, PhaseTimings(), default_results=30
+        )
+
+        started = time.perf_counter()
+        result = simulate_run(postcodes, controller, str(output_dir), max_pages=2)
+        real_seconds = time.perf_counter() - started
+
+        # 2000 has three recorded pages, the others two generated ones
+        assert result.report.pages == 7
+        assert count_saved_pages(output_dir) == 7
+        assert result.simulated_seconds > 7 * PhaseTimings().navigate
+        assert result.simulated_seconds > 100 * real_seconds
+        assert isinstance(clock.get_clock(), SystemClock)
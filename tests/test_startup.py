@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+from typing import Set, Tuple
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+# Modules that need an X display, or that only a browser controller needs
+BROWSER_MODULES = {"pyautogui", "brave_controller", "devtools_controller"}
+# Seconds each offline command may spend importing, several times what it
+# takes on a quiet machine; ingest pays for NumPy
+STARTUP_BUDGETS = {"status": 0.5, "report": 0.5, "ingest": 1.5}
+
+
+def run_headless(args, cwd) -> subprocess.CompletedProcess:
+    """Run python with no display and without the test run's pyautogui stand-in"""
+    env = {key: value for key, value in os.environ.items() if key != "DISPLAY"}
+    env["PYTHONPATH"] = SRC_DIR
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def parse_import_times(stderr: str) -> Tuple[Set[str], float]:
+    """Modules imported, and seconds spent on top-level imports, from -X importtime"""
+    modules = set()
+    seconds = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip())
+        # Nested imports are indented, and already counted in their importer
+        if not name.startswith("  "):
+            seconds += int(cumulative) / 1e6
+    return modules, seconds
+
+
+class TestStartup:
+    """Test suite for starting offline tools on a headless server"""
+
+    @pytest.mark.parametrize("command", sorted(STARTUP_BUDGETS))
+    def test_offline_command_starts_headless_within_budget(self, command, tmp_path):
+        """--help runs without a display, loads no browser module and stays in budget"""
+        result = run_headless(
+            [os.path.join(SRC_DIR, f"{command}.py"), "--help"], tmp_path
+        )
+        modules, seconds = parse_import_times(result.stderr)
+
+        assert result.returncode == 0, result.stderr
+        assert not BROWSER_MODULES & modules
+        assert seconds < STARTUP_BUDGETS[command]
+
+    def test_scrape_import_has_no_side_effects(self, tmp_path):
+        """Importing scrape neither needs pyautogui nor creates the output directory"""
+        result = run_headless(["-c", "import scrape"], tmp_path)
+        modules, _ = parse_import_times(result.stderr)
+
+        assert result.returncode == 0, result.stderr
+        assert "browser_controller" in modules
+        assert not BROWSER_MODULES & modules
+        assert os.listdir(tmp_path) == []
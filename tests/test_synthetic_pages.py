@@ -0,0 +1,34 @@
+import scrape
+from listing_parser import extract_listings
+from page_plan import read_result_summary
+from run_ledger import RunLedger
+from synthetic_pages import SyntheticBrowserController, write_corpus
+
+
+class TestSyntheticPages:
+    """Test suite for the synthetic page corpus and its fake controller"""
+
+    def test_write_corpus_pages_parse_like_real_pages(self, tmp_path):
+        """Generated pages hold the planned listings and a parseable result count"""
+        filenames = write_corpus(
+            str(tmp_path),
+            "20250101",
+            {"2000": 30},
+            padding_bytes=4096,
+            include_empty_page=True,
+        )
+
+        assert [len(extract_listings(f)) for f in filenames] == [25, 5, 0]
+        assert read_result_summary(filenames[0]).planned_pages == 2
+        first = extract_listings(filenames[0])[0]
+        assert (first.listing_id, first.postcode) == ("200000001", "2000")
+
+    def test_synthetic_controller_drives_scrape_to_completion(self, tmp_path):
+        """The scrape loop runs end to end against generated pages"""
+        ledger = RunLedger("20250101", str(tmp_path))
+        controller = SyntheticBrowserController({"2000": 60})
+
+        scrape.scrape_all_pages("2000", controller, ledger)
+
+        assert controller.navigations == 3
+        assert ledger.is_postcode_completed("2000")
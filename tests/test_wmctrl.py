@@ -7,7 +7,7 @@ import pytest
 # Add src directory to path so we can import browser_controller
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from browser_controller import BraveBrowserController
+from brave_controller import BraveBrowserController
 
 
 class TestWmctrl:
@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+
+from work_queue import WorkQueue, hold_lease
+
+RUN_DATE = "20250101"
+POSTCODES = [str(2000 + n) for n in range(40)]
+LEASE_SECONDS = 0.5
+
+
+def drain_queue(path: str, worker_id: int, done_dir: str, crash: bool) -> None:
+    """One host: scrape whatever it can lease, or crash holding its first lease"""
+    with WorkQueue(path, owner=f"host-{worker_id}") as work_queue:
+        for postcode in work_queue.iter_claims(
+            RUN_DATE, LEASE_SECONDS, poll_interval=0.05
+        ):
+            if crash:
+                os._exit(1)
+            if work_queue.complete(RUN_DATE, postcode):
+                with open(os.path.join(done_dir, f"{worker_id}.txt"), "a") as file:
+                    file.write(f"{postcode}\n")
+
+
+def completed_postcodes(done_dir) -> list:
+    postcodes = []
+    for name in os.listdir(done_dir):
+        with open(os.path.join(done_dir, name)) as file:
+            postcodes.extend(file.read().split())
+    return postcodes
+
+
+class TestWorkQueue:
+    """Test suite for postcode leases shared between hosts"""
+
+    def test_claim_hands_each_postcode_to_one_owner(self, tmp_path):
+        """A leased postcode is not handed to a second host"""
+        path = str(tmp_path / "queue.sqlite3")
+        with WorkQueue(path, "a") as first, WorkQueue(path, "b") as second:
+            first.open_run(["2000", "2010"], today=RUN_DATE)
+
+            assert first.claim(RUN_DATE) == "2000"
+            assert second.claim(RUN_DATE) == "2010"
+            assert second.claim(RUN_DATE) is None
+
+    def test_expired_lease_is_reclaimed_and_old_owner_cannot_complete(self, tmp_path):
+        """Once another host takes over an expired lease, the first loses it"""
+        path = str(tmp_path / "queue.sqlite3")
+        with WorkQueue(path, "a") as first, WorkQueue(path, "b") as second:
+            first.open_run(["2000"], today=RUN_DATE)
+            first.claim(RUN_DATE, lease_seconds=-1)
+
+            assert second.claim(RUN_DATE) == "2000"
+            assert not first.renew(RUN_DATE, "2000")
+            assert not first.complete(RUN_DATE, "2000")
+            assert second.complete(RUN_DATE, "2000")
+            assert second.state_counts(RUN_DATE)["done"] == 1
+
+    def test_open_run_resumes_unfinished_run_before_starting_new_one(self, tmp_path):
+        """Hosts keep joining the open run until all of its postcodes are done"""
+        with WorkQueue(str(tmp_path / "queue.sqlite3"), "a") as work_queue:
+            work_queue.open_run(["2000"], today=RUN_DATE)
+
+            assert work_queue.open_run(["2000"], today="20250102") == RUN_DATE
+            work_queue.claim(RUN_DATE)
+            work_queue.complete(RUN_DATE, "2000")
+            assert work_queue.open_run(["2000"], today="20250102") == "20250102"
+
+    def test_open_run_abandons_stale_run(self, tmp_path):
+        """A run left unfinished for weeks is closed and a new one queued"""
+        with WorkQueue(str(tmp_path / "queue.sqlite3"), "a") as work_queue:
+            work_queue.open_run(["2000"], today=RUN_DATE)
+
+            assert work_queue.open_run(["2000"], today="20250201") == "20250201"
+            assert work_queue.claim("20250201") == "2000"
+            assert work_queue.open_run(["2000"], today="20250202") == "20250201"
+
+    def test_hold_lease_gives_back_unfinished_postcode(self, tmp_path):
+        """A postcode the block left unfinished is pending again, not done"""
+        with WorkQueue(str(tmp_path / "queue.sqlite3"), "a") as work_queue:
+            work_queue.open_run(["2000", "2010"], today=RUN_DATE)
+            first = work_queue.claim(RUN_DATE)
+            with hold_lease(work_queue, RUN_DATE, first, done=lambda: False):
+                pass
+            second = work_queue.claim(RUN_DATE)
+            with hold_lease(work_queue, RUN_DATE, second, done=lambda: True):
+                pass
+
+            assert (first, second) == ("2000", "2000")
+            assert work_queue.state_counts(RUN_DATE)["done"] == 1
+            assert work_queue.claim(RUN_DATE) == "2010"
+
+    def test_iter_claims_postcode_that_always_fails_is_given_up(self, tmp_path):
+        """A postcode whose block always raises stops coming back and the run ends"""
+        with WorkQueue(str(tmp_path / "queue.sqlite3"), "a") as work_queue:
+            work_queue.open_run(["2000", "2010"], today=RUN_DATE)
+            claims = []
+            for postcode in work_queue.iter_claims(RUN_DATE, poll_interval=0):
+                claims.append(postcode)
+                try:
+                    with hold_lease(work_queue, RUN_DATE, postcode):
+                        if postcode == "2000":
+                            raise RuntimeError("browser did not start")
+                except RuntimeError:
+                    pass
+
+            assert claims == ["2000", "2000", "2000", "2010"]
+            assert work_queue.state_counts(RUN_DATE)["given_up"] == 1
+            assert work_queue.open_run(["2000"], today="20250102") == "20250102"
+
+    def test_hosts_with_a_crash_complete_every_postcode_exactly_once(self, tmp_path):
+        """Four host processes, one crashing mid-lease, neither lose nor repeat work"""
+        path = str(tmp_path / "queue.sqlite3")
+        done_dir = tmp_path / "done"
+        done_dir.mkdir()
+        with WorkQueue(path) as work_queue:
+            work_queue.open_run(POSTCODES, today=RUN_DATE)
+
+        context = multiprocessing.get_context("spawn")
+        hosts = [
+            context.Process(target=drain_queue, args=(path, n, str(done_dir), n == 0))
+            for n in range(4)
+        ]
+        # The crashing host goes first, so its lease is certain to be abandoned
+        hosts[0].start()
+        hosts[0].join(timeout=60)
+        for host in hosts[1:]:
+            host.start()
+        for host in hosts:
+            host.join(timeout=60)
+
+        done = completed_postcodes(done_dir)
+        assert sorted(done) == POSTCODES
+        assert [host.exitcode for host in hosts] == [1, 0, 0, 0]
+        with WorkQueue(path) as work_queue:
+            assert work_queue.state_counts(RUN_DATE)["done"] == len(POSTCODES)
+            assert work_queue.open_run(POSTCODES, today=RUN_DATE) == RUN_DATE
@@ -0,0 +1,88 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from clock import SystemClock, VirtualClock, install_clock
+from rate_limit import TokenBucket
+from run_ledger import RunLedger
+from synthetic_pages import SyntheticBrowserController
+from worker_pool import run_pool
+
+RUN_DATE = "20250101"
+POSTCODES = [str(2000 + n) for n in range(6)]
+
+
+def synthetic_controller(worker_id: int) -> SyntheticBrowserController:
+    """Module-level so spawned workers can unpickle it"""
+    return SyntheticBrowserController(default_results=40)
+
+
+def drain_bucket(bucket: TokenBucket, count: int) -> None:
+    for _ in range(count):
+        bucket.acquire()
+
+
+class TestTokenBucket:
+    """Test suite for the shared request budget"""
+
+    def test_token_bucket_paces_requests_after_burst(self):
+        """Requests beyond the burst wait for the bucket to refill"""
+        virtual_clock = VirtualClock(start=0.0)
+        install_clock(virtual_clock)
+        try:
+            bucket = TokenBucket(requests_per_minute=60, burst=2)
+            drain_bucket(bucket, 4)
+        finally:
+            install_clock(SystemClock())
+
+        assert virtual_clock.elapsed == pytest.approx(2.0)
+
+    def test_token_bucket_budget_is_shared_across_processes(self):
+        """Three processes drawing from one bucket are held to its single rate"""
+        context = multiprocessing.get_context("spawn")
+        bucket = TokenBucket(requests_per_minute=1200, context=context)
+        processes = [
+            context.Process(target=drain_bucket, args=(bucket, 5)) for _ in range(3)
+        ]
+
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        # 15 requests at 20 per second, the first one free
+        assert time.perf_counter() - started >= 14 / 20
+
+
+class TestRunPool:
+    """Test suite for scraping with several worker processes"""
+
+    def test_run_pool_scrapes_each_postcode_once(self, tmp_path):
+        """Workers sharing one output directory complete every postcode exactly once"""
+        finished = []
+
+        run_pool(
+            POSTCODES,
+            RUN_DATE,
+            synthetic_controller,
+            num_workers=3,
+            on_finished=lambda *result: finished.append(result),
+            requests_per_minute=60_000,
+            output_dir=str(tmp_path),
+            use_xvfb=False,
+        )
+
+        assert sorted(finished) == [
+            (postcode, None, True, False) for postcode in POSTCODES
+        ]
+        ledger = RunLedger(RUN_DATE, str(tmp_path))
+        assert ledger.remaining_postcodes(POSTCODES) == []
+        with open(ledger.log_path) as file:
+            events = [json.loads(line) for line in file]
+        completions = [
+            e["postcode"] for e in events if e["event"] == "postcode_completed"
+        ]
+        assert sorted(completions) == POSTCODES